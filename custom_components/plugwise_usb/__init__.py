@@ -1,14 +1,24 @@
 """Support for Plugwise USB devices connected to a Plugwise USB-stick."""
 import asyncio
+from collections.abc import Callable, Mapping
 import logging
+from operator import attrgetter
+import time
+from typing import Any
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import EVENT_HOMEASSISTANT_STOP, Platform
-from homeassistant.core import HomeAssistant
-from homeassistant.exceptions import ConfigEntryNotReady
-from homeassistant.helpers import device_registry as dr
+from homeassistant.const import ATTR_ENTITY_ID, EVENT_HOMEASSISTANT_STOP, Platform
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import ConfigEntryNotReady, HomeAssistantError
+from homeassistant.helpers import device_registry as dr, entity_registry as er
 from homeassistant.helpers.entity import Entity
-from plugwise_usb import Stick
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from plugwise_usb.exceptions import (
     CirclePlusError,
     NetworkDown,
@@ -18,22 +28,82 @@ from plugwise_usb.exceptions import (
 )
 from plugwise_usb.nodes import PlugwiseNode
 
+from .backfill import PlugwiseUSBEnergyBackfill
+from .cache import PlugwiseUSBNodeCache
+from .coalescer import PlugwiseUSBUpdateCoalescer
 from .const import (
     ATTR_MAC_ADDRESS,
+    ATTR_RELAY_STATE,
+    ATTR_STICK,
+    BACKFILL,
+    CACHE,
     CB_JOIN_REQUEST,
+    CB_NEW_NODE,
+    CB_NODE_CALIBRATION,
+    CB_NODE_INFO,
+    COALESCER,
+    CONF_DISCOVERY_CONCURRENCY,
+    CONF_ENERGY_BACKFILL,
+    CONF_ENERGY_RECONCILE_INTERVAL,
+    CONF_LOCAL_ENERGY,
+    CONF_MESSAGE_BUDGET,
+    CONF_POLL_INTERVAL,
+    CONF_POWER_EXPORT,
+    CONF_POWER_EXPORT_FILES,
+    CONF_POWER_EXPORT_MAX_SIZE,
+    CONF_RELAY_CONCURRENCY,
+    CONF_UPDATE_WINDOW,
     CONF_USB_PATH,
+    DEFAULT_DISCOVERY_CONCURRENCY,
+    DEFAULT_ENERGY_BACKFILL,
+    DEFAULT_ENERGY_RECONCILE_INTERVAL,
+    DEFAULT_LOCAL_ENERGY,
+    DEFAULT_MESSAGE_BUDGET,
+    DEFAULT_POLL_INTERVALS,
+    DEFAULT_POWER_EXPORT,
+    DEFAULT_POWER_EXPORT_FILES,
+    DEFAULT_POWER_EXPORT_MAX_SIZE,
+    DEFAULT_UPDATE_WINDOW,
     DOMAIN,
-    PLATFORMS_USB,
+    FORWARDED_PLATFORMS,
+    LOCAL_ENERGY,
+    MOTION_EVENTS,
+    NEW_NODE_BATCH_DELAY,
+    POLL_ENERGY,
+    POWER_EXPORT,
+    POWER_HISTORY,
+    PUBLISH_FILTER,
+    RELAY_SWITCH_CONCURRENCY,
+    SCHEDULER,
+    SED_COMMANDS,
     SERVICE_USB_DEVICE_ADD,
+    SERVICE_USB_DEVICE_ADD_SCHEMA,
     SERVICE_USB_DEVICE_REMOVE,
     SERVICE_USB_DEVICE_SCHEMA,
+    SERVICE_USB_MOVE_NODE,
+    SERVICE_USB_MOVE_NODE_SCHEMA,
+    SERVICE_USB_SET_RELAYS,
+    SERVICE_USB_SET_RELAYS_SCHEMA,
     STICK,
+    SUPERVISOR,
     UNDO_UPDATE_LISTENER,
     USB_AVAILABLE_ID,
-    USB_MOTION_ID,
-    USB_RELAY_ID,
 )
-from .models import PlugwiseEntityDescription
+from .energy import PlugwiseUSBLocalEnergy
+from .export import PlugwiseUSBPowerExport
+from .history import PlugwiseUSBPowerHistory
+from .models import (
+    PW_BINARY_SENSOR_TYPES,
+    PW_POWER_HISTORY_BINARY_SENSOR_TYPES,
+    PW_SWITCH_TYPES,
+    PlugwiseEntityDescription,
+)
+from .motion import PlugwiseUSBMotionEvents
+from .publish_filter import PlugwiseUSBPublishFilter
+from .scheduler import PlugwiseUSBPollScheduler
+from .sed_commands import PlugwiseUSBSedCommands
+from .stick import PlugwiseUSBStick
+from .supervisor import PlugwiseUSBConnectionSupervisor
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -43,34 +113,11 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry):
     hass.data.setdefault(DOMAIN, {})
     device_registry = dr.async_get(hass)
 
+    @callback
     def discover_finished():
-        """Create entities for all discovered nodes."""
-        _LOGGER.debug(
-            "Successfully discovered %s out of %s registered nodes",
-            str(len(api_stick.devices)),
-            str(api_stick.joined_nodes),
-        )
-        for component in PLATFORMS_USB:
-            hass.data[DOMAIN][config_entry.entry_id][component] = []
-
-        for mac, pw_device in api_stick.devices.items():
-            # Skip unsupported devices
-            if pw_device is not None:
-                if USB_RELAY_ID in pw_device.features:
-                    hass.data[DOMAIN][config_entry.entry_id][Platform.SWITCH].append(
-                        mac
-                    )
-                if USB_MOTION_ID in pw_device.features:
-                    hass.data[DOMAIN][config_entry.entry_id][
-                        Platform.BINARY_SENSOR
-                    ].append(mac)
-                hass.data[DOMAIN][config_entry.entry_id][Platform.SENSOR].append(mac)
-
-        asyncio.run_coroutine_threadsafe(
-            hass.config_entries.async_forward_entry_setups(config_entry, PLATFORMS_USB),
-            hass.loop,
-        )
+        """Start handling of join requests after the initial discovery."""
 
+        @callback
         def add_new_node(mac):
             """Add Listener when a new Plugwise node joined the network."""
             device = device_registry.async_get_device({(DOMAIN, mac)}, set())
@@ -83,49 +130,218 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry):
                 ),
             )
 
-        api_stick.auto_update()
-
         if config_entry.pref_disable_new_entities:
             _LOGGER.debug("Configuring stick NOT to accept any new join requests")
             api_stick.allow_join_requests(True, False)
         else:
             _LOGGER.debug("Configuring stick to automatically accept new join requests")
             api_stick.allow_join_requests(True, True)
-            api_stick.subscribe_stick_callback(add_new_node, CB_JOIN_REQUEST)
+            config_entry.async_on_unload(
+                api_stick.async_subscribe_stick_callback(add_new_node, CB_JOIN_REQUEST)
+            )
 
-    def shutdown(event):
-        hass.async_add_executor_job(api_stick.disconnect)
+    async def async_discover_nodes():
+        """Discover all registered nodes in the background."""
+        _LOGGER.debug("Start discovery of registered nodes")
+        unreachable = await api_stick.async_discover_nodes(
+            config_entry.options.get(
+                CONF_DISCOVERY_CONCURRENCY, DEFAULT_DISCOVERY_CONCURRENCY
+            )
+        )
+        if api_stick.registered_nodes:
+            node_cache.async_retain_nodes(api_stick.registered_nodes)
+        # Cached metadata might be outdated, like after a firmware update
+        api_stick.request_restored_node_info()
+        discover_finished()
+        if unreachable:
+            _LOGGER.info(
+                "Retry discovery of %s unreachable nodes in the background",
+                str(len(unreachable)),
+            )
+            await api_stick.async_rediscover_nodes(unreachable)
 
-    api_stick = Stick(config_entry.data[CONF_USB_PATH])
-    hass.data[DOMAIN][config_entry.entry_id] = {STICK: api_stick}
+    async def shutdown(event):
+        supervisor.async_stop()
+        await power_export.async_stop()
+        await sed_commands.async_stop()
+        if local_energy is not None:
+            await local_energy.async_stop()
+        await api_stick.async_disconnect()
+
+    api_stick = PlugwiseUSBStick(hass, config_entry.data[CONF_USB_PATH])
+    coalescer = PlugwiseUSBUpdateCoalescer(
+        hass,
+        config_entry.options.get(CONF_UPDATE_WINDOW, DEFAULT_UPDATE_WINDOW),
+        api_stick.metrics,
+    )
+    hass.data[DOMAIN][config_entry.entry_id] = {
+        STICK: api_stick,
+        COALESCER: coalescer,
+        PUBLISH_FILTER: PlugwiseUSBPublishFilter.from_options(
+            config_entry.options, api_stick.metrics
+        ),
+    }
     try:
-        _LOGGER.debug("Connect to USB-Stick")
-        await hass.async_add_executor_job(api_stick.connect)
-        _LOGGER.debug("Initialize USB-stick")
-        await hass.async_add_executor_job(api_stick.initialize_stick)
-        _LOGGER.debug("Discover Circle+ node")
-        await hass.async_add_executor_job(api_stick.initialize_circle_plus)
+        await api_stick.async_connect()
     except PortError:
         _LOGGER.error("Connecting to Plugwise USBstick communication failed")
         raise ConfigEntryNotReady from PortError
     except StickInitError:
         _LOGGER.error("Initializing of Plugwise USBstick communication failed")
-        await hass.async_add_executor_job(api_stick.disconnect)
+        await api_stick.async_disconnect()
         raise ConfigEntryNotReady from StickInitError
     except NetworkDown:
         _LOGGER.warning("Plugwise zigbee network down")
-        await hass.async_add_executor_job(api_stick.disconnect)
+        await api_stick.async_disconnect()
         raise ConfigEntryNotReady from NetworkDown
     except CirclePlusError:
         _LOGGER.warning("Failed to connect to Circle+ node")
-        await hass.async_add_executor_job(api_stick.disconnect)
+        await api_stick.async_disconnect()
         raise ConfigEntryNotReady from CirclePlusError
     except TimeoutException:
         _LOGGER.warning("Timeout")
-        await hass.async_add_executor_job(api_stick.disconnect)
+        await api_stick.async_disconnect()
         raise ConfigEntryNotReady from TimeoutException
-    _LOGGER.debug("Start discovery of registered nodes")
-    api_stick.scan(discover_finished)
+
+    # Create the nodes known from a previous run without waiting for discovery
+    stick_mac = config_entry.unique_id or api_stick.mac
+    node_cache = PlugwiseUSBNodeCache(hass, stick_mac)
+    api_stick.restore_nodes(await node_cache.async_load())
+    hass.data[DOMAIN][config_entry.entry_id][CACHE] = node_cache
+
+    backfill = await _async_setup_backfill(hass, config_entry, api_stick, stick_mac)
+
+    @callback
+    def node_info_received(mac):
+        """Update the cached metadata of a node and backfill its energy logs."""
+        if (metadata := api_stick.node_metadata(mac)) is not None:
+            node_cache.async_update_node(mac, metadata)
+        if backfill is not None:
+            backfill.async_schedule_node(mac)
+
+    config_entry.async_on_unload(
+        api_stick.async_subscribe_stick_callback(node_info_received, CB_NODE_INFO)
+    )
+
+    # Nodes of all sticks share one device view, each linked to its own stick
+    device_registry.async_get_or_create(
+        config_entry_id=config_entry.entry_id,
+        identifiers={(DOMAIN, api_stick.mac)},
+        manufacturer="Plugwise",
+        model="Stick",
+        name=f"Stick ({api_stick.mac})",
+    )
+
+    # Stream power samples to local files for load analysis
+    power_export = PlugwiseUSBPowerExport(
+        hass,
+        api_stick,
+        stick_mac,
+        config_entry.options.get(
+            CONF_POWER_EXPORT_MAX_SIZE, DEFAULT_POWER_EXPORT_MAX_SIZE
+        ),
+        config_entry.options.get(CONF_POWER_EXPORT_FILES, DEFAULT_POWER_EXPORT_FILES),
+    )
+    hass.data[DOMAIN][config_entry.entry_id][POWER_EXPORT] = power_export
+    await power_export.async_set_enabled(
+        config_entry.options.get(CONF_POWER_EXPORT, DEFAULT_POWER_EXPORT)
+    )
+    config_entry.async_on_unload(power_export.async_stop)
+
+    power_history = _async_setup_power_history(hass, config_entry, api_stick)
+
+    # Commands for battery powered nodes, sent when the node is awake
+    sed_commands = PlugwiseUSBSedCommands(hass, api_stick, stick_mac)
+    await sed_commands.async_load()
+    hass.data[DOMAIN][config_entry.entry_id][SED_COMMANDS] = sed_commands
+    config_entry.async_on_unload(sed_commands.async_stop)
+
+    local_energy = await _async_setup_local_energy(
+        hass, config_entry, api_stick, stick_mac
+    )
+
+    # Motion events of Scan nodes, fired straight from the received frame
+    motion_events = PlugwiseUSBMotionEvents(hass, api_stick)
+    config_entry.async_on_unload(
+        api_stick.add_motion_listener(motion_events.motion_received)
+    )
+    config_entry.async_on_unload(
+        api_stick.add_availability_listener(motion_events.node_availability)
+    )
+    hass.data[DOMAIN][config_entry.entry_id][MOTION_EVENTS] = motion_events
+
+    @callback
+    def link_node_device(mac):
+        """Register the device of a node via the stick of its network."""
+        device_registry.async_get_or_create(
+            config_entry_id=config_entry.entry_id,
+            identifiers={(DOMAIN, mac)},
+            via_device=(DOMAIN, api_stick.mac),
+        )
+        power_export.async_add_node(mac)
+        power_history.async_add_node(mac)
+        if local_energy is not None:
+            local_energy.async_add_node(mac)
+
+    for mac in list(api_stick.devices):
+        link_node_device(mac)
+
+    # The sensor platform holds the stick entities, other platforms are set up
+    # when the first node with entities of that platform is known
+    forwarded: set[Platform] = {Platform.SENSOR}
+    entity_registry = er.async_get(hass)
+    for node in api_stick.devices.values():
+        if node is not None:
+            forwarded.update(_node_platforms(node, power_history, entity_registry))
+    hass.data[DOMAIN][config_entry.entry_id][FORWARDED_PLATFORMS] = forwarded
+
+    @callback
+    def new_node_discovered(mac):
+        """Link a discovered node and set up the platforms it needs."""
+        link_node_device(mac)
+        if (node := api_stick.devices.get(mac)) is None or not (
+            platforms := _node_platforms(node, power_history, entity_registry)
+            - forwarded
+        ):
+            return
+        _LOGGER.debug("Set up platforms %s for node %s", platforms, mac)
+        forwarded.update(platforms)
+        config_entry.async_create_task(
+            hass,
+            hass.config_entries.async_forward_entry_setups(
+                config_entry, sorted(platforms)
+            ),
+        )
+
+    config_entry.async_on_unload(
+        api_stick.async_subscribe_stick_callback(new_node_discovered, CB_NEW_NODE)
+    )
+
+    scheduler = PlugwiseUSBPollScheduler(
+        hass,
+        api_stick,
+        config_entry.options.get(CONF_MESSAGE_BUDGET, DEFAULT_MESSAGE_BUDGET),
+        _poll_intervals(config_entry.options),
+    )
+    scheduler.power_sampling = power_export.enabled
+    hass.data[DOMAIN][config_entry.entry_id][SCHEDULER] = scheduler
+    config_entry.async_on_unload(
+        scheduler.async_track_entity_demand(config_entry.entry_id)
+    )
+
+    # Platforms add entities for each node as soon as it is discovered
+    await hass.config_entries.async_forward_entry_setups(
+        config_entry, sorted(forwarded)
+    )
+    scheduler.async_start()
+    api_stick.metrics.async_start()
+    config_entry.async_on_unload(api_stick.metrics.async_stop)
+    supervisor = PlugwiseUSBConnectionSupervisor(hass, config_entry, api_stick)
+    hass.data[DOMAIN][config_entry.entry_id][SUPERVISOR] = supervisor
+    supervisor.async_start()
+    config_entry.async_create_background_task(
+        hass, async_discover_nodes(), "plugwise_usb_discovery"
+    )
 
     # Listen when EVENT_HOMEASSISTANT_STOP is fired
     hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, shutdown)
@@ -135,53 +351,445 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry):
         UNDO_UPDATE_LISTENER
     ] = config_entry.add_update_listener(_async_update_listener)
 
-    async def device_add(service):
+    if not hass.services.has_service(DOMAIN, SERVICE_USB_SET_RELAYS):
+        async_setup_services(hass)
+
+    return True
+
+
+async def _async_setup_backfill(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    api_stick: PlugwiseUSBStick,
+    stick_mac: str,
+) -> PlugwiseUSBEnergyBackfill | None:
+    """Import energy logs missed while offline into the long-term statistics."""
+    if "recorder" not in hass.config.components:
+        return None
+    backfill = PlugwiseUSBEnergyBackfill(
+        hass,
+        config_entry,
+        api_stick,
+        stick_mac,
+        config_entry.options.get(CONF_ENERGY_BACKFILL, DEFAULT_ENERGY_BACKFILL),
+    )
+    await backfill.async_load()
+    hass.data[DOMAIN][config_entry.entry_id][BACKFILL] = backfill
+    config_entry.async_on_unload(
+        api_stick.async_subscribe_stick_callback(
+            backfill.async_schedule_node, CB_NODE_CALIBRATION
+        )
+    )
+    return backfill
+
+
+@callback
+def _async_setup_power_history(
+    hass: HomeAssistant, config_entry: ConfigEntry, api_stick: PlugwiseUSBStick
+) -> PlugwiseUSBPowerHistory:
+    """Keep recent power samples of each node for the derived power sensors."""
+    power_history = PlugwiseUSBPowerHistory(api_stick)
+    hass.data[DOMAIN][config_entry.entry_id][POWER_HISTORY] = power_history
+    config_entry.async_on_unload(power_history.async_stop)
+    return power_history
+
+
+async def _async_setup_local_energy(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    api_stick: PlugwiseUSBStick,
+    stick_mac: str,
+) -> PlugwiseUSBLocalEnergy | None:
+    """Integrate energy from the power samples, reconciled with the counters."""
+    local_energy: PlugwiseUSBLocalEnergy | None = None
+    if config_entry.options.get(CONF_LOCAL_ENERGY, DEFAULT_LOCAL_ENERGY):
+        local_energy = PlugwiseUSBLocalEnergy(
+            hass,
+            api_stick,
+            stick_mac,
+            config_entry.options.get(
+                CONF_ENERGY_RECONCILE_INTERVAL, DEFAULT_ENERGY_RECONCILE_INTERVAL
+            ),
+        )
+        await local_energy.async_load()
+        config_entry.async_on_unload(local_energy.async_stop)
+    hass.data[DOMAIN][config_entry.entry_id][LOCAL_ENERGY] = local_energy
+    return local_energy
+
+
+@callback
+def async_connected_sticks(hass: HomeAssistant) -> dict[str, PlugwiseUSBStick]:
+    """Return the connected USB-sticks by config entry id."""
+    return {
+        entry_id: entry_data[STICK]
+        for entry_id, entry_data in hass.data.get(DOMAIN, {}).items()
+        if entry_data[STICK].mac
+    }
+
+
+@callback
+def async_stick_of_node(hass: HomeAssistant, mac: str) -> str | None:
+    """Return the config entry id of the stick in the network of a node."""
+    for entry_id, api_stick in async_connected_sticks(hass).items():
+        if mac in api_stick.devices or mac == api_stick.circle_plus_mac:
+            return entry_id
+    return None
+
+
+@callback
+def async_target_stick(hass: HomeAssistant, stick_mac: str | None) -> str:
+    """Return the config entry id of a stick by its MAC, the only stick when omitted."""
+    sticks = async_connected_sticks(hass)
+    if stick_mac is None:
+        if len(sticks) != 1:
+            raise HomeAssistantError("Select the Plugwise USB-stick of the network")
+        return next(iter(sticks))
+    for entry_id, api_stick in sticks.items():
+        if api_stick.mac == stick_mac:
+            return entry_id
+    raise HomeAssistantError(f"Unknown Plugwise USB-stick {stick_mac}")
+
+
+@callback
+def _async_remove_node(hass: HomeAssistant, entry_id: str, mac: str) -> None:
+    """Forget a node which left the network of a stick and remove its entities."""
+    entry_data = hass.data[DOMAIN][entry_id]
+    entry_data[SCHEDULER].async_remove_node(mac)
+    entry_data[POWER_HISTORY].async_remove_node(mac)
+    entry_data[POWER_EXPORT].async_remove_node(mac)
+    if (local_energy := entry_data[LOCAL_ENERGY]) is not None:
+        local_energy.async_remove_node(mac)
+    entry_data[SED_COMMANDS].async_discard(mac)
+    entry_data[MOTION_EVENTS].discard(mac)
+    entry_data[CACHE].async_remove_node(mac)
+    entry_data[STICK].remove_node(mac)
+    entity_registry = er.async_get(hass)
+    for entity_entry in er.async_entries_for_config_entry(entity_registry, entry_id):
+        if entity_entry.unique_id.startswith(f"{mac}-"):
+            entity_registry.async_remove(entity_entry.entity_id)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services of all Plugwise networks, routed to the stick of each node."""
+    device_registry = dr.async_get(hass)
+
+    async def device_add(service: ServiceCall) -> None:
         """Manually add device to Plugwise zigbee network."""
-        api_stick.node_join(service.data[ATTR_MAC_ADDRESS])
+        entry_id = async_target_stick(hass, service.data.get(ATTR_STICK))
+        async_connected_sticks(hass)[entry_id].node_join(service.data[ATTR_MAC_ADDRESS])
 
-    async def device_remove(service):
+    async def device_remove(service: ServiceCall) -> None:
         """Manually remove device from Plugwise zigbee network."""
-        api_stick.node_unjoin(service.data[ATTR_MAC_ADDRESS])
+        mac = service.data[ATTR_MAC_ADDRESS]
+        if (entry_id := async_stick_of_node(hass, mac)) is None:
+            raise HomeAssistantError(f"Node {mac} is not part of a Plugwise network")
+        async_connected_sticks(hass)[entry_id].node_unjoin(mac)
+        _async_remove_node(hass, entry_id, mac)
         _LOGGER.debug(
-            "Send request to remove device using mac %s from Plugwise network",
-            service.data[ATTR_MAC_ADDRESS],
-        )
-        device_entry = device_registry.async_get_device(
-            {(DOMAIN, service.data[ATTR_MAC_ADDRESS])}, set()
+            "Send request to remove device using mac %s from Plugwise network", mac
         )
+        device_entry = device_registry.async_get_device({(DOMAIN, mac)}, set())
         if device_entry:
-            _LOGGER.debug(
-                "Remove device %s from Home Assistant", service.data[ATTR_MAC_ADDRESS]
-            )
+            _LOGGER.debug("Remove device %s from Home Assistant", mac)
             device_registry.async_remove_device(device_entry.id)
 
+    async def move_node(service: ServiceCall) -> None:
+        """Move a node to the network of another stick."""
+        mac = service.data[ATTR_MAC_ADDRESS]
+        if (source := async_stick_of_node(hass, mac)) is None:
+            raise HomeAssistantError(f"Node {mac} is not part of a Plugwise network")
+        target = async_target_stick(hass, service.data[ATTR_STICK])
+        if source == target:
+            return
+        sticks = async_connected_sticks(hass)
+        if mac == sticks[source].circle_plus_mac:
+            raise HomeAssistantError(f"Circle+ {mac} cannot leave its network")
+        _LOGGER.debug(
+            "Move node %s from stick %s to stick %s",
+            mac,
+            sticks[source].mac,
+            sticks[target].mac,
+        )
+        sticks[source].node_unjoin(mac)
+        _async_remove_node(hass, source, mac)
+        # The device moves along, the target adds its entities when it
+        # discovers the node
+        if device_entry := device_registry.async_get_device({(DOMAIN, mac)}, set()):
+            target_device = device_registry.async_get_device(
+                {(DOMAIN, sticks[target].mac)}, set()
+            )
+            device_registry.async_update_device(
+                device_entry.id,
+                add_config_entry_id=target,
+                remove_config_entry_id=source,
+                via_device_id=target_device.id if target_device else None,
+            )
+        sticks[target].node_join(mac)
+        target_entry = hass.config_entries.async_get_entry(target)
+        target_entry.async_create_background_task(
+            hass,
+            sticks[target].async_rediscover_nodes([mac]),
+            f"plugwise_usb_discover_{mac}",
+        )
+
+    async def set_relays(service: ServiceCall) -> ServiceResponse:
+        """Switch the relays of multiple Circles in parallel, per network."""
+        macs = list(service.data.get(ATTR_MAC_ADDRESS, []))
+        entity_registry = er.async_get(hass)
+        for entity_id in service.data.get(ATTR_ENTITY_ID, []):
+            if (
+                (entry := entity_registry.async_get(entity_id)) is None
+                or entry.platform != DOMAIN
+                or entry.domain != Platform.SWITCH
+            ):
+                _LOGGER.warning("Entity %s is not a Plugwise USB relay", entity_id)
+                continue
+            macs.append(entry.unique_id.split("-", 1)[0])
+        sticks = async_connected_sticks(hass)
+        networks: dict[str, list[str]] = {}
+        errors: dict[str, str | None] = {}
+        for mac in dict.fromkeys(macs):
+            if (entry_id := async_stick_of_node(hass, mac)) is None:
+                errors[mac] = "Unknown Circle"
+            else:
+                networks.setdefault(entry_id, []).append(mac)
+        start = time.monotonic()
+        for network_errors in await asyncio.gather(
+            *(
+                sticks[entry_id].async_switch_relays(
+                    network_macs,
+                    service.data[ATTR_RELAY_STATE],
+                    hass.config_entries.async_get_entry(entry_id).options.get(
+                        CONF_RELAY_CONCURRENCY, RELAY_SWITCH_CONCURRENCY
+                    ),
+                )
+                for entry_id, network_macs in networks.items()
+            )
+        ):
+            errors.update(network_errors)
+        duration = round(time.monotonic() - start, 3)
+        if failed := {mac: error for mac, error in errors.items() if error}:
+            _LOGGER.warning(
+                "Failed to switch %s out of %s relays: %s",
+                str(len(failed)),
+                str(len(errors)),
+                failed,
+            )
+        _LOGGER.debug("Switched %s relays in %s seconds", str(len(errors)), duration)
+        return {
+            "duration": duration,
+            "results": {
+                mac: {"success": error is None, "error": error}
+                for mac, error in errors.items()
+            },
+        }
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_USB_DEVICE_ADD, device_add, SERVICE_USB_DEVICE_ADD_SCHEMA
+    )
     hass.services.async_register(
-        DOMAIN, SERVICE_USB_DEVICE_ADD, device_add, SERVICE_USB_DEVICE_SCHEMA
+        DOMAIN,
+        SERVICE_USB_SET_RELAYS,
+        set_relays,
+        SERVICE_USB_SET_RELAYS_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
     )
     hass.services.async_register(
         DOMAIN, SERVICE_USB_DEVICE_REMOVE, device_remove, SERVICE_USB_DEVICE_SCHEMA
     )
-
-    return True
+    hass.services.async_register(
+        DOMAIN, SERVICE_USB_MOVE_NODE, move_node, SERVICE_USB_MOVE_NODE_SCHEMA
+    )
 
 
 async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry):
     """Unload the Plugwise USB stick connection."""
 
     unload_ok = await hass.config_entries.async_unload_platforms(
-        config_entry, PLATFORMS_USB
+        config_entry, hass.data[DOMAIN][config_entry.entry_id][FORWARDED_PLATFORMS]
     )
     hass.data[DOMAIN][config_entry.entry_id][UNDO_UPDATE_LISTENER]()
     if unload_ok:
+        hass.data[DOMAIN][config_entry.entry_id][SUPERVISOR].async_stop()
+        hass.data[DOMAIN][config_entry.entry_id][SCHEDULER].async_stop()
+        hass.data[DOMAIN][config_entry.entry_id][COALESCER].async_shutdown()
         api_stick = hass.data[DOMAIN][config_entry.entry_id]["stick"]
-        await hass.async_add_executor_job(api_stick.disconnect)
+        await api_stick.async_disconnect()
         hass.data[DOMAIN].pop(config_entry.entry_id)
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+    """Remove the caches, checkpoints and pending commands of a removed Plugwise USB stick."""
+    if config_entry.unique_id:
+        await PlugwiseUSBNodeCache(hass, config_entry.unique_id).async_remove()
+        await PlugwiseUSBEnergyBackfill.async_remove(hass, config_entry.unique_id)
+        await PlugwiseUSBSedCommands.async_remove(hass, config_entry.unique_id)
+        await PlugwiseUSBLocalEnergy.async_remove(hass, config_entry.unique_id)
+
+
+def _node_platforms(
+    node: PlugwiseNode,
+    power_history: PlugwiseUSBPowerHistory,
+    entity_registry: er.EntityRegistry,
+) -> set[Platform]:
+    """Return the platforms with entities of a node.
+
+    The power history binary sensors are disabled by default, so they only
+    need the binary sensor platform once enabled in the entity registry.
+    """
+    platforms = {Platform.SENSOR}
+    if any(
+        description.key in node.features for description in PW_BINARY_SENSOR_TYPES
+    ) or (
+        power_history.get(node.mac) is not None
+        and any(
+            (
+                entity_id := entity_registry.async_get_entity_id(
+                    Platform.BINARY_SENSOR, DOMAIN, f"{node.mac}-{description.key}"
+                )
+            )
+            is not None
+            and not entity_registry.async_get(entity_id).disabled
+            for description in PW_POWER_HISTORY_BINARY_SENSOR_TYPES
+        )
+    ):
+        platforms.add(Platform.BINARY_SENSOR)
+    if any(description.key in node.features for description in PW_SWITCH_TYPES):
+        platforms.add(Platform.SWITCH)
+    return platforms
+
+
+def _poll_intervals(options: Mapping[str, Any]) -> dict[str, float]:
+    """Return the poll intervals set in the options of a config entry.
+
+    With local energy the energy counters are only needed to reconcile the
+    integrated energy, so they are not polled more often than that.
+    """
+    poll_intervals = {
+        request: options[f"{CONF_POLL_INTERVAL}_{request}"]
+        for request in DEFAULT_POLL_INTERVALS
+        if f"{CONF_POLL_INTERVAL}_{request}" in options
+    }
+    if options.get(CONF_LOCAL_ENERGY, DEFAULT_LOCAL_ENERGY):
+        poll_intervals[POLL_ENERGY] = max(
+            poll_intervals.get(POLL_ENERGY, DEFAULT_POLL_INTERVALS[POLL_ENERGY]),
+            60
+            * options.get(
+                CONF_ENERGY_RECONCILE_INTERVAL, DEFAULT_ENERGY_RECONCILE_INTERVAL
+            ),
+        )
+    return poll_intervals
+
+
 async def _async_update_listener(hass: HomeAssistant, config_entry: ConfigEntry):
-    """Handle options update."""
-    await hass.config_entries.async_reload(config_entry.entry_id)
+    """Apply changed options to the running stick without a reload.
+
+    A reload would disconnect the stick and discover all nodes again. The
+    discovery concurrency applies to the next discovery, the relay switch
+    concurrency is read by the set_relays service. Only switching local
+    energy on or off reloads the entry, as it changes the entities.
+    """
+    entry_data = hass.data[DOMAIN][config_entry.entry_id]
+    options = config_entry.options
+    local_energy: PlugwiseUSBLocalEnergy | None = entry_data[LOCAL_ENERGY]
+    if options.get(CONF_LOCAL_ENERGY, DEFAULT_LOCAL_ENERGY) != (
+        local_energy is not None
+    ):
+        hass.async_create_task(
+            hass.config_entries.async_reload(config_entry.entry_id)
+        )
+        return
+    if local_energy is not None:
+        local_energy.reconcile_interval = options.get(
+            CONF_ENERGY_RECONCILE_INTERVAL, DEFAULT_ENERGY_RECONCILE_INTERVAL
+        )
+    entry_data[COALESCER].window = options.get(
+        CONF_UPDATE_WINDOW, DEFAULT_UPDATE_WINDOW
+    )
+    entry_data[PUBLISH_FILTER].update_options(options)
+    scheduler: PlugwiseUSBPollScheduler = entry_data[SCHEDULER]
+    scheduler.poll_intervals = _poll_intervals(options)
+    scheduler.message_budget = options.get(CONF_MESSAGE_BUDGET, DEFAULT_MESSAGE_BUDGET)
+    if (backfill := entry_data.get(BACKFILL)) is not None:
+        backfill.async_set_enabled(
+            options.get(CONF_ENERGY_BACKFILL, DEFAULT_ENERGY_BACKFILL)
+        )
+    power_export: PlugwiseUSBPowerExport = entry_data[POWER_EXPORT]
+    power_export.max_size = options.get(
+        CONF_POWER_EXPORT_MAX_SIZE, DEFAULT_POWER_EXPORT_MAX_SIZE
+    )
+    power_export.max_files = options.get(
+        CONF_POWER_EXPORT_FILES, DEFAULT_POWER_EXPORT_FILES
+    )
+    await power_export.async_set_enabled(
+        options.get(CONF_POWER_EXPORT, DEFAULT_POWER_EXPORT)
+    )
+    scheduler.power_sampling = power_export.enabled
+
+
+@callback
+def async_add_node_entities(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+    node_entities: Callable[[str], list[Entity]],
+    entities: list[Entity] | None = None,
+) -> None:
+    """Add the entities of all known nodes of a platform in one call.
+
+    Each call of async_add_entities is a pass over the registries, entities
+    which do not belong to a node are added in the same call. Nodes
+    discovered later are collected for a short delay and their entities
+    are added in one call as well.
+    """
+    api_stick: PlugwiseUSBStick = hass.data[DOMAIN][config_entry.entry_id][STICK]
+    added: set[str] = set()
+    discovered: list[str] = []
+    batch_timer: asyncio.TimerHandle | None = None
+
+    @callback
+    def async_add_nodes(macs: list[str], entities: list[Entity]) -> None:
+        """Add the entities of nodes which have none yet."""
+        for mac in macs:
+            if mac in added or api_stick.devices.get(mac) is None:
+                continue
+            added.add(mac)
+            entities.extend(node_entities(mac))
+        if entities:
+            async_add_entities(entities)
+
+    @callback
+    def async_add_discovered() -> None:
+        """Add the entities of the nodes discovered during the delay."""
+        nonlocal batch_timer
+        batch_timer = None
+        macs = discovered.copy()
+        discovered.clear()
+        async_add_nodes(macs, [])
+
+    @callback
+    def node_discovered(mac: str) -> None:
+        """Collect a discovered node into the next batch."""
+        nonlocal batch_timer
+        discovered.append(mac)
+        if batch_timer is None:
+            batch_timer = hass.loop.call_later(
+                NEW_NODE_BATCH_DELAY, async_add_discovered
+            )
+
+    @callback
+    def async_cancel_batch() -> None:
+        """Cancel a pending batch of discovered nodes."""
+        if batch_timer is not None:
+            batch_timer.cancel()
+
+    async_add_nodes(list(api_stick.devices), list(entities or ()))
+    config_entry.async_on_unload(
+        api_stick.async_subscribe_stick_callback(node_discovered, CB_NEW_NODE)
+    )
+    config_entry.async_on_unload(async_cancel_batch)
 
 
 class PlugwiseUSBEntity(Entity):
@@ -207,9 +815,15 @@ class PlugwiseUSBEntity(Entity):
         self._node = node
         self.entity_description = entity_description
         self.node_callbacks = (USB_AVAILABLE_ID, entity_description.key)
+        self._coalescer: PlugwiseUSBUpdateCoalescer | None = None
+        self._state_accessor = attrgetter(entity_description.state_request_method)
+        self._set_state(self._read_state())
 
     async def async_added_to_hass(self):
         """Subscribe for updates."""
+        self._coalescer = self.hass.data[DOMAIN][self.platform.config_entry.entry_id][
+            COALESCER
+        ]
         for node_callback in self.node_callbacks:
             self._node.subscribe_callback(self.sensor_update, node_callback)
 
@@ -217,8 +831,25 @@ class PlugwiseUSBEntity(Entity):
         """Unsubscribe to updates."""
         for node_callback in self.node_callbacks:
             self._node.unsubscribe_callback(self.sensor_update, node_callback)
+        self._coalescer.async_discard(self)
+
+    def _read_state(self) -> Any:
+        """Return the state value of the node."""
+        return self._state_accessor(self._node)
+
+    def _set_state(self, value: Any) -> None:
+        """Keep the state value, read by Home Assistant without calling the node."""
+
+    def _should_publish(self, value: Any, available: bool) -> bool:
+        """Return True if the update has to be written to the state machine."""
+        return True
 
     def sensor_update(self, state):
         """Handle status update of Entity."""
-        self.schedule_update_ha_state()
-        self._attr_available = self._node.available
+        value = self._read_state()
+        available = self._node.available
+        if not self._should_publish(value, available):
+            return
+        self._attr_available = available
+        self._set_state(value)
+        self._coalescer.mark_dirty(self)
@@ -0,0 +1,234 @@
+"""Backfill of Circle energy logs into long-term statistics."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    get_last_statistics,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import UnitOfEnergy
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    BACKFILL_BATCH_SIZE,
+    BACKFILL_CONCURRENCY,
+    BACKFILL_INITIAL_PAGES,
+    BACKFILL_STORAGE_VERSION,
+    DOMAIN,
+    LOGGER,
+)
+from .stick import PlugwiseUSBStick
+
+
+class PlugwiseUSBEnergyBackfill:
+    """Import the hourly energy logs of Circles as external statistics.
+
+    Circles store their energy logs in pages of four hourly slots. Pages
+    which are not imported yet are read in small batches once a node reports
+    its current log address, so hours missed while Home Assistant was down
+    are filled in. A checkpoint per node keeps the next page to read, the
+    last imported hour and the running sum, so an interrupted backfill
+    resumes without reading the imported pages again.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        config_entry: ConfigEntry,
+        api_stick: PlugwiseUSBStick,
+        stick_mac: str,
+        enabled: bool = True,
+    ) -> None:
+        """Initialize the energy log backfill."""
+        self._hass = hass
+        self._enabled = enabled
+        self._config_entry = config_entry
+        self._api_stick = api_stick
+        self._store = self._checkpoint_store(hass, stick_mac)
+        self._checkpoints: dict[str, dict[str, Any]] = {}
+        self._running: set[str] = set()
+        self._semaphore = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+
+    @staticmethod
+    def statistic_id(mac: str) -> str:
+        """Return the statistic id of the energy consumption of a node."""
+        return f"{DOMAIN}:{mac.lower()}_energy_consumption"
+
+    async def async_load(self) -> None:
+        """Load the checkpoints from disk."""
+        if (checkpoints := await self._store.async_load()) is not None:
+            self._checkpoints = checkpoints
+
+    @staticmethod
+    def _checkpoint_store(
+        hass: HomeAssistant, stick_mac: str
+    ) -> Store[dict[str, dict[str, Any]]]:
+        """Return the store of the checkpoints of one Plugwise network."""
+        return Store(hass, BACKFILL_STORAGE_VERSION, f"{DOMAIN}.{stick_mac}.backfill")
+
+    @classmethod
+    async def async_remove(cls, hass: HomeAssistant, stick_mac: str) -> None:
+        """Remove the checkpoints of a Plugwise network from disk."""
+        await cls._checkpoint_store(hass, stick_mac).async_remove()
+
+    @property
+    def enabled(self) -> bool:
+        """Return True if energy logs are imported."""
+        return self._enabled
+
+    @callback
+    def async_set_enabled(self, enabled: bool) -> None:
+        """Enable or disable the import of energy logs, catch up all nodes when enabled.
+
+        A running backfill stops after the batch it is reading, the checkpoint
+        of the node makes the next backfill resume from there.
+        """
+        if enabled == self._enabled:
+            return
+        self._enabled = enabled
+        if enabled:
+            for mac in list(self._api_stick.devices):
+                self.async_schedule_node(mac)
+
+    @callback
+    def async_schedule_node(self, mac: str) -> asyncio.Task[None] | None:
+        """Start a backfill of a node when it has energy logs which are not imported.
+
+        Returns the backfill task, or None when there is nothing to import.
+        Without its calibration the pulses of a node cannot be converted to
+        energy, the node is scheduled again when its calibration arrives.
+        """
+        if (
+            not self._enabled
+            or mac in self._running
+            or (node := self._api_stick.devices.get(mac)) is None
+            or not node.measures_power
+            or not node.calibration
+            or node._last_log_address is None
+        ):
+            return None
+        if (checkpoint := self._checkpoints.get(mac)) is not None and checkpoint[
+            "log_address"
+        ] == node._last_log_address:
+            return None
+        self._running.add(mac)
+        return self._config_entry.async_create_background_task(
+            self._hass, self._async_backfill_node(mac), f"plugwise_usb_backfill_{mac}"
+        )
+
+    async def _async_backfill_node(self, mac: str) -> None:
+        """Import the energy logs of a node from its checkpoint up to its current page."""
+        try:
+            async with self._semaphore:
+                await self._async_import_pages(mac)
+        finally:
+            self._running.discard(mac)
+
+    async def _async_import_pages(self, mac: str) -> None:
+        """Read energy log pages in batches and import the completed hours."""
+        if (node := self._api_stick.devices.get(mac)) is None:
+            return
+        last_address: int = node._last_log_address
+        statistic_id = self.statistic_id(mac)
+        if (checkpoint := self._checkpoints.get(mac)) is None:
+            checkpoint = await self._async_initial_checkpoint(statistic_id, last_address)
+        if checkpoint["log_address"] > last_address:
+            # Log memory has been reset or wrapped around
+            checkpoint["log_address"] = max(last_address - BACKFILL_INITIAL_PAGES, 0)
+        log_address: int = checkpoint["log_address"]
+        last_hour = (
+            datetime.fromisoformat(checkpoint["last_hour"])
+            if checkpoint["last_hour"] is not None
+            else None
+        )
+        total: float = checkpoint["sum"]
+        metadata = StatisticMetaData(
+            has_mean=False,
+            has_sum=True,
+            name=f"Energy consumption log ({mac[-5:]})",
+            source=DOMAIN,
+            statistic_id=statistic_id,
+            unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        )
+        LOGGER.debug(
+            "Backfill energy logs %s to %s of node %s",
+            str(log_address),
+            str(last_address),
+            mac,
+        )
+        complete = True
+        while self._enabled and complete and log_address <= last_address:
+            batch = range(
+                log_address, min(log_address + BACKFILL_BATCH_SIZE, last_address + 1)
+            )
+            pages = await asyncio.gather(
+                *(
+                    self._api_stick.async_request_energy_log(mac, address)
+                    for address in batch
+                )
+            )
+            statistics: list[StatisticData] = []
+            for address, slots in zip(batch, pages):
+                if slots is None:
+                    LOGGER.debug(
+                        "Backfill of node %s interrupted at energy log %s",
+                        mac,
+                        str(address),
+                    )
+                    complete = False
+                    break
+                for log_date, pulses in sorted(slots):
+                    # Each slot holds the pulses of the hour before its timestamp
+                    hour_end = log_date.replace(tzinfo=dt_util.UTC)
+                    if last_hour is not None and hour_end <= last_hour:
+                        continue
+                    energy = node.pulses_to_kws(pulses, 3600)
+                    total += energy
+                    statistics.append(
+                        StatisticData(
+                            start=hour_end - timedelta(hours=1),
+                            state=energy,
+                            sum=total,
+                        )
+                    )
+                    last_hour = hour_end
+                if len(slots) < 4:
+                    # Page is still being filled, read it again next time
+                    complete = False
+                    break
+                log_address = address + 1
+            if statistics:
+                async_add_external_statistics(self._hass, metadata, statistics)
+            self._checkpoints[mac] = {
+                "log_address": log_address,
+                "last_hour": last_hour.isoformat() if last_hour is not None else None,
+                "sum": total,
+            }
+            await self._store.async_save(self._checkpoints)
+
+    async def _async_initial_checkpoint(
+        self, statistic_id: str, last_address: int
+    ) -> dict[str, Any]:
+        """Return the checkpoint of a node without one, continue existing statistics."""
+        last_stats = await get_instance(self._hass).async_add_executor_job(
+            get_last_statistics, self._hass, 1, statistic_id, True, {"sum"}
+        )
+        checkpoint: dict[str, Any] = {
+            "log_address": max(last_address - BACKFILL_INITIAL_PAGES, 0),
+            "last_hour": None,
+            "sum": 0.0,
+        }
+        if stats := last_stats.get(statistic_id):
+            checkpoint["last_hour"] = (
+                dt_util.utc_from_timestamp(stats[0]["start"]) + timedelta(hours=1)
+            ).isoformat()
+            checkpoint["sum"] = stats[0]["sum"] or 0.0
+        return checkpoint
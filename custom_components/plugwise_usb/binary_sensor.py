@@ -1,15 +1,21 @@
 """Plugwise USB Binary Sensor component for Home Assistant."""
 from __future__ import annotations
 
+import asyncio
+
 from homeassistant.components.binary_sensor import BinarySensorEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
 from homeassistant.helpers import entity_platform
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from plugwise_usb.nodes import PlugwiseNode
 
-from . import PlugwiseUSBEntity
+from . import PlugwiseUSBEntity, async_add_node_entities
 from .const import (
     ATTR_SCAN_DAYLIGHT_MODE,
     ATTR_SCAN_RESET_TIMER,
@@ -19,17 +25,29 @@ from .const import (
     ATTR_SED_MAINTENANCE_INTERVAL,
     ATTR_SED_SLEEP_FOR,
     ATTR_SED_STAY_ACTIVE,
-    CB_NEW_NODE,
+    ATTR_TIMEOUT,
     DOMAIN,
     LOGGER,
+    POWER_HISTORY,
+    SED_COMMAND_BATTERY_CONFIG,
+    SED_COMMAND_SCAN_CONFIG,
+    SED_COMMANDS,
     SERVICE_USB_SCAN_CONFIG,
     SERVICE_USB_SCAN_CONFIG_SCHEMA,
     SERVICE_USB_SED_BATTERY_CONFIG,
     SERVICE_USB_SED_BATTERY_CONFIG_SCHEMA,
     STICK,
+    USB_AVAILABLE_ID,
     USB_MOTION_ID,
+    USB_POWER_ID,
+)
+from .history import PlugwiseUSBPowerHistory, PowerHistory
+from .models import (
+    PW_BINARY_SENSOR_TYPES,
+    PW_POWER_HISTORY_BINARY_SENSOR_TYPES,
+    PlugwiseBinarySensorEntityDescription,
 )
-from .models import PW_BINARY_SENSOR_TYPES, PlugwiseBinarySensorEntityDescription
+from .sed_commands import PlugwiseUSBSedCommands
 
 # mypy: disable-error-code="union-attr"
 
@@ -45,21 +63,31 @@ async def async_setup_entry(
     """Set up Plugwise USB binary sensor based on config_entry."""
     api_stick = hass.data[DOMAIN][config_entry.entry_id][STICK]
     platform = entity_platform.current_platform.get()
+    power_history: PlugwiseUSBPowerHistory = hass.data[DOMAIN][
+        config_entry.entry_id
+    ][POWER_HISTORY]
+    sed_commands: PlugwiseUSBSedCommands = hass.data[DOMAIN][config_entry.entry_id][
+        SED_COMMANDS
+    ]
+
+    @callback
+    def node_binary_sensors(mac: str) -> list[USBBinarySensor]:
+        """Create the plugwise binary sensors of a node."""
+        node = api_stick.devices[mac]
+        entities: list[USBBinarySensor] = [
+            USBBinarySensor(node, description, sed_commands)
+            for description in PW_BINARY_SENSOR_TYPES
+            if description.key in node.features
+        ]
+        if (history := power_history.get(mac)) is not None:
+            entities.extend(
+                [
+                    USBPowerHistoryBinarySensor(node, history, description)
+                    for description in PW_POWER_HISTORY_BINARY_SENSOR_TYPES
+                ]
+            )
 
-    async def async_add_binary_sensors(mac: str):
-        """Add plugwise binary sensors for device."""
-        entities: list[USBBinarySensor] = []
-        entities.extend(
-            [
-                USBBinarySensor(api_stick.devices[mac], description)
-                for description in PW_BINARY_SENSOR_TYPES
-                if description.key in api_stick.devices[mac].features
-            ]
-        )
-        if entities:
-            async_add_entities(entities)
-
-        if USB_MOTION_ID in api_stick.devices[mac].features:
+        if USB_MOTION_ID in node.features:
             LOGGER.debug("Add binary_sensors for %s", mac)
 
             # Register services
@@ -67,41 +95,54 @@ async def async_setup_entry(
                 SERVICE_USB_SCAN_CONFIG,
                 SERVICE_USB_SCAN_CONFIG_SCHEMA,
                 "_service_scan_config",
+                supports_response=SupportsResponse.OPTIONAL,
             )
             # mypy ignore because of error: Item "None" of "Optional[EntityPlatform]" has no attribute "async_register_entity_service" [union-attr]
             platform.async_register_entity_service(
                 SERVICE_USB_SED_BATTERY_CONFIG,
                 SERVICE_USB_SED_BATTERY_CONFIG_SCHEMA,
                 "_service_sed_battery_config",
+                supports_response=SupportsResponse.OPTIONAL,
             )
             # mypy ignore because of error: Item "None" of "Optional[EntityPlatform]" has no attribute "async_register_entity_service" [union-attr]
+        return entities
 
-    for mac in hass.data[DOMAIN][config_entry.entry_id][Platform.BINARY_SENSOR]:
-        hass.async_create_task(async_add_binary_sensors(mac))
-
-    def discoved_device(mac: str):
-        """Add binary sensors for newly discovered device."""
-        hass.async_create_task(async_add_binary_sensors(mac))
-
-    # Listen for discovered nodes
-    api_stick.subscribe_stick_callback(discoved_device, CB_NEW_NODE)
+    async_add_node_entities(
+        hass, config_entry, async_add_entities, node_binary_sensors
+    )
 
 
 class USBBinarySensor(PlugwiseUSBEntity, BinarySensorEntity):  # type: ignore[misc]
     """Representation of a Plugwise USB Binary Sensor."""
 
     def __init__(
-        self, node: PlugwiseNode, description: PlugwiseBinarySensorEntityDescription
+        self,
+        node: PlugwiseNode,
+        description: PlugwiseBinarySensorEntityDescription,
+        sed_commands: PlugwiseUSBSedCommands | None = None,
     ) -> None:
         """Initialize a binary sensor entity."""
         super().__init__(node, description)
-
-    @property
-    def is_on(self) -> bool:
-        """Return true if the binary_sensor is on."""
-        return getattr(self._node, self.entity_description.state_request_method)
-
-    def _service_scan_config(self, **kwargs):
+        self._sed_commands = sed_commands
+
+    def _set_state(self, value: bool) -> None:
+        """Keep the state of the binary sensor."""
+        self._attr_is_on = value
+
+    async def _async_queue_sed_command(
+        self, command: str, arguments: list, timeout: int
+    ) -> ServiceResponse:
+        """Queue a command until the node is awake and wait for its delivery."""
+        delivery = self._sed_commands.async_queue(self._node.mac, command, arguments)
+        if timeout:
+            try:
+                async with asyncio.timeout(timeout):
+                    await asyncio.shield(delivery)
+            except TimeoutError:
+                pass
+        return {"delivered": delivery.done() and not delivery.cancelled()}
+
+    async def _service_scan_config(self, **kwargs) -> ServiceResponse:
         """Service call to configure motion sensor of Scan device."""
         sensitivity_mode = kwargs.get(ATTR_SCAN_SENSITIVITY_MODE)
         reset_timer = kwargs.get(ATTR_SCAN_RESET_TIMER)
@@ -113,9 +154,13 @@ class USBBinarySensor(PlugwiseUSBEntity, BinarySensorEntity):  # type: ignore[mi
             str(reset_timer),
             str(daylight_mode),
         )
-        self._node.Configure_scan(reset_timer, sensitivity_mode, daylight_mode)
+        return await self._async_queue_sed_command(
+            SED_COMMAND_SCAN_CONFIG,
+            [reset_timer, sensitivity_mode, daylight_mode],
+            kwargs[ATTR_TIMEOUT],
+        )
 
-    def _service_sed_battery_config(self, **kwargs):
+    async def _service_sed_battery_config(self, **kwargs) -> ServiceResponse:
         """Configure battery powered (sed) device service call."""
         stay_active = kwargs.get(ATTR_SED_STAY_ACTIVE)
         sleep_for = kwargs.get(ATTR_SED_SLEEP_FOR)
@@ -131,10 +176,28 @@ class USBBinarySensor(PlugwiseUSBEntity, BinarySensorEntity):  # type: ignore[mi
             str(clock_sync),
             str(clock_interval),
         )
-        self._node.Configure_SED(
-            stay_active,
-            maintenance_interval,
-            sleep_for,
-            clock_sync,
-            clock_interval,
+        return await self._async_queue_sed_command(
+            SED_COMMAND_BATTERY_CONFIG,
+            [stay_active, maintenance_interval, sleep_for, clock_sync, clock_interval],
+            kwargs[ATTR_TIMEOUT],
         )
+
+
+class USBPowerHistoryBinarySensor(USBBinarySensor):
+    """Standby detection from the recent power samples of a Plugwise USB node."""
+
+    def __init__(
+        self,
+        node: PlugwiseNode,
+        history: PowerHistory,
+        description: PlugwiseBinarySensorEntityDescription,
+    ) -> None:
+        """Initialize power history binary sensor entity."""
+        self._history = history
+        super().__init__(node, description)
+        # The power history is updated by the same callback, before the sensor
+        self.node_callbacks = (USB_AVAILABLE_ID, USB_POWER_ID)
+
+    def _read_state(self) -> bool | None:
+        """Return the state derived from the power history."""
+        return self._state_accessor(self._history)
@@ -0,0 +1,73 @@
+"""Persistent cache of discovered Plugwise USB nodes."""
+from __future__ import annotations
+
+from collections.abc import Iterable
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import CACHE_SAVE_DELAY, CACHE_STORAGE_VERSION, DOMAIN, LOGGER
+
+
+class PlugwiseUSBNodeCache:
+    """Cache of node metadata of one Plugwise network, keyed by the MAC of the stick.
+
+    The metadata of a node (address, node type, hardware and firmware version)
+    rarely changes, so it is used at startup to create the nodes and their
+    entities without waiting for the network scan.
+    """
+
+    def __init__(self, hass: HomeAssistant, stick_mac: str) -> None:
+        """Initialize the node cache."""
+        self._store: Store[dict[str, dict[str, Any]]] = Store(
+            hass, CACHE_STORAGE_VERSION, f"{DOMAIN}.{stick_mac}.nodes"
+        )
+        self._nodes: dict[str, dict[str, Any]] = {}
+
+    @property
+    def nodes(self) -> dict[str, dict[str, Any]]:
+        """Return the cached metadata of all nodes."""
+        return self._nodes
+
+    async def async_load(self) -> dict[str, dict[str, Any]]:
+        """Load the cached node metadata from disk."""
+        if (nodes := await self._store.async_load()) is not None:
+            self._nodes = nodes
+        LOGGER.debug("Loaded %s nodes from discovery cache", str(len(self._nodes)))
+        return self._nodes
+
+    async def async_remove(self) -> None:
+        """Remove the cache from disk."""
+        await self._store.async_remove()
+
+    @callback
+    def async_update_node(self, mac: str, metadata: dict[str, Any]) -> None:
+        """Update the metadata of a node, only save when it has changed."""
+        if self._nodes.get(mac) == metadata:
+            return
+        LOGGER.debug("Update discovery cache for node %s", mac)
+        self._nodes[mac] = metadata
+        self._store.async_delay_save(self._data_to_save, CACHE_SAVE_DELAY)
+
+    @callback
+    def async_remove_node(self, mac: str) -> None:
+        """Remove a node which left the network from the cache."""
+        if self._nodes.pop(mac, None) is not None:
+            LOGGER.debug("Remove node %s from discovery cache", mac)
+            self._store.async_delay_save(self._data_to_save, CACHE_SAVE_DELAY)
+
+    @callback
+    def async_retain_nodes(self, macs: Iterable[str]) -> None:
+        """Remove cached nodes which are no longer registered."""
+        registered = set(macs)
+        if removed := [mac for mac in self._nodes if mac not in registered]:
+            LOGGER.debug("Remove unregistered nodes %s from discovery cache", removed)
+            for mac in removed:
+                del self._nodes[mac]
+            self._store.async_delay_save(self._data_to_save, CACHE_SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict[str, dict[str, Any]]:
+        """Return the data to store."""
+        return self._nodes
@@ -0,0 +1,95 @@
+"""Coalescing of state writes for Plugwise USB entities."""
+from __future__ import annotations
+
+from asyncio import TimerHandle
+import time
+from typing import TYPE_CHECKING
+
+from homeassistant.core import HomeAssistant, callback
+
+from .metrics import PlugwiseUSBMetrics
+
+if TYPE_CHECKING:
+    from . import PlugwiseUSBEntity
+
+
+class PlugwiseUSBUpdateCoalescer:
+    """Collect dirty entities from node callbacks and write their state in batches.
+
+    Instead of writing the state for every node callback, entities are marked
+    dirty and flushed at most once per window. The time from the first
+    callback to the state write is passed to the metrics.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        window: float,
+        metrics: PlugwiseUSBMetrics | None = None,
+    ) -> None:
+        """Initialize the update coalescer."""
+        self._hass = hass
+        self._window = window
+        self._metrics = metrics
+        self._dirty: dict[PlugwiseUSBEntity, float] = {}
+        self._flush_pending = False
+        self._flush_timer: TimerHandle | None = None
+        self.updates_received = 0
+        self.writes_performed = 0
+
+    @property
+    def window(self) -> float:
+        """Return the flush window in seconds."""
+        return self._window
+
+    @window.setter
+    def window(self, window: float) -> None:
+        """Set the flush window in seconds, applied from the next flush on."""
+        self._window = window
+
+    @callback
+    def mark_dirty(self, entity: PlugwiseUSBEntity) -> None:
+        """Mark entity for a state write."""
+        self.updates_received += 1
+        self._dirty.setdefault(entity, time.monotonic())
+        if self._flush_pending:
+            return
+        self._flush_pending = True
+        self._hass.loop.call_soon(self._async_schedule_flush)
+
+    @callback
+    def async_discard(self, entity: PlugwiseUSBEntity) -> None:
+        """Forget a pending state write for entity."""
+        self._dirty.pop(entity, None)
+
+    @callback
+    def _async_schedule_flush(self) -> None:
+        """Flush now or after the configured window."""
+        if self._window > 0:
+            self._flush_timer = self._hass.loop.call_later(
+                self._window, self._async_flush
+            )
+        else:
+            self._async_flush()
+
+    @callback
+    def _async_flush(self) -> None:
+        """Write the state of all dirty entities."""
+        self._flush_timer = None
+        dirty = self._dirty
+        self._dirty = {}
+        self._flush_pending = False
+        for entity, marked in dirty.items():
+            entity.async_write_ha_state()
+            self.writes_performed += 1
+            if self._metrics is not None:
+                self._metrics.record_state_write(time.monotonic() - marked)
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Cancel a pending flush."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        self._dirty = {}
+        self._flush_pending = False
@@ -1,15 +1,18 @@
 """Config flow for Plugwise USB integration."""
 from __future__ import annotations
 
+import asyncio
+from dataclasses import dataclass
+import time
 from typing import Any
 
 import serial.tools.list_ports
 import voluptuous as vol
 
 from homeassistant.components import usb
-from homeassistant.config_entries import ConfigFlow
+from homeassistant.config_entries import ConfigEntry, ConfigFlow, OptionsFlow
 from homeassistant.const import CONF_BASE
-from homeassistant.core import callback
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
 from plugwise_usb import Stick
 from plugwise_usb.exceptions import (
@@ -19,7 +22,49 @@ from plugwise_usb.exceptions import (
     TimeoutException,
 )
 
-from .const import CONF_MANUAL_PATH, CONF_USB_PATH, DOMAIN
+from .const import (
+    CONF_AUTO_DETECT,
+    CONF_DEADBAND,
+    CONF_DEADBAND_MODE,
+    CONF_DISCOVERY_CONCURRENCY,
+    CONF_ENERGY_BACKFILL,
+    CONF_ENERGY_RECONCILE_INTERVAL,
+    CONF_LOCAL_ENERGY,
+    CONF_MANUAL_PATH,
+    CONF_MESSAGE_BUDGET,
+    CONF_POLL_INTERVAL,
+    CONF_POWER_EXPORT,
+    CONF_POWER_EXPORT_FILES,
+    CONF_POWER_EXPORT_MAX_SIZE,
+    CONF_PUBLISH_MAX_INTERVAL,
+    CONF_PUBLISH_MIN_INTERVAL,
+    CONF_RELAY_CONCURRENCY,
+    CONF_UPDATE_WINDOW,
+    CONF_USB_PATH,
+    DEADBAND_ABSOLUTE,
+    DEADBAND_RELATIVE,
+    DEADBAND_TYPES,
+    DEFAULT_DEADBAND,
+    DEFAULT_DISCOVERY_CONCURRENCY,
+    DEFAULT_ENERGY_BACKFILL,
+    DEFAULT_ENERGY_RECONCILE_INTERVAL,
+    DEFAULT_LOCAL_ENERGY,
+    DEFAULT_MESSAGE_BUDGET,
+    DEFAULT_POLL_INTERVALS,
+    DEFAULT_POWER_EXPORT,
+    DEFAULT_POWER_EXPORT_FILES,
+    DEFAULT_POWER_EXPORT_MAX_SIZE,
+    DEFAULT_PUBLISH_MAX_INTERVAL,
+    DEFAULT_PUBLISH_MIN_INTERVAL,
+    DEFAULT_UPDATE_WINDOW,
+    DOMAIN,
+    PROBE_CACHE,
+    PROBE_CACHE_TIME,
+    PROBE_TIMEOUT,
+    RELAY_SWITCH_CONCURRENCY,
+    STICK_USB_PID,
+    STICK_USB_VID,
+)
 
 
 @callback
@@ -31,6 +76,26 @@ def plugwise_stick_entries(hass):
     return sticks
 
 
+@callback
+def serial_ports_in_use(hass: HomeAssistant) -> set[str]:
+    """Return the serial ports in the config entries of other integrations.
+
+    Integrations store their port under their own key, like ZHA in a nested
+    device dict, so all device paths in the entry data are collected.
+    """
+    in_use: set[str] = set()
+    for entry in hass.config_entries.async_entries():
+        if entry.domain == DOMAIN:
+            continue
+        values = list(entry.data.values())
+        while values:
+            if isinstance(value := values.pop(), dict):
+                values.extend(value.values())
+            elif isinstance(value, str) and value.startswith("/dev/"):
+                in_use.add(value)
+    return in_use
+
+
 async def validate_usb_connection(self, device_path=None) -> tuple[dict[str, str], Any]:
     """Test if device_path is a real Plugwise USB-Stick."""
     errors = {}
@@ -56,11 +121,84 @@ async def validate_usb_connection(self, device_path=None) -> tuple[dict[str, str
     return errors, api_stick
 
 
+@dataclass
+class StickProbe:
+    """Result of probing a serial port for a Plugwise USB-stick."""
+
+    device_path: str
+    mac: str | None = None
+    error: str | None = None
+    response_time: float = 0.0
+
+
+def _probe_port(device_path: str) -> StickProbe:
+    """Probe a serial port for a Plugwise USB-stick, runs in the executor."""
+    probe = StickProbe(device_path)
+    api_stick = Stick(device_path)
+    start = time.monotonic()
+    try:
+        api_stick.connect()
+        api_stick.initialize_stick(timeout=PROBE_TIMEOUT)
+    except PortError:
+        probe.error = "cannot_connect"
+    except StickInitError:
+        probe.error = "stick_init"
+    except NetworkDown:
+        probe.error = "network_down"
+    except TimeoutException:
+        probe.error = "network_timeout"
+    finally:
+        probe.response_time = time.monotonic() - start
+        api_stick.disconnect()
+    # The stick reports its MAC address also when its network is down
+    probe.mac = api_stick.mac
+    return probe
+
+
+async def async_probe_port(hass: HomeAssistant, device_path: str) -> StickProbe:
+    """Probe a serial port for a Plugwise USB-stick.
+
+    Concurrent flows share a running probe and the result is reused for
+    PROBE_CACHE_TIME seconds, so each port is only opened once.
+    """
+    probes: dict[str, asyncio.Future[StickProbe]] = hass.data.setdefault(
+        PROBE_CACHE, {}
+    )
+    if (probe := probes.get(device_path)) is None:
+        probe = probes[device_path] = hass.async_add_executor_job(
+            _probe_port, device_path
+        )
+        hass.loop.call_later(PROBE_CACHE_TIME, probes.pop, device_path, None)
+    return await asyncio.shield(probe)
+
+
+def rank_sticks(probes: list[StickProbe]) -> list[StickProbe]:
+    """Return the probed ports with a Plugwise USB-stick, the best first.
+
+    Sticks with an online network go before sticks with an error, then the
+    fastest responding stick goes first.
+    """
+    return sorted(
+        (probe for probe in probes if probe.mac is not None),
+        key=lambda probe: (probe.error is not None, probe.response_time),
+    )
+
+
 class PlugwiseUSBConfigFlow(ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Plugwise USB."""
 
     VERSION = 1
 
+    def __init__(self) -> None:
+        """Initialize the config flow."""
+        self._sticks: dict[str, StickProbe] = {}
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: ConfigEntry) -> OptionsFlow:
+        """Get the options flow for this handler."""
+        return PlugwiseUSBOptionsFlowHandler(config_entry)
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
@@ -72,6 +210,7 @@ class PlugwiseUSBConfigFlow(ConfigFlow, domain=DOMAIN):
             + (f" - {p.manufacturer}" if p.manufacturer else "")
             for p in ports
         ]
+        list_of_ports.append(CONF_AUTO_DETECT)
         list_of_ports.append(CONF_MANUAL_PATH)
 
         if user_input is not None:
@@ -79,6 +218,8 @@ class PlugwiseUSBConfigFlow(ConfigFlow, domain=DOMAIN):
 
             if user_selection == CONF_MANUAL_PATH:
                 return await self.async_step_manual_path()
+            if user_selection == CONF_AUTO_DETECT:
+                return await self.async_step_auto_detect()
 
             port = ports[list_of_ports.index(user_selection)]
             device_path = await self.hass.async_add_executor_job(
@@ -87,6 +228,9 @@ class PlugwiseUSBConfigFlow(ConfigFlow, domain=DOMAIN):
             errors, api_stick = await validate_usb_connection(self.hass, device_path)
             if not errors:
                 await self.async_set_unique_id(api_stick.mac)
+                self._abort_if_unique_id_configured(
+                    updates={CONF_USB_PATH: device_path}
+                )
                 return self.async_create_entry(
                     title="Stick", data={CONF_USB_PATH: device_path}
                 )
@@ -98,6 +242,103 @@ class PlugwiseUSBConfigFlow(ConfigFlow, domain=DOMAIN):
             errors=errors,
         )
 
+    async def async_step_auto_detect(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Step to select a Plugwise USB-stick found by probing the serial ports.
+
+        Only ports with the FTDI chip of the USB-stick are probed, ports of
+        other integrations are left alone.
+        """
+        if user_input is not None:
+            return await self._async_create_stick_entry(
+                self._sticks[user_input[CONF_USB_PATH]]
+            )
+
+        ports = await self.hass.async_add_executor_job(serial.tools.list_ports.comports)
+        device_paths = await asyncio.gather(
+            *(
+                self.hass.async_add_executor_job(usb.get_serial_by_id, port.device)
+                for port in ports
+                if port.vid == STICK_USB_VID and port.pid == STICK_USB_PID
+            )
+        )
+        configured = {
+            *plugwise_stick_entries(self.hass),
+            *serial_ports_in_use(self.hass),
+        }
+        probes = await asyncio.gather(
+            *(
+                async_probe_port(self.hass, device_path)
+                for device_path in dict.fromkeys(device_paths)
+                if device_path not in configured
+            )
+        )
+        configured_macs = self._async_current_ids()
+        self._sticks = {
+            probe.device_path: probe
+            for probe in rank_sticks(probes)
+            if probe.mac not in configured_macs
+        }
+        if not self._sticks:
+            return self.async_abort(reason="no_devices_found")
+        sticks = {
+            device_path: f"{device_path} - {probe.mac}"
+            + (f" ({probe.error})" if probe.error else "")
+            for device_path, probe in self._sticks.items()
+        }
+        return self.async_show_form(
+            step_id="auto_detect",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_USB_PATH, default=next(iter(sticks))
+                    ): vol.In(sticks)
+                }
+            ),
+        )
+
+    async def async_step_usb(self, discovery_info: usb.UsbServiceInfo) -> FlowResult:
+        """Handle a serial port discovered by the usb integration."""
+        device_path = await self.hass.async_add_executor_job(
+            usb.get_serial_by_id, discovery_info.device
+        )
+        if device_path in plugwise_stick_entries(self.hass):
+            return self.async_abort(reason="already_configured")
+        probe = await async_probe_port(self.hass, device_path)
+        if probe.mac is None:
+            return self.async_abort(reason="not_plugwise_stick")
+        await self.async_set_unique_id(probe.mac)
+        self._abort_if_unique_id_configured(updates={CONF_USB_PATH: device_path})
+        self._sticks = {device_path: probe}
+        self.context["title_placeholders"] = {"mac": probe.mac}
+        return await self.async_step_usb_confirm()
+
+    async def async_step_usb_confirm(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Confirm the setup of a discovered Plugwise USB-stick."""
+        probe = next(iter(self._sticks.values()))
+        if user_input is not None:
+            return await self._async_create_stick_entry(probe)
+        self._set_confirm_only()
+        return self.async_show_form(
+            step_id="usb_confirm",
+            description_placeholders={
+                CONF_USB_PATH: probe.device_path,
+                "mac": probe.mac,
+            },
+        )
+
+    async def _async_create_stick_entry(self, probe: StickProbe) -> FlowResult:
+        """Create the entry of a probed Plugwise USB-stick."""
+        await self.async_set_unique_id(probe.mac)
+        self._abort_if_unique_id_configured(updates={CONF_USB_PATH: probe.device_path})
+        self.hass.data.get(PROBE_CACHE, {}).pop(probe.device_path, None)
+        return self.async_create_entry(
+            title="Stick", data={CONF_USB_PATH: probe.device_path}
+        )
+
     async def async_step_manual_path(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
@@ -110,6 +351,9 @@ class PlugwiseUSBConfigFlow(ConfigFlow, domain=DOMAIN):
             errors, api_stick = await validate_usb_connection(self.hass, device_path)
             if not errors:
                 await self.async_set_unique_id(api_stick.mac)
+                self._abort_if_unique_id_configured(
+                    updates={CONF_USB_PATH: device_path}
+                )
                 return self.async_create_entry(
                     title="Stick", data={CONF_USB_PATH: device_path}
                 )
@@ -124,3 +368,152 @@ class PlugwiseUSBConfigFlow(ConfigFlow, domain=DOMAIN):
             ),
             errors=errors,
         )
+
+
+class PlugwiseUSBOptionsFlowHandler(OptionsFlow):
+    """Handle the options of a Plugwise USB-stick."""
+
+    def __init__(self, config_entry: ConfigEntry) -> None:
+        """Initialize options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Select the options to manage."""
+        return self.async_show_menu(
+            step_id="init",
+            menu_options=["performance", "sensor_updates", "power_export"],
+        )
+
+    async def async_step_performance(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the polling, coalescing, concurrency and energy settings."""
+        if user_input is not None:
+            return self.async_create_entry(
+                title="", data={**self.config_entry.options, **user_input}
+            )
+
+        options = self.config_entry.options
+        schema: dict[vol.Marker, Any] = {
+            vol.Optional(
+                CONF_MESSAGE_BUDGET,
+                default=options.get(CONF_MESSAGE_BUDGET, DEFAULT_MESSAGE_BUDGET),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+        }
+        for request, default in DEFAULT_POLL_INTERVALS.items():
+            poll_interval = f"{CONF_POLL_INTERVAL}_{request}"
+            schema[
+                vol.Optional(poll_interval, default=options.get(poll_interval, default))
+            ] = vol.All(vol.Coerce(int), vol.Range(min=1))
+        schema.update(
+            {
+                vol.Optional(
+                    CONF_UPDATE_WINDOW,
+                    default=options.get(CONF_UPDATE_WINDOW, DEFAULT_UPDATE_WINDOW),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                vol.Optional(
+                    CONF_DISCOVERY_CONCURRENCY,
+                    default=options.get(
+                        CONF_DISCOVERY_CONCURRENCY, DEFAULT_DISCOVERY_CONCURRENCY
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                vol.Optional(
+                    CONF_RELAY_CONCURRENCY,
+                    default=options.get(
+                        CONF_RELAY_CONCURRENCY, RELAY_SWITCH_CONCURRENCY
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+                vol.Optional(
+                    CONF_ENERGY_BACKFILL,
+                    default=options.get(CONF_ENERGY_BACKFILL, DEFAULT_ENERGY_BACKFILL),
+                ): bool,
+                vol.Optional(
+                    CONF_LOCAL_ENERGY,
+                    default=options.get(CONF_LOCAL_ENERGY, DEFAULT_LOCAL_ENERGY),
+                ): bool,
+                vol.Optional(
+                    CONF_ENERGY_RECONCILE_INTERVAL,
+                    default=options.get(
+                        CONF_ENERGY_RECONCILE_INTERVAL,
+                        DEFAULT_ENERGY_RECONCILE_INTERVAL,
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=5, max=1440)),
+            }
+        )
+        return self.async_show_form(
+            step_id="performance", data_schema=vol.Schema(schema)
+        )
+
+    async def async_step_sensor_updates(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the filtering of sensor updates."""
+        if user_input is not None:
+            return self.async_create_entry(
+                title="", data={**self.config_entry.options, **user_input}
+            )
+
+        options = self.config_entry.options
+        schema: dict[vol.Marker, Any] = {}
+        for deadband_type in DEADBAND_TYPES:
+            deadband = f"{CONF_DEADBAND}_{deadband_type}"
+            deadband_mode = f"{CONF_DEADBAND_MODE}_{deadband_type}"
+            schema[
+                vol.Optional(deadband, default=options.get(deadband, DEFAULT_DEADBAND))
+            ] = vol.All(vol.Coerce(float), vol.Range(min=0))
+            schema[
+                vol.Optional(
+                    deadband_mode, default=options.get(deadband_mode, DEADBAND_ABSOLUTE)
+                )
+            ] = vol.In([DEADBAND_ABSOLUTE, DEADBAND_RELATIVE])
+        schema[
+            vol.Optional(
+                CONF_PUBLISH_MIN_INTERVAL,
+                default=options.get(
+                    CONF_PUBLISH_MIN_INTERVAL, DEFAULT_PUBLISH_MIN_INTERVAL
+                ),
+            )
+        ] = vol.All(vol.Coerce(int), vol.Range(min=0))
+        schema[
+            vol.Optional(
+                CONF_PUBLISH_MAX_INTERVAL,
+                default=options.get(
+                    CONF_PUBLISH_MAX_INTERVAL, DEFAULT_PUBLISH_MAX_INTERVAL
+                ),
+            )
+        ] = vol.All(vol.Coerce(int), vol.Range(min=0))
+        return self.async_show_form(
+            step_id="sensor_updates", data_schema=vol.Schema(schema)
+        )
+
+    async def async_step_power_export(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the export of power samples to local files."""
+        if user_input is not None:
+            return self.async_create_entry(
+                title="", data={**self.config_entry.options, **user_input}
+            )
+
+        options = self.config_entry.options
+        schema = {
+            vol.Optional(
+                CONF_POWER_EXPORT,
+                default=options.get(CONF_POWER_EXPORT, DEFAULT_POWER_EXPORT),
+            ): bool,
+            vol.Optional(
+                CONF_POWER_EXPORT_MAX_SIZE,
+                default=options.get(
+                    CONF_POWER_EXPORT_MAX_SIZE, DEFAULT_POWER_EXPORT_MAX_SIZE
+                ),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+            vol.Optional(
+                CONF_POWER_EXPORT_FILES,
+                default=options.get(CONF_POWER_EXPORT_FILES, DEFAULT_POWER_EXPORT_FILES),
+            ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+        }
+        return self.async_show_form(
+            step_id="power_export", data_schema=vol.Schema(schema)
+        )
@@ -5,17 +5,24 @@ from typing import Final
 
 import voluptuous as vol
 
-from homeassistant.const import Platform
+from homeassistant.const import ATTR_ENTITY_ID, Platform
 from homeassistant.helpers import config_validation as cv
 
 DOMAIN: Final = "plugwise_usb"
 
 LOGGER = logging.getLogger(__package__)
 
+COALESCER: Final = "coalescer"
 COORDINATOR: Final = "coordinator"
+FORWARDED_PLATFORMS: Final = "forwarded_platforms"
+MOTION_EVENTS: Final = "motion_events"
+SCHEDULER: Final = "scheduler"
+CONF_AUTO_DETECT: Final = "Detect automatically"
 CONF_MANUAL_PATH: Final = "Enter Manually"
 GATEWAY: Final = "gateway"
+PUBLISH_FILTER: Final = "publish_filter"
 STICK: Final = "stick"
+SUPERVISOR: Final = "supervisor"
 USB: Final = "usb"
 
 UNDO_UPDATE_LISTENER: Final = "undo_update_listener"
@@ -67,29 +74,205 @@ PLATFORMS_USB: Final[list[str]] = [
     Platform.SWITCH,
 ]
 CONF_USB_PATH: Final = "usb_path"
+# Probe results of serial ports are reused for a minute, the init request
+# of a probe gets a short timeout
+PROBE_CACHE: Final = "plugwise_usb_probes"
+PROBE_CACHE_TIME: Final = 60
+PROBE_TIMEOUT: Final = 3
+# USB ids of the FTDI chip of the USB-stick, like the manifest
+STICK_USB_VID: Final = 0x0403
+STICK_USB_PID: Final = 0x6001
+CONF_UPDATE_WINDOW: Final = "update_window"
+
+CONF_DISCOVERY_CONCURRENCY: Final = "discovery_concurrency"
+CONF_ENERGY_BACKFILL: Final = "energy_backfill"
+CONF_ENERGY_RECONCILE_INTERVAL: Final = "energy_reconcile_interval"
+CONF_LOCAL_ENERGY: Final = "local_energy"
+CONF_MESSAGE_BUDGET: Final = "message_budget"
+# Suffixed with the poll request like poll_interval_power
+CONF_POLL_INTERVAL: Final = "poll_interval"
+CONF_POWER_EXPORT: Final = "power_export"
+CONF_POWER_EXPORT_FILES: Final = "power_export_files"
+CONF_POWER_EXPORT_MAX_SIZE: Final = "power_export_max_size"
+CONF_RELAY_CONCURRENCY: Final = "relay_concurrency"
+
+# Window in seconds to coalesce entity state writes
+DEFAULT_UPDATE_WINDOW: Final = 0.25
+
+# Node discovery
+DEFAULT_DISCOVERY_CONCURRENCY: Final = 4
+DISCOVERY_TIMEOUT: Final = 45
+DISCOVERY_RETRY_MIN_INTERVAL: Final = 60
+DISCOVERY_RETRY_MAX_INTERVAL: Final = 3600
+NODE_SCAN_TIMEOUT: Final = 120
+# Delay in seconds to collect discovered nodes into one batch of new entities
+NEW_NODE_BATCH_DELAY: Final = 1.0
+
+# Polling of nodes
+POLL_ENERGY: Final = "energy"
+POLL_PING: Final = "ping"
+POLL_POWER: Final = "power"
+
+DEFAULT_MESSAGE_BUDGET: Final = 2.0
+# Shortest poll interval of each request in the sensor descriptions, the
+# poll_interval options scale all intervals of a request by the same factor
+DEFAULT_POLL_INTERVALS: Final[dict[str, float]] = {
+    POLL_POWER: 10,
+    POLL_ENERGY: 300,
+    POLL_PING: 300,
+}
+POLL_ADAPTIVE_MAX_FACTOR: Final = 6
+POLL_AVAILABILITY_INTERVAL: Final = 300
+POLL_POWER_FLOOR: Final = 10.0
+POLL_REBALANCE_INTERVAL: Final = timedelta(seconds=30)
+POLL_STARTUP_SPREAD: Final = 30
+POLL_TICK_INTERVAL: Final = timedelta(seconds=1)
+POLL_UNAVAILABLE_INTERVAL: Final = 60
+POLL_VARIABILITY_HIGH: Final = 0.2
+POLL_VARIABILITY_SMOOTHING: Final = 0.3
+
+# Classes of requests in the send queue, in order of precedence
+REQUEST_CLASS_COMMAND: Final = "command"
+REQUEST_CLASS_CONFIG: Final = "config"
+REQUEST_CLASS_POLL: Final = "poll"
+
+# Seconds to wait until the USB-stick accepted a request before it is resent
+STICK_ACCEPT_TIMEOUT: Final = 1
+
+# Supervision of the connection to the USB-stick
+CONNECTION_CHECK_INTERVAL: Final = timedelta(seconds=5)
+RECONNECT_MIN_INTERVAL: Final = 1
+RECONNECT_MAX_INTERVAL: Final = 60
+
+# Instrumentation of the message traffic
+METRICS_SAMPLE_INTERVAL: Final = timedelta(seconds=30)
+
+# Filtering of sensor updates before their state is written, the deadband
+# options are suffixed with the deadband type like deadband_power
+CONF_DEADBAND: Final = "deadband"
+CONF_DEADBAND_MODE: Final = "deadband_mode"
+CONF_PUBLISH_MIN_INTERVAL: Final = "publish_min_interval"
+CONF_PUBLISH_MAX_INTERVAL: Final = "publish_max_interval"
+DEADBAND_ABSOLUTE: Final = "absolute"
+DEADBAND_RELATIVE: Final = "relative"
+DEADBAND_ENERGY: Final = "energy"
+DEADBAND_PING: Final = "ping"
+DEADBAND_POWER: Final = "power"
+DEADBAND_RSSI: Final = "rssi"
+DEADBAND_TYPES: Final = (DEADBAND_POWER, DEADBAND_ENERGY, DEADBAND_RSSI, DEADBAND_PING)
+DEFAULT_DEADBAND: Final = 0.0
+DEFAULT_PUBLISH_MIN_INTERVAL: Final = 0
+DEFAULT_PUBLISH_MAX_INTERVAL: Final = 900
+
+# Discovery cache
+CACHE: Final = "cache"
+CACHE_SAVE_DELAY: Final = 10
+CACHE_STORAGE_VERSION: Final = 1
+
+# Energy log backfill into long-term statistics
+BACKFILL: Final = "backfill"
+DEFAULT_ENERGY_BACKFILL: Final = True
+BACKFILL_BATCH_SIZE: Final = 4
+BACKFILL_CONCURRENCY: Final = 1
+BACKFILL_INITIAL_PAGES: Final = 42
+BACKFILL_STORAGE_VERSION: Final = 1
+ENERGY_LOG_TIMEOUT: Final = 60
+
+# Export of power samples to local line protocol files
+POWER_EXPORT: Final = "power_export"
+DEFAULT_POWER_EXPORT: Final = False
+DEFAULT_POWER_EXPORT_FILES: Final = 5
+# Maximum size of a single export file in MiB
+DEFAULT_POWER_EXPORT_MAX_SIZE: Final = 16
+POWER_EXPORT_BATCH_SIZE: Final = 500
+POWER_EXPORT_DIRECTORY: Final = "plugwise_usb_export"
+POWER_EXPORT_QUEUE_SIZE: Final = 10000
+# Seconds to wait for the writer to take the stop signal and finish
+POWER_EXPORT_STOP_TIMEOUT: Final = 10
+
+# Power history of nodes
+POWER_HISTORY: Final = "power_history"
+# Ring buffer size in samples, 17 minutes of samples at the highest poll rate
+POWER_HISTORY_SIZE: Final = 1024
+# Windows in seconds of the mean power sensors, peak and minimum cover the last
+POWER_HISTORY_WINDOWS: Final = (60, 300, 900)
+STANDBY_POWER_THRESHOLD: Final = 5.0
+STANDBY_WINDOW: Final = 300
+
+# Energy integrated from the power samples of nodes
+LOCAL_ENERGY: Final = "local_energy"
+DEFAULT_LOCAL_ENERGY: Final = False
+# Minutes between the reconciliations with the energy counter of the Circle
+DEFAULT_ENERGY_RECONCILE_INTERVAL: Final = 60
+# Samples further apart are not integrated, the counter fills in the gap
+LOCAL_ENERGY_MAX_GAP: Final = 600
+# Bounds and smoothing of the correction factor of the integrated energy
+LOCAL_ENERGY_CORRECTION_MAX: Final = 1.5
+LOCAL_ENERGY_CORRECTION_MIN: Final = 0.5
+LOCAL_ENERGY_CORRECTION_SMOOTHING: Final = 0.3
+LOCAL_ENERGY_SAVE_DELAY: Final = 60
+LOCAL_ENERGY_STORAGE_VERSION: Final = 1
 
 # Callback types
 CB_NEW_NODE: Final = "NEW_NODE"
 CB_JOIN_REQUEST: Final = "JOIN_REQUEST"
+CB_NODE_INFO: Final = "NODE_INFO"
+CB_NODE_CALIBRATION: Final = "NODE_CALIBRATION"
 
 
 # USB generic device constants
 USB_AVAILABLE_ID: Final = "available"
+USB_POLL_BUDGET_ID: Final = "poll_budget"
+USB_POWER_ID: Final = "power_1s"
+USB_LOCAL_ENERGY_ID: Final = "energy_local"
+USB_STANDBY_ID: Final = "standby"
 
 ATTR_MAC_ADDRESS: Final = "mac"
+ATTR_RECEIVED: Final = "received"
+ATTR_STICK: Final = "stick"
 
 SERVICE_USB_DEVICE_ADD: Final = "device_add"
+SERVICE_USB_DEVICE_ADD_SCHEMA: Final = vol.Schema(
+    {
+        vol.Required(ATTR_MAC_ADDRESS): cv.string,
+        vol.Optional(ATTR_STICK): cv.string,
+    }
+)
 SERVICE_USB_DEVICE_REMOVE: Final = "device_remove"
 SERVICE_USB_DEVICE_SCHEMA: Final = vol.Schema(
     {vol.Required(ATTR_MAC_ADDRESS): cv.string}
 )
+SERVICE_USB_MOVE_NODE: Final = "move_node"
+SERVICE_USB_MOVE_NODE_SCHEMA: Final = vol.Schema(
+    {
+        vol.Required(ATTR_MAC_ADDRESS): cv.string,
+        vol.Required(ATTR_STICK): cv.string,
+    }
+)
+
+ATTR_RELAY_STATE: Final = "state"
+
+SERVICE_USB_SET_RELAYS: Final = "set_relays"
+SERVICE_USB_SET_RELAYS_SCHEMA: Final = vol.All(
+    vol.Schema(
+        {
+            vol.Optional(ATTR_MAC_ADDRESS): vol.All(cv.ensure_list, [cv.string]),
+            vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+            vol.Required(ATTR_RELAY_STATE): cv.boolean,
+        }
+    ),
+    cv.has_at_least_one_key(ATTR_MAC_ADDRESS, ATTR_ENTITY_ID),
+)
 
 
 # USB Relay device constants
 USB_RELAY_ID: Final = "relay"
+RELAY_SWITCH_CONCURRENCY: Final = 8
+RELAY_SWITCH_TIMEOUT: Final = 10
 
 
 # USB SED (battery powered) device constants
+ATTR_TIMEOUT: Final = "timeout"
 ATTR_SED_STAY_ACTIVE: Final = "stay_active"
 ATTR_SED_SLEEP_FOR: Final = "sleep_for"
 ATTR_SED_MAINTENANCE_INTERVAL: Final = "maintenance_interval"
@@ -111,12 +294,31 @@ SERVICE_USB_SED_BATTERY_CONFIG_SCHEMA: Final = {
     vol.Required(ATTR_SED_CLOCK_INTERVAL): vol.All(
         vol.Coerce(int), vol.Range(min=60, max=10080)
     ),
+    vol.Optional(ATTR_TIMEOUT, default=0): vol.All(
+        vol.Coerce(int), vol.Range(min=0, max=86400)
+    ),
 }
 
+# Commands queued until a battery powered node is awake
+SED_COMMANDS: Final = "sed_commands"
+SED_COMMAND_BATTERY_CONFIG: Final = "battery_config"
+SED_COMMAND_SCAN_CONFIG: Final = "scan_config"
+SED_COMMANDS_SAVE_DELAY: Final = 10
+SED_COMMANDS_STORAGE_VERSION: Final = 1
+
 
 # USB Scan device constants
 USB_MOTION_ID: Final = "motion"
 
+# Motion events fired straight from the received frame of a Scan
+EVENT_MOTION: Final = f"{DOMAIN}_motion"
+# Frames of nodes which were not discovered yet are processed later, older
+# frames only update the motion state and fire no event
+MOTION_EVENT_MAX_AGE: Final = timedelta(seconds=1)
+TRIGGER_MOTION: Final = "motion"
+TRIGGER_NO_MOTION: Final = "no_motion"
+TRIGGER_TYPES: Final = (TRIGGER_MOTION, TRIGGER_NO_MOTION)
+
 ATTR_SCAN_DAYLIGHT_MODE: Final = "day_light"
 ATTR_SCAN_SENSITIVITY_MODE: Final = "sensitivity_mode"
 ATTR_SCAN_RESET_TIMER: Final = "reset_timer"
@@ -131,12 +333,13 @@ SCAN_SENSITIVITY_MODES = [
 ]
 
 SERVICE_USB_SCAN_CONFIG: Final = "configure_scan"
-SERVICE_USB_SCAN_CONFIG_SCHEMA = (
-    {
-        vol.Required(ATTR_SCAN_SENSITIVITY_MODE): vol.In(SCAN_SENSITIVITY_MODES),
-        vol.Required(ATTR_SCAN_RESET_TIMER): vol.All(
-            vol.Coerce(int), vol.Range(min=1, max=240)
-        ),
-        vol.Required(ATTR_SCAN_DAYLIGHT_MODE): cv.boolean,
-    },
-)
+SERVICE_USB_SCAN_CONFIG_SCHEMA: Final = {
+    vol.Required(ATTR_SCAN_SENSITIVITY_MODE): vol.In(SCAN_SENSITIVITY_MODES),
+    vol.Required(ATTR_SCAN_RESET_TIMER): vol.All(
+        vol.Coerce(int), vol.Range(min=1, max=240)
+    ),
+    vol.Required(ATTR_SCAN_DAYLIGHT_MODE): cv.boolean,
+    vol.Optional(ATTR_TIMEOUT, default=0): vol.All(
+        vol.Coerce(int), vol.Range(min=0, max=86400)
+    ),
+}
@@ -0,0 +1,76 @@
+"""Device triggers of Plugwise USB Scan nodes."""
+from __future__ import annotations
+
+import voluptuous as vol
+
+from homeassistant.components.device_automation import DEVICE_TRIGGER_BASE_SCHEMA
+from homeassistant.components.device_automation.exceptions import DeviceNotFound
+from homeassistant.components.homeassistant.triggers import event as event_trigger
+from homeassistant.const import (
+    CONF_DEVICE_ID,
+    CONF_DOMAIN,
+    CONF_EVENT,
+    CONF_PLATFORM,
+    CONF_TYPE,
+)
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.trigger import TriggerActionType, TriggerInfo
+from homeassistant.helpers.typing import ConfigType
+
+from . import async_connected_sticks, async_stick_of_node
+from .const import DOMAIN, EVENT_MOTION, TRIGGER_TYPES, USB_MOTION_ID
+
+TRIGGER_SCHEMA = DEVICE_TRIGGER_BASE_SCHEMA.extend(
+    {
+        vol.Required(CONF_DOMAIN): DOMAIN,
+        vol.Required(CONF_DEVICE_ID): str,
+        vol.Required(CONF_TYPE): vol.In(TRIGGER_TYPES),
+    }
+)
+
+
+async def async_get_triggers(
+    hass: HomeAssistant, device_id: str
+) -> list[dict[str, str]]:
+    """List the motion triggers of a Scan."""
+    device_entry = dr.async_get(hass).async_get(device_id)
+    if device_entry is None:
+        raise DeviceNotFound(f"Device ID {device_id} is not valid")
+    for domain, mac in device_entry.identifiers:
+        if domain != DOMAIN or (entry_id := async_stick_of_node(hass, mac)) is None:
+            continue
+        node = async_connected_sticks(hass)[entry_id].devices.get(mac)
+        if node is not None and USB_MOTION_ID in node.features:
+            return [
+                {
+                    CONF_PLATFORM: "device",
+                    CONF_DOMAIN: DOMAIN,
+                    CONF_DEVICE_ID: device_id,
+                    CONF_TYPE: trigger_type,
+                }
+                for trigger_type in TRIGGER_TYPES
+            ]
+    return []
+
+
+async def async_attach_trigger(
+    hass: HomeAssistant,
+    config: ConfigType,
+    action: TriggerActionType,
+    trigger_info: TriggerInfo,
+) -> CALLBACK_TYPE:
+    """Attach a trigger to the motion events of a Scan."""
+    event_config = event_trigger.TRIGGER_SCHEMA(
+        {
+            event_trigger.CONF_PLATFORM: CONF_EVENT,
+            event_trigger.CONF_EVENT_TYPE: EVENT_MOTION,
+            event_trigger.CONF_EVENT_DATA: {
+                CONF_TYPE: config[CONF_TYPE],
+                CONF_DEVICE_ID: config[CONF_DEVICE_ID],
+            },
+        }
+    )
+    return await event_trigger.async_attach_trigger(
+        hass, event_config, action, trigger_info, platform_type="device"
+    )
@@ -0,0 +1,89 @@
+"""Diagnostics support for Plugwise USB."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .coalescer import PlugwiseUSBUpdateCoalescer
+from .const import COALESCER, DOMAIN, POWER_EXPORT, SCHEDULER, STICK
+from .export import PlugwiseUSBPowerExport
+from .scheduler import PlugwiseUSBPollScheduler
+from .stick import PlugwiseUSBStick
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, config_entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics of the message traffic of a Plugwise USB-stick."""
+    api_stick: PlugwiseUSBStick = hass.data[DOMAIN][config_entry.entry_id][STICK]
+    coalescer: PlugwiseUSBUpdateCoalescer = hass.data[DOMAIN][config_entry.entry_id][
+        COALESCER
+    ]
+    scheduler: PlugwiseUSBPollScheduler = hass.data[DOMAIN][config_entry.entry_id][
+        SCHEDULER
+    ]
+    power_export: PlugwiseUSBPowerExport = hass.data[DOMAIN][config_entry.entry_id][
+        POWER_EXPORT
+    ]
+    sticks: dict[str, PlugwiseUSBStick] = {
+        entry_data[STICK].mac or entry_id: entry_data[STICK]
+        for entry_id, entry_data in hass.data[DOMAIN].items()
+    }
+    return {
+        "entry": {
+            "data": dict(config_entry.data),
+            "options": dict(config_entry.options),
+        },
+        "stick": {
+            "mac": api_stick.mac,
+            "circle_plus_mac": api_stick.circle_plus_mac,
+            "connected": api_stick.connected,
+            "nodes": len(api_stick.devices),
+            "registered_nodes": len(api_stick.registered_nodes),
+        },
+        "metrics": api_stick.metrics.as_dict(),
+        "queue": {
+            "pending": api_stick.queue_pending,
+            "wait": {
+                request_class: vars(statistics)
+                for request_class, statistics in api_stick.queue_wait.items()
+            },
+        },
+        "coalescer": {
+            "window": coalescer.window,
+            "updates_received": coalescer.updates_received,
+            "writes_performed": coalescer.writes_performed,
+        },
+        "scheduler": {
+            "message_budget": scheduler.message_budget,
+            "utilization": scheduler.utilization,
+            "intervals": {
+                mac: scheduler.intervals(mac) for mac in list(api_stick.devices)
+            },
+        },
+        "power_export": power_export.as_dict(),
+        "all_sticks": {
+            "sticks": {
+                stick_mac: {
+                    "nodes": len(stick.devices),
+                    "sent": stick.metrics.sent,
+                    "received": stick.metrics.received,
+                    "timeouts": stick.metrics.timeouts,
+                    "queue_depth": stick.metrics.queue_depth,
+                }
+                for stick_mac, stick in sticks.items()
+            },
+            "totals": {
+                "nodes": sum(len(stick.devices) for stick in sticks.values()),
+                "sent": sum(stick.metrics.sent for stick in sticks.values()),
+                "received": sum(stick.metrics.received for stick in sticks.values()),
+                "retries": sum(stick.metrics.retries for stick in sticks.values()),
+                "timeouts": sum(stick.metrics.timeouts for stick in sticks.values()),
+                "queue_depth": sum(
+                    stick.metrics.queue_depth for stick in sticks.values()
+                ),
+            },
+        },
+    }
@@ -0,0 +1,247 @@
+"""Energy of Plugwise USB nodes integrated from their power samples."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import time
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import Store
+from plugwise_usb.nodes import PlugwiseNode
+
+from .const import (
+    DEFAULT_ENERGY_RECONCILE_INTERVAL,
+    DOMAIN,
+    LOCAL_ENERGY_CORRECTION_MAX,
+    LOCAL_ENERGY_CORRECTION_MIN,
+    LOCAL_ENERGY_CORRECTION_SMOOTHING,
+    LOCAL_ENERGY_MAX_GAP,
+    LOCAL_ENERGY_SAVE_DELAY,
+    LOCAL_ENERGY_STORAGE_VERSION,
+    LOGGER,
+    USB_POWER_ID,
+)
+from .stick import PlugwiseUSBStick
+
+
+class EnergyIntegrator:
+    """Energy consumption of a node integrated from its power samples.
+
+    Consecutive samples are integrated with the trapezoidal rule and scaled
+    by a correction factor. Each reconciliation compares the energy counter
+    of the Circle with the integrated energy since the previous one. The
+    correction factor follows their ratio to remove the drift of sampling,
+    and the difference is settled in the total. Energy integrated above the
+    counter is withheld from the following samples instead of subtracted, so
+    the total never decreases.
+    """
+
+    def __init__(self, state: dict[str, Any] | None = None) -> None:
+        """Initialize the integrator, optionally from a stored state."""
+        state = state or {}
+        self.total: float = state.get("total", 0.0)
+        self.correction: float = state.get("correction", 1.0)
+        self._withheld: float = state.get("withheld", 0.0)
+        self._counter: float | None = state.get("counter")
+        # Raw and corrected energy integrated since the last reconciliation
+        self._raw: float = state.get("raw", 0.0)
+        self._integrated: float = state.get("integrated", 0.0)
+        self._last_sample: tuple[float, float] | None = None
+
+    def add(self, power: float, timestamp: float | None = None) -> None:
+        """Integrate a power sample in W."""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if self._last_sample is not None:
+            last_power, last_timestamp = self._last_sample
+            if 0 < (seconds := timestamp - last_timestamp) <= LOCAL_ENERGY_MAX_GAP:
+                # Production is not part of the consumption
+                energy = max(power + last_power, 0) / 2 * seconds / 3600000
+                self._raw += energy
+                self._integrated += energy * self.correction
+                self._increase(energy * self.correction)
+        self._last_sample = (power, timestamp)
+
+    def _increase(self, energy: float) -> None:
+        """Add energy to the total after settling the withheld energy."""
+        settled = min(self._withheld, energy)
+        self._withheld -= settled
+        self.total += energy - settled
+
+    def reconcile(self, counter: float) -> None:
+        """Settle the integrated energy with the energy counter in kWh.
+
+        The counter may restart from zero, like the energy consumption of
+        today at midnight.
+        """
+        if self._counter is None:
+            delta = None
+        elif counter >= self._counter:
+            delta = counter - self._counter
+        else:
+            delta = counter
+        self._counter = counter
+        raw, integrated = self._raw, self._integrated
+        self._raw = self._integrated = 0.0
+        if delta is None:
+            return
+        if raw > 0 and delta > 0:
+            ratio = min(
+                max(delta / raw, LOCAL_ENERGY_CORRECTION_MIN),
+                LOCAL_ENERGY_CORRECTION_MAX,
+            )
+            self.correction += LOCAL_ENERGY_CORRECTION_SMOOTHING * (
+                ratio - self.correction
+            )
+        if (error := delta - integrated) >= 0:
+            self._increase(error)
+        else:
+            self._withheld -= error
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state to store."""
+        return {
+            "total": self.total,
+            "correction": self.correction,
+            "withheld": self._withheld,
+            "counter": self._counter,
+            "raw": self._raw,
+            "integrated": self._integrated,
+        }
+
+
+class PlugwiseUSBLocalEnergy:
+    """Integrate the energy of all nodes of a stick from their power samples.
+
+    The integrators are fed by the power_1s callback of the node and are
+    reconciled with the energy consumption of today of the Circle every
+    reconcile interval. Their state is stored, so the totals continue after
+    a restart and the energy used while offline on the same day is settled
+    at the first reconciliation.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api_stick: PlugwiseUSBStick,
+        stick_mac: str,
+        reconcile_interval: int = DEFAULT_ENERGY_RECONCILE_INTERVAL,
+    ) -> None:
+        """Initialize the local energy, the reconcile interval is in minutes."""
+        self._hass = hass
+        self._api_stick = api_stick
+        self._store = self._energy_store(hass, stick_mac)
+        self._stored: dict[str, dict[str, Any]] = {}
+        self._integrators: dict[str, EnergyIntegrator] = {}
+        self._subscriptions: dict[str, tuple[PlugwiseNode, Any]] = {}
+        self._reconcile_interval = reconcile_interval
+        self._unsub_reconcile: CALLBACK_TYPE | None = None
+
+    @staticmethod
+    def _energy_store(
+        hass: HomeAssistant, stick_mac: str
+    ) -> Store[dict[str, dict[str, Any]]]:
+        """Return the store of the integrators of one Plugwise network."""
+        return Store(
+            hass, LOCAL_ENERGY_STORAGE_VERSION, f"{DOMAIN}.{stick_mac}.energy"
+        )
+
+    @classmethod
+    async def async_remove(cls, hass: HomeAssistant, stick_mac: str) -> None:
+        """Remove the integrators of a Plugwise network from disk."""
+        await cls._energy_store(hass, stick_mac).async_remove()
+
+    async def async_load(self) -> None:
+        """Load the integrators from disk and start reconciling."""
+        if (stored := await self._store.async_load()) is not None:
+            self._stored = stored
+        self._async_track_reconcile()
+
+    @property
+    def reconcile_interval(self) -> int:
+        """Return the minutes between reconciliations."""
+        return self._reconcile_interval
+
+    @reconcile_interval.setter
+    def reconcile_interval(self, reconcile_interval: int) -> None:
+        """Set the minutes between reconciliations."""
+        if reconcile_interval != self._reconcile_interval:
+            self._reconcile_interval = reconcile_interval
+            self._async_track_reconcile()
+
+    def get(self, mac: str) -> EnergyIntegrator | None:
+        """Return the energy integrator of a node."""
+        return self._integrators.get(mac)
+
+    @callback
+    def async_add_node(self, mac: str) -> None:
+        """Start integrating the energy of a node."""
+        if (
+            mac in self._integrators
+            or (node := self._api_stick.devices.get(mac)) is None
+            or not node.measures_power
+        ):
+            return
+        integrator = self._integrators[mac] = EnergyIntegrator(self._stored.get(mac))
+
+        def power_sample(_: Any) -> None:
+            if node.available and (power := node.current_power_usage) is not None:
+                integrator.add(power)
+
+        if node.subscribe_callback(power_sample, USB_POWER_ID):
+            self._subscriptions[mac] = (node, power_sample)
+
+    @callback
+    def async_remove_node(self, mac: str) -> None:
+        """Stop integrating the energy of a node and forget its integrator."""
+        self._integrators.pop(mac, None)
+        self._stored.pop(mac, None)
+        if (subscription := self._subscriptions.pop(mac, None)) is not None:
+            node, power_sample = subscription
+            node.unsubscribe_callback(power_sample, USB_POWER_ID)
+
+    async def async_stop(self) -> None:
+        """Stop integrating and store the integrators."""
+        if self._unsub_reconcile is not None:
+            self._unsub_reconcile()
+            self._unsub_reconcile = None
+        for node, power_sample in self._subscriptions.values():
+            node.unsubscribe_callback(power_sample, USB_POWER_ID)
+        self._subscriptions.clear()
+        await self._store.async_save(self._data_to_save())
+
+    @callback
+    def _async_track_reconcile(self) -> None:
+        """Reconcile every reconcile interval."""
+        if self._unsub_reconcile is not None:
+            self._unsub_reconcile()
+        self._unsub_reconcile = async_track_time_interval(
+            self._hass,
+            self._async_reconcile,
+            timedelta(minutes=self._reconcile_interval),
+        )
+
+    @callback
+    def _async_reconcile(self, _: datetime | None = None) -> None:
+        """Settle the integrators with the energy counters of the Circles."""
+        for mac, integrator in self._integrators.items():
+            if (
+                (node := self._api_stick.devices.get(mac)) is None
+                or not node.available
+                or (counter := node.energy_consumption_today) is None
+            ):
+                continue
+            integrator.reconcile(counter)
+        LOGGER.debug("Reconciled the local energy of %s nodes", len(self._integrators))
+        self._store.async_delay_save(self._data_to_save, LOCAL_ENERGY_SAVE_DELAY)
+
+    def _data_to_save(self) -> dict[str, dict[str, Any]]:
+        """Return the state of all integrators, including nodes not known yet."""
+        return {
+            **self._stored,
+            **{
+                mac: integrator.as_dict()
+                for mac, integrator in self._integrators.items()
+            },
+        }
@@ -0,0 +1,210 @@
+"""Export of Plugwise USB power samples to local line protocol files."""
+from __future__ import annotations
+
+from functools import partial
+import os
+import queue
+import threading
+import time
+from typing import Any, TextIO
+
+from homeassistant.core import HomeAssistant, callback
+from plugwise_usb.nodes import PlugwiseNode
+
+from .const import (
+    DEFAULT_POWER_EXPORT_FILES,
+    DEFAULT_POWER_EXPORT_MAX_SIZE,
+    LOGGER,
+    POWER_EXPORT_BATCH_SIZE,
+    POWER_EXPORT_DIRECTORY,
+    POWER_EXPORT_QUEUE_SIZE,
+    POWER_EXPORT_STOP_TIMEOUT,
+    USB_POWER_ID,
+)
+from .stick import PlugwiseUSBStick
+
+
+class PlugwiseUSBPowerExport:
+    """Stream the power samples of all nodes to append-only files.
+
+    The recorder is too heavy to keep a sample per second of every node.
+    The power callback of a node only puts a line in InfluxDB line protocol
+    on a bounded queue, it never blocks the event loop and drops the
+    sample when the writer falls behind. A writer thread appends the lines
+    in batches and rotates the file when it grows beyond the maximum size,
+    only the newest files are kept.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api_stick: PlugwiseUSBStick,
+        stick_mac: str,
+        max_size: float = DEFAULT_POWER_EXPORT_MAX_SIZE,
+        max_files: int = DEFAULT_POWER_EXPORT_FILES,
+    ) -> None:
+        """Initialize the power export, max_size is in MiB."""
+        self._hass = hass
+        self._api_stick = api_stick
+        self.path = hass.config.path(
+            POWER_EXPORT_DIRECTORY, f"power_{stick_mac.lower()}.lp"
+        )
+        self.max_size = max_size
+        self.max_files = max_files
+        self.exported = 0
+        self.dropped = 0
+        self._enabled = False
+        self._queue: queue.Queue[str | None] = queue.Queue(POWER_EXPORT_QUEUE_SIZE)
+        self._subscriptions: dict[str, tuple[PlugwiseNode, partial[None]]] = {}
+        self._writer: threading.Thread | None = None
+
+    @property
+    def enabled(self) -> bool:
+        """Return True if power samples are exported."""
+        return self._enabled
+
+    @callback
+    def async_add_node(self, mac: str) -> None:
+        """Subscribe to the power samples of a node."""
+        if (
+            mac in self._subscriptions
+            or (node := self._api_stick.devices.get(mac)) is None
+            or not node.measures_power
+        ):
+            return
+        sample = partial(self._sample, node)
+        if node.subscribe_callback(sample, USB_POWER_ID):
+            self._subscriptions[mac] = (node, sample)
+
+    @callback
+    def async_remove_node(self, mac: str) -> None:
+        """Unsubscribe from the power samples of a node."""
+        if (subscription := self._subscriptions.pop(mac, None)) is not None:
+            node, sample = subscription
+            node.unsubscribe_callback(sample, USB_POWER_ID)
+
+    async def async_set_enabled(self, enabled: bool) -> None:
+        """Start or stop the export of power samples."""
+        if enabled == self._enabled:
+            return
+        if enabled:
+            if not await self._hass.async_add_executor_job(self._start_writer):
+                return
+            self._enabled = True
+            LOGGER.debug("Export power samples to %s", self.path)
+        else:
+            self._enabled = False
+            await self._hass.async_add_executor_job(self._stop_writer)
+
+    async def async_stop(self) -> None:
+        """Unsubscribe from all nodes and stop the writer."""
+        for node, sample in self._subscriptions.values():
+            node.unsubscribe_callback(sample, USB_POWER_ID)
+        self._subscriptions.clear()
+        await self.async_set_enabled(False)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state of the export for diagnostics."""
+        return {
+            "enabled": self._enabled,
+            "path": self.path,
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize(),
+        }
+
+    def _sample(self, node: PlugwiseNode, _: Any) -> None:
+        """Queue the power sample of a node."""
+        if (
+            not self._enabled
+            or not node.available
+            or (power_1s := node.current_power_usage) is None
+        ):
+            return
+        fields = f"power_1s={power_1s}"
+        if (power_8s := node.current_power_usage_8_sec) is not None:
+            fields += f",power_8s={power_8s}"
+        try:
+            self._queue.put_nowait(f"power,mac={node.mac} {fields} {time.time_ns()}\n")
+        except queue.Full:
+            self.dropped += 1
+
+    def _start_writer(self) -> bool:
+        """Open the export file and start the writer thread."""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            file = open(self.path, "a", encoding="utf-8")
+        except OSError as error:
+            LOGGER.error("Failed to open power export file %s: %s", self.path, error)
+            return False
+        self._writer = threading.Thread(
+            None, self._write_loop, "power_export_thread", (file,), {}
+        )
+        self._writer.daemon = True
+        self._writer.start()
+        return True
+
+    def _stop_writer(self) -> None:
+        """Write the queued samples and stop the writer thread."""
+        if (writer := self._writer) is None:
+            return
+        self._writer = None
+        if writer.is_alive():
+            try:
+                self._queue.put(None, timeout=POWER_EXPORT_STOP_TIMEOUT)
+            except queue.Full:
+                LOGGER.warning("Power export writer did not take the stop signal")
+                return
+            writer.join(POWER_EXPORT_STOP_TIMEOUT)
+            return
+        # The writer failed, the queued samples are not written anymore
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self.dropped += 1
+
+    def _write_loop(self, file: TextIO) -> None:
+        """Append the queued lines to the export file until stopped.
+
+        The export is disabled when a rotated export file cannot be opened.
+        """
+        try:
+            stopped = False
+            while not stopped:
+                lines = [self._queue.get()]
+                while len(lines) < POWER_EXPORT_BATCH_SIZE:
+                    try:
+                        lines.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if None in lines:
+                    stopped = True
+                    lines = [line for line in lines if line is not None]
+                try:
+                    file.writelines(lines)
+                    file.flush()
+                except OSError as error:
+                    LOGGER.warning("Failed to export power samples: %s", error)
+                    self.dropped += len(lines)
+                    continue
+                self.exported += len(lines)
+                if file.tell() >= self.max_size * 1024 * 1024:
+                    file.close()
+                    self._rotate()
+                    file = open(self.path, "a", encoding="utf-8")
+        except OSError as error:
+            LOGGER.error("Failed to rotate power export file %s: %s", self.path, error)
+            self._enabled = False
+        finally:
+            file.close()
+
+    def _rotate(self) -> None:
+        """Shift the export files by one and remove the oldest."""
+        for index in range(self.max_files - 1, 0, -1):
+            source = f"{self.path}.{index - 1}" if index > 1 else self.path
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index}")
+        if os.path.exists(self.path):
+            os.remove(self.path)
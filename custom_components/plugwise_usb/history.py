@@ -0,0 +1,189 @@
+"""Recent power history of Plugwise USB nodes."""
+from __future__ import annotations
+
+from array import array
+from collections import deque
+import time
+from typing import Any
+
+from homeassistant.core import callback
+from plugwise_usb.nodes import PlugwiseNode
+
+from .const import (
+    POWER_HISTORY_SIZE,
+    POWER_HISTORY_WINDOWS,
+    STANDBY_POWER_THRESHOLD,
+    STANDBY_WINDOW,
+    USB_POWER_ID,
+)
+from .stick import PlugwiseUSBStick
+
+
+class PowerHistory:
+    """Recent power samples of a node in a fixed size ring buffer.
+
+    Samples and their timestamps are kept in preallocated arrays. A running
+    sum per window gives the mean, monotonic queues of sample positions give
+    the peak and minimum of the longest window. Each sample updates all
+    statistics in amortized O(1), nothing is recalculated on read.
+    """
+
+    def __init__(
+        self,
+        size: int = POWER_HISTORY_SIZE,
+        windows: tuple[int, ...] = POWER_HISTORY_WINDOWS,
+    ) -> None:
+        """Initialize an empty power history, windows are in seconds."""
+        self._size = size
+        self._windows = windows
+        self._values = array("d", bytes(8 * size))
+        self._timestamps = array("d", bytes(8 * size))
+        # Positions count all samples ever added, the slot is position % size
+        self._next = 0
+        self._first_timestamp: float | None = None
+        self._starts = dict.fromkeys(windows, 0)
+        self._sums = dict.fromkeys(windows, 0.0)
+        self._peaks: deque[int] = deque()
+        self._minimums: deque[int] = deque()
+
+    def add(self, value: float, timestamp: float | None = None) -> None:
+        """Add a power sample."""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        position = self._next
+        self._next += 1
+        if self._first_timestamp is None:
+            self._first_timestamp = timestamp
+        for window in self._windows:
+            # The slot of the oldest sample is about to be overwritten
+            if self._starts[window] <= position - self._size:
+                self._evict(window)
+        slot = position % self._size
+        self._values[slot] = value
+        self._timestamps[slot] = timestamp
+        for window in self._windows:
+            self._sums[window] += value
+            while self._timestamps[self._starts[window] % self._size] <= (
+                timestamp - window
+            ):
+                self._evict(window)
+        while self._peaks and self._value(self._peaks[-1]) <= value:
+            self._peaks.pop()
+        self._peaks.append(position)
+        while self._minimums and self._value(self._minimums[-1]) >= value:
+            self._minimums.pop()
+        self._minimums.append(position)
+        start = self._starts[self._windows[-1]]
+        while self._peaks[0] < start:
+            self._peaks.popleft()
+        while self._minimums[0] < start:
+            self._minimums.popleft()
+
+    def _value(self, position: int) -> float:
+        """Return the sample at a position."""
+        return self._values[position % self._size]
+
+    def _evict(self, window: int) -> None:
+        """Remove the oldest sample from a window."""
+        self._sums[window] -= self._value(self._starts[window])
+        self._starts[window] += 1
+
+    def mean(self, window: int) -> float | None:
+        """Return the mean power of a window."""
+        if not (samples := self._next - self._starts[window]):
+            return None
+        return self._sums[window] / samples
+
+    def covers(self, window: int) -> bool:
+        """Return True if the samples span at least the window."""
+        return self._first_timestamp is not None and (
+            self._timestamps[(self._next - 1) % self._size]
+            - self._first_timestamp
+            >= window
+        )
+
+    @property
+    def mean_1m(self) -> float | None:
+        """Return the mean power of the last minute."""
+        return self.mean(self._windows[0])
+
+    @property
+    def mean_5m(self) -> float | None:
+        """Return the mean power of the last 5 minutes."""
+        return self.mean(self._windows[1])
+
+    @property
+    def mean_15m(self) -> float | None:
+        """Return the mean power of the last 15 minutes."""
+        return self.mean(self._windows[2])
+
+    @property
+    def peak(self) -> float | None:
+        """Return the highest power of the longest window."""
+        return self._value(self._peaks[0]) if self._peaks else None
+
+    @property
+    def minimum(self) -> float | None:
+        """Return the lowest power of the longest window."""
+        return self._value(self._minimums[0]) if self._minimums else None
+
+    @property
+    def standby(self) -> bool | None:
+        """Return True if the load stayed on but used standby power only."""
+        if (mean := self.mean(STANDBY_WINDOW)) is None or not self.covers(
+            STANDBY_WINDOW
+        ):
+            return None
+        return 0 < mean <= STANDBY_POWER_THRESHOLD
+
+
+class PlugwiseUSBPowerHistory:
+    """Keep the power history of all nodes of a stick.
+
+    The history is fed by the power_1s callback of the node. It subscribes
+    before the entities of the node are created, so derived sensors which
+    subscribe to the same callback read the history including the sample.
+    """
+
+    def __init__(self, api_stick: PlugwiseUSBStick) -> None:
+        """Initialize the power histories."""
+        self._api_stick = api_stick
+        self._histories: dict[str, PowerHistory] = {}
+        self._subscriptions: dict[str, tuple[PlugwiseNode, Any]] = {}
+
+    def get(self, mac: str) -> PowerHistory | None:
+        """Return the power history of a node."""
+        return self._histories.get(mac)
+
+    @callback
+    def async_add_node(self, mac: str) -> None:
+        """Start keeping the power history of a node."""
+        if (
+            mac in self._histories
+            or (node := self._api_stick.devices.get(mac)) is None
+            or not node.measures_power
+        ):
+            return
+        history = self._histories[mac] = PowerHistory()
+
+        def power_sample(_: Any) -> None:
+            if node.available and (power := node.current_power_usage) is not None:
+                history.add(power)
+
+        if node.subscribe_callback(power_sample, USB_POWER_ID):
+            self._subscriptions[mac] = (node, power_sample)
+
+    @callback
+    def async_remove_node(self, mac: str) -> None:
+        """Stop keeping the power history of a node."""
+        self._histories.pop(mac, None)
+        if (subscription := self._subscriptions.pop(mac, None)) is not None:
+            node, power_sample = subscription
+            node.unsubscribe_callback(power_sample, USB_POWER_ID)
+
+    @callback
+    def async_stop(self) -> None:
+        """Unsubscribe from all nodes."""
+        for node, power_sample in self._subscriptions.values():
+            node.unsubscribe_callback(power_sample, USB_POWER_ID)
+        self._subscriptions.clear()
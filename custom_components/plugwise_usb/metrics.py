@@ -0,0 +1,249 @@
+"""Instrumentation of the message traffic of a Plugwise USB-stick."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+import time
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import METRICS_SAMPLE_INTERVAL
+
+
+@dataclass
+class TimingStatistics:
+    """Durations of one kind of event, in seconds."""
+
+    count: int = 0
+    total: float = 0.0
+    maximum: float = 0.0
+    last: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        """Return the average duration."""
+        return self.total / self.count if self.count else 0.0
+
+    def add(self, duration: float) -> None:
+        """Add the duration of an event."""
+        self.count += 1
+        self.total += duration
+        self.maximum = max(self.maximum, duration)
+        self.last = duration
+
+
+@dataclass
+class NodeMetrics:
+    """Message traffic of a single node."""
+
+    responses: int = 0
+    retries: int = 0
+    timeouts: int = 0
+    response_time: TimingStatistics = field(default_factory=TimingStatistics)
+
+
+class PlugwiseUSBMetrics:
+    """Count and time the messages on the hot path between the stick and Home Assistant.
+
+    Every sample interval the rates and the averages over the last interval
+    are calculated and the listeners are notified.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the metrics."""
+        self._hass = hass
+        self._listeners: list[CALLBACK_TYPE] = []
+        self._unsub_sample: CALLBACK_TYPE | None = None
+        self.queued = 0
+        self.sent = 0
+        self.received = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.published = 0
+        self.suppressed = 0
+        self.queue_depth_max = 0
+        self.motion_latency = TimingStatistics()
+        self.reconnect_time = TimingStatistics()
+        self.response_time = TimingStatistics()
+        self.state_write_latency = TimingStatistics()
+        self.nodes: dict[str, NodeMetrics] = {}
+        self._sampled = time.monotonic()
+        self._last: dict[str, Any] = self._totals()
+        self.sent_rate: float | None = None
+        self.received_rate: float | None = None
+        self.motion_latency_mean: float | None = None
+        self.response_time_mean: float | None = None
+        self.state_write_latency_mean: float | None = None
+        self.suppression_ratio: float | None = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Return the number of requests waiting in the send queue."""
+        return self.queued - self.sent
+
+    @property
+    def last_reconnect_time(self) -> float | None:
+        """Return the seconds the last reconnect took, None without any reconnect."""
+        if not self.reconnect_time.count:
+            return None
+        return round(self.reconnect_time.last, 1)
+
+    def _node(self, mac: str) -> NodeMetrics:
+        """Return the metrics of a node."""
+        if (node := self.nodes.get(mac)) is None:
+            node = self.nodes[mac] = NodeMetrics()
+        return node
+
+    def record_queued(self) -> None:
+        """Record a request put in the send queue."""
+        self.queued += 1
+        self.queue_depth_max = max(self.queue_depth_max, self.queue_depth)
+
+    def record_retry(self, mac: str) -> None:
+        """Record a request sent again because its node did not respond."""
+        self.retries += 1
+        self._node(mac).retries += 1
+
+    def record_sent(self) -> None:
+        """Record a request taken from the send queue to be sent."""
+        self.sent += 1
+
+    def record_received(self, mac: str, response_time: float | None) -> None:
+        """Record a message received from a node, with the time since its request was sent."""
+        self.received += 1
+        node = self._node(mac)
+        node.responses += 1
+        if response_time is not None:
+            self.response_time.add(response_time)
+            node.response_time.add(response_time)
+
+    def record_timeout(self, mac: str) -> None:
+        """Record a request dropped because its node did not respond to any retry."""
+        self.timeouts += 1
+        self._node(mac).timeouts += 1
+
+    def record_state_write(self, latency: float) -> None:
+        """Record the time from a node callback to the state write of its entity."""
+        self.state_write_latency.add(latency)
+
+    def record_publish(self, published: bool) -> None:
+        """Record a sensor update which passed or was suppressed by the publish filter."""
+        if published:
+            self.published += 1
+        else:
+            self.suppressed += 1
+
+    def record_motion_event(self, latency: float) -> None:
+        """Record the time from the receipt of a motion frame to its event."""
+        self.motion_latency.add(latency)
+
+    def record_reconnect(self, duration: float) -> None:
+        """Record the time from the loss of the connection until the stick is initialized again."""
+        self.reconnect_time.add(duration)
+
+    def _totals(self) -> dict[str, Any]:
+        """Return the counters the rates and interval averages are based on."""
+        return {
+            "sent": self.sent,
+            "received": self.received,
+            "response_count": self.response_time.count,
+            "response_total": self.response_time.total,
+            "write_count": self.state_write_latency.count,
+            "write_total": self.state_write_latency.total,
+            "motion_count": self.motion_latency.count,
+            "motion_total": self.motion_latency.total,
+            "published": self.published,
+            "suppressed": self.suppressed,
+        }
+
+    @callback
+    def async_start(self) -> None:
+        """Start sampling."""
+        self._unsub_sample = async_track_time_interval(
+            self._hass, self._async_sample, METRICS_SAMPLE_INTERVAL
+        )
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop sampling."""
+        if self._unsub_sample is not None:
+            self._unsub_sample()
+            self._unsub_sample = None
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Listen for new samples."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def _async_sample(self, _: datetime | None = None) -> None:
+        """Calculate the rates and averages over the last interval."""
+        now = time.monotonic()
+        totals = self._totals()
+        elapsed = now - self._sampled
+        last = self._last
+        self._sampled, self._last = now, totals
+        self.sent_rate = round((totals["sent"] - last["sent"]) / elapsed, 2)
+        self.received_rate = round((totals["received"] - last["received"]) / elapsed, 2)
+        self.response_time_mean = self._interval_mean(
+            totals["response_total"] - last["response_total"],
+            totals["response_count"] - last["response_count"],
+        )
+        self.state_write_latency_mean = self._interval_mean(
+            totals["write_total"] - last["write_total"],
+            totals["write_count"] - last["write_count"],
+        )
+        self.motion_latency_mean = self._interval_mean(
+            totals["motion_total"] - last["motion_total"],
+            totals["motion_count"] - last["motion_count"],
+        )
+        suppressed = totals["suppressed"] - last["suppressed"]
+        if filtered := suppressed + totals["published"] - last["published"]:
+            self.suppression_ratio = round(suppressed / filtered * 100, 1)
+        else:
+            self.suppression_ratio = None
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    @staticmethod
+    def _interval_mean(total: float, count: int) -> float | None:
+        """Return an average duration in milliseconds, None without any event."""
+        return round(total / count * 1000, 1) if count else None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return all metrics for diagnostics."""
+        return {
+            "queued": self.queued,
+            "sent": self.sent,
+            "received": self.received,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "published": self.published,
+            "suppressed": self.suppressed,
+            "suppression_ratio": self.suppression_ratio,
+            "queue_depth": self.queue_depth,
+            "queue_depth_max": self.queue_depth_max,
+            "sent_rate": self.sent_rate,
+            "received_rate": self.received_rate,
+            "motion_latency": vars(self.motion_latency).copy(),
+            "reconnect_time": vars(self.reconnect_time).copy(),
+            "response_time": vars(self.response_time).copy(),
+            "state_write_latency": vars(self.state_write_latency).copy(),
+            "nodes": {
+                mac: {
+                    "responses": node.responses,
+                    "retries": node.retries,
+                    "timeouts": node.timeouts,
+                    "response_time": vars(node.response_time).copy(),
+                }
+                for mac, node in self.nodes.items()
+            },
+        }
@@ -14,6 +14,7 @@ from homeassistant.components.sensor import (
 )
 from homeassistant.components.switch import SwitchDeviceClass, SwitchEntityDescription
 from homeassistant.const import (
+    PERCENTAGE,
     SIGNAL_STRENGTH_DECIBELS_MILLIWATT,
     EntityCategory,
     UnitOfEnergy,
@@ -22,7 +23,20 @@ from homeassistant.const import (
 )
 from homeassistant.helpers.entity import EntityDescription
 
-from .const import USB_MOTION_ID, USB_RELAY_ID
+from .const import (
+    DEADBAND_ENERGY,
+    DEADBAND_PING,
+    DEADBAND_POWER,
+    DEADBAND_RSSI,
+    POLL_ENERGY,
+    POLL_PING,
+    POLL_POWER,
+    USB_LOCAL_ENERGY_ID,
+    USB_MOTION_ID,
+    USB_POLL_BUDGET_ID,
+    USB_RELAY_ID,
+    USB_STANDBY_ID,
+)
 
 
 @dataclass
@@ -31,6 +45,8 @@ class PlugwiseEntityDescription(EntityDescription):
 
     should_poll: bool = False
     state_request_method: str = "dummy"
+    poll_request: str | None = None
+    poll_interval: float = 0
 
 
 @dataclass
@@ -39,6 +55,8 @@ class PlugwiseSensorEntityDescription(
 ):
     """Describes Plugwise sensor entity."""
 
+    deadband: str | None = None
+
 
 @dataclass
 class PlugwiseSwitchEntityDescription(
@@ -61,6 +79,9 @@ PW_SENSOR_TYPES: tuple[PlugwiseSensorEntityDescription, ...] = (
         device_class=SensorDeviceClass.POWER,
         native_unit_of_measurement=UnitOfPower.WATT,
         state_request_method="current_power_usage",
+        poll_request=POLL_POWER,
+        poll_interval=10,
+        deadband=DEADBAND_POWER,
     ),
     PlugwiseSensorEntityDescription(
         key="energy_consumption_today",
@@ -69,6 +90,9 @@ PW_SENSOR_TYPES: tuple[PlugwiseSensorEntityDescription, ...] = (
         state_class=SensorStateClass.TOTAL_INCREASING,
         native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
         state_request_method="energy_consumption_today",
+        poll_request=POLL_POWER,
+        poll_interval=60,
+        deadband=DEADBAND_ENERGY,
     ),
     PlugwiseSensorEntityDescription(
         key="ping",
@@ -76,6 +100,9 @@ PW_SENSOR_TYPES: tuple[PlugwiseSensorEntityDescription, ...] = (
         icon="mdi:speedometer",
         native_unit_of_measurement=UnitOfTime.MILLISECONDS,
         state_request_method="ping",
+        poll_request=POLL_PING,
+        poll_interval=300,
+        deadband=DEADBAND_PING,
         entity_registry_enabled_default=False,
         entity_category=EntityCategory.DIAGNOSTIC,
     ),
@@ -85,6 +112,9 @@ PW_SENSOR_TYPES: tuple[PlugwiseSensorEntityDescription, ...] = (
         device_class=SensorDeviceClass.POWER,
         native_unit_of_measurement=UnitOfPower.WATT,
         state_request_method="current_power_usage_8_sec",
+        poll_request=POLL_POWER,
+        poll_interval=30,
+        deadband=DEADBAND_POWER,
         entity_registry_enabled_default=False,
     ),
     PlugwiseSensorEntityDescription(
@@ -93,6 +123,9 @@ PW_SENSOR_TYPES: tuple[PlugwiseSensorEntityDescription, ...] = (
         device_class=SensorDeviceClass.SIGNAL_STRENGTH,
         native_unit_of_measurement=SIGNAL_STRENGTH_DECIBELS_MILLIWATT,
         state_request_method="rssi_in",
+        poll_request=POLL_PING,
+        poll_interval=300,
+        deadband=DEADBAND_RSSI,
         entity_registry_enabled_default=False,
         entity_category=EntityCategory.DIAGNOSTIC,
     ),
@@ -102,6 +135,9 @@ PW_SENSOR_TYPES: tuple[PlugwiseSensorEntityDescription, ...] = (
         device_class=SensorDeviceClass.SIGNAL_STRENGTH,
         native_unit_of_measurement=SIGNAL_STRENGTH_DECIBELS_MILLIWATT,
         state_request_method="rssi_out",
+        poll_request=POLL_PING,
+        poll_interval=300,
+        deadband=DEADBAND_RSSI,
         entity_registry_enabled_default=False,
         entity_category=EntityCategory.DIAGNOSTIC,
     ),
@@ -111,6 +147,9 @@ PW_SENSOR_TYPES: tuple[PlugwiseSensorEntityDescription, ...] = (
         icon="mdi:lightning-bolt",
         native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
         state_request_method="power_consumption_current_hour",
+        poll_request=POLL_POWER,
+        poll_interval=60,
+        deadband=DEADBAND_ENERGY,
         entity_registry_enabled_default=False,
     ),
     PlugwiseSensorEntityDescription(
@@ -119,6 +158,9 @@ PW_SENSOR_TYPES: tuple[PlugwiseSensorEntityDescription, ...] = (
         icon="mdi:lightning-bolt",
         native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
         state_request_method="power_production_current_hour",
+        poll_request=POLL_POWER,
+        poll_interval=60,
+        deadband=DEADBAND_ENERGY,
         entity_registry_enabled_default=False,
     ),
     PlugwiseSensorEntityDescription(
@@ -127,6 +169,9 @@ PW_SENSOR_TYPES: tuple[PlugwiseSensorEntityDescription, ...] = (
         icon="mdi:lightning-bolt",
         native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
         state_request_method="power_consumption_today",
+        poll_request=POLL_ENERGY,
+        poll_interval=300,
+        deadband=DEADBAND_ENERGY,
         entity_registry_enabled_default=False,
     ),
     PlugwiseSensorEntityDescription(
@@ -136,6 +181,9 @@ PW_SENSOR_TYPES: tuple[PlugwiseSensorEntityDescription, ...] = (
         native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
         state_class=SensorStateClass.TOTAL,
         state_request_method="power_consumption_previous_hour",
+        poll_request=POLL_ENERGY,
+        poll_interval=300,
+        deadband=DEADBAND_ENERGY,
         entity_registry_enabled_default=False,
     ),
     PlugwiseSensorEntityDescription(
@@ -145,8 +193,177 @@ PW_SENSOR_TYPES: tuple[PlugwiseSensorEntityDescription, ...] = (
         native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
         state_class=SensorStateClass.TOTAL,
         state_request_method="power_consumption_yesterday",
+        poll_request=POLL_ENERGY,
+        poll_interval=300,
+        deadband=DEADBAND_ENERGY,
+        entity_registry_enabled_default=False,
+    ),
+)
+
+PW_POLL_SENSOR_TYPES: tuple[PlugwiseSensorEntityDescription, ...] = (
+    PlugwiseSensorEntityDescription(
+        key=USB_POLL_BUDGET_ID,
+        name="Polling budget share",
+        icon="mdi:gauge",
+        native_unit_of_measurement=PERCENTAGE,
+        entity_registry_enabled_default=False,
+        entity_category=EntityCategory.DIAGNOSTIC,
+    ),
+)
+
+# Derived from the power history of a node, state_request_method reads the history
+PW_POWER_HISTORY_SENSOR_TYPES: tuple[PlugwiseSensorEntityDescription, ...] = (
+    PlugwiseSensorEntityDescription(
+        key="power_mean_1m",
+        name="Power usage mean 1 minute",
+        device_class=SensorDeviceClass.POWER,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfPower.WATT,
+        state_request_method="mean_1m",
+        deadband=DEADBAND_POWER,
+        entity_registry_enabled_default=False,
+    ),
+    PlugwiseSensorEntityDescription(
+        key="power_mean_5m",
+        name="Power usage mean 5 minutes",
+        device_class=SensorDeviceClass.POWER,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfPower.WATT,
+        state_request_method="mean_5m",
+        deadband=DEADBAND_POWER,
+        entity_registry_enabled_default=False,
+    ),
+    PlugwiseSensorEntityDescription(
+        key="power_mean_15m",
+        name="Power usage mean 15 minutes",
+        device_class=SensorDeviceClass.POWER,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfPower.WATT,
+        state_request_method="mean_15m",
+        deadband=DEADBAND_POWER,
         entity_registry_enabled_default=False,
     ),
+    PlugwiseSensorEntityDescription(
+        key="power_peak",
+        name="Power usage peak 15 minutes",
+        device_class=SensorDeviceClass.POWER,
+        native_unit_of_measurement=UnitOfPower.WATT,
+        state_request_method="peak",
+        deadband=DEADBAND_POWER,
+        entity_registry_enabled_default=False,
+    ),
+    PlugwiseSensorEntityDescription(
+        key="power_minimum",
+        name="Power usage minimum 15 minutes",
+        device_class=SensorDeviceClass.POWER,
+        native_unit_of_measurement=UnitOfPower.WATT,
+        state_request_method="minimum",
+        deadband=DEADBAND_POWER,
+        entity_registry_enabled_default=False,
+    ),
+)
+
+# Integrated from the power samples of a node, state_request_method reads the integrator
+PW_LOCAL_ENERGY_SENSOR_TYPES: tuple[PlugwiseSensorEntityDescription, ...] = (
+    PlugwiseSensorEntityDescription(
+        key=USB_LOCAL_ENERGY_ID,
+        name="Energy consumption local",
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        state_request_method="total",
+        deadband=DEADBAND_ENERGY,
+    ),
+)
+
+PW_STICK_SENSOR_TYPES: tuple[PlugwiseSensorEntityDescription, ...] = (
+    PlugwiseSensorEntityDescription(
+        key="response_time",
+        name="Response time",
+        icon="mdi:timer-outline",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        state_request_method="response_time_mean",
+        entity_category=EntityCategory.DIAGNOSTIC,
+    ),
+    PlugwiseSensorEntityDescription(
+        key="messages_sent",
+        name="Messages sent",
+        icon="mdi:upload-network",
+        native_unit_of_measurement="msg/s",
+        state_class=SensorStateClass.MEASUREMENT,
+        state_request_method="sent_rate",
+        entity_category=EntityCategory.DIAGNOSTIC,
+    ),
+    PlugwiseSensorEntityDescription(
+        key="messages_received",
+        name="Messages received",
+        icon="mdi:download-network",
+        native_unit_of_measurement="msg/s",
+        state_class=SensorStateClass.MEASUREMENT,
+        state_request_method="received_rate",
+        entity_category=EntityCategory.DIAGNOSTIC,
+    ),
+    PlugwiseSensorEntityDescription(
+        key="retries",
+        name="Retries",
+        icon="mdi:repeat",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        state_request_method="retries",
+        entity_category=EntityCategory.DIAGNOSTIC,
+    ),
+    PlugwiseSensorEntityDescription(
+        key="timeouts",
+        name="Timeouts",
+        icon="mdi:timer-alert-outline",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        state_request_method="timeouts",
+        entity_category=EntityCategory.DIAGNOSTIC,
+    ),
+    PlugwiseSensorEntityDescription(
+        key="queue_depth",
+        name="Queue depth",
+        icon="mdi:tray-full",
+        state_class=SensorStateClass.MEASUREMENT,
+        state_request_method="queue_depth",
+        entity_category=EntityCategory.DIAGNOSTIC,
+    ),
+    PlugwiseSensorEntityDescription(
+        key="suppression_ratio",
+        name="Suppressed updates",
+        icon="mdi:filter-outline",
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        state_request_method="suppression_ratio",
+        entity_category=EntityCategory.DIAGNOSTIC,
+    ),
+    PlugwiseSensorEntityDescription(
+        key="reconnect_time",
+        name="Reconnect time",
+        icon="mdi:usb-port",
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        state_request_method="last_reconnect_time",
+        entity_category=EntityCategory.DIAGNOSTIC,
+    ),
+    PlugwiseSensorEntityDescription(
+        key="state_write_latency",
+        name="State write latency",
+        icon="mdi:timer-outline",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        state_request_method="state_write_latency_mean",
+        entity_category=EntityCategory.DIAGNOSTIC,
+    ),
+    PlugwiseSensorEntityDescription(
+        key="motion_latency",
+        name="Motion event latency",
+        icon="mdi:motion-sensor",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        state_request_method="motion_latency_mean",
+        entity_category=EntityCategory.DIAGNOSTIC,
+    ),
 )
 
 PW_SWITCH_TYPES: tuple[PlugwiseSwitchEntityDescription, ...] = (
@@ -166,3 +383,15 @@ PW_BINARY_SENSOR_TYPES: tuple[PlugwiseBinarySensorEntityDescription, ...] = (
         state_request_method="motion",
     ),
 )
+
+PW_POWER_HISTORY_BINARY_SENSOR_TYPES: tuple[
+    PlugwiseBinarySensorEntityDescription, ...
+] = (
+    PlugwiseBinarySensorEntityDescription(
+        key=USB_STANDBY_ID,
+        name="Standby",
+        icon="mdi:power-sleep",
+        state_request_method="standby",
+        entity_registry_enabled_default=False,
+    ),
+)
@@ -0,0 +1,77 @@
+"""Motion events of Plugwise USB Scan nodes."""
+from __future__ import annotations
+
+from datetime import datetime
+
+from homeassistant.const import ATTR_DEVICE_ID, CONF_TYPE
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr
+
+from .const import (
+    ATTR_MAC_ADDRESS,
+    ATTR_RECEIVED,
+    DOMAIN,
+    EVENT_MOTION,
+    MOTION_EVENT_MAX_AGE,
+    TRIGGER_MOTION,
+    TRIGGER_NO_MOTION,
+)
+from .stick import PlugwiseUSBStick
+
+
+class PlugwiseUSBMotionEvents:
+    """Fire an event for each change of motion reported by a Scan.
+
+    The event is fired from the motion frame itself instead of the state of
+    the motion entity, so it does not wait for the node callbacks, the update
+    coalescing or any request in the send queue. The time from the receipt of
+    the frame until the event is fired is passed to the metrics.
+    """
+
+    def __init__(self, hass: HomeAssistant, api_stick: PlugwiseUSBStick) -> None:
+        """Initialize the motion events."""
+        self._hass = hass
+        self._metrics = api_stick.metrics
+        self._device_registry = dr.async_get(hass)
+        self._motion: dict[str, bool] = {}
+
+    @callback
+    def node_availability(self, mac: str, available: bool) -> None:
+        """Forget the motion of a node which became unavailable.
+
+        The first frame after it is back is fired even when it reports the
+        same motion as before.
+        """
+        if not available:
+            self.discard(mac)
+
+    @callback
+    def discard(self, mac: str) -> None:
+        """Forget the motion of a node."""
+        self._motion.pop(mac, None)
+
+    @callback
+    def motion_received(self, mac: str, motion: bool, received: datetime) -> None:
+        """Handle a motion frame."""
+        # A Scan repeats its frame when it missed the acknowledgement
+        if self._motion.get(mac) == motion:
+            return
+        self._motion[mac] = motion
+        if datetime.now() - received > MOTION_EVENT_MAX_AGE:
+            return
+        self._async_fire_event(mac, motion, received)
+
+    @callback
+    def _async_fire_event(self, mac: str, motion: bool, received: datetime) -> None:
+        """Fire the motion event and record its latency."""
+        device = self._device_registry.async_get_device({(DOMAIN, mac)})
+        self._hass.bus.async_fire(
+            EVENT_MOTION,
+            {
+                ATTR_DEVICE_ID: device.id if device is not None else None,
+                ATTR_MAC_ADDRESS: mac,
+                CONF_TYPE: TRIGGER_MOTION if motion else TRIGGER_NO_MOTION,
+                ATTR_RECEIVED: received.isoformat(),
+            },
+        )
+        self._metrics.record_motion_event((datetime.now() - received).total_seconds())
@@ -0,0 +1,135 @@
+"""Deadband and rate limit filtering of Plugwise USB sensor updates."""
+from __future__ import annotations
+
+from collections.abc import Mapping
+import time
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from .const import (
+    CONF_DEADBAND,
+    CONF_DEADBAND_MODE,
+    CONF_PUBLISH_MAX_INTERVAL,
+    CONF_PUBLISH_MIN_INTERVAL,
+    DEADBAND_ABSOLUTE,
+    DEADBAND_RELATIVE,
+    DEADBAND_TYPES,
+    DEFAULT_DEADBAND,
+    DEFAULT_PUBLISH_MAX_INTERVAL,
+    DEFAULT_PUBLISH_MIN_INTERVAL,
+)
+from .metrics import PlugwiseUSBMetrics
+
+if TYPE_CHECKING:
+    from . import PlugwiseUSBEntity
+
+
+class Deadband(NamedTuple):
+    """Change of a value which is not worth a state write."""
+
+    width: float
+    relative: bool
+
+    def covers(self, value: float, published: float) -> bool:
+        """Return True if value is within the deadband around the published value."""
+        if self.relative:
+            return abs(value - published) <= abs(published) * self.width / 100
+        return abs(value - published) <= self.width
+
+
+class Published(NamedTuple):
+    """Last published state of an entity."""
+
+    value: float | None
+    available: bool
+    timestamp: float
+
+
+class PlugwiseUSBPublishFilter:
+    """Decide which sensor updates are written to the state machine.
+
+    Node callbacks are filtered before the entity is marked dirty. A value
+    is published when it moved out of the deadband of its sensor type around
+    the last published value, but not more often than the minimum interval.
+    After the maximum interval the value is published anyway. Availability
+    changes always pass.
+    """
+
+    def __init__(
+        self,
+        deadbands: Mapping[str, Deadband],
+        min_interval: float,
+        max_interval: float,
+        metrics: PlugwiseUSBMetrics | None = None,
+    ) -> None:
+        """Initialize the publish filter."""
+        self._deadbands = dict(deadbands)
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._metrics = metrics
+        self._published: dict[PlugwiseUSBEntity, Published] = {}
+
+    @staticmethod
+    def _settings(
+        options: Mapping[str, Any]
+    ) -> tuple[dict[str, Deadband], float, float]:
+        """Return the deadbands and publish intervals in the options of a config entry."""
+        return (
+            {
+                deadband_type: Deadband(
+                    options.get(f"{CONF_DEADBAND}_{deadband_type}", DEFAULT_DEADBAND),
+                    options.get(
+                        f"{CONF_DEADBAND_MODE}_{deadband_type}", DEADBAND_ABSOLUTE
+                    )
+                    == DEADBAND_RELATIVE,
+                )
+                for deadband_type in DEADBAND_TYPES
+            },
+            options.get(CONF_PUBLISH_MIN_INTERVAL, DEFAULT_PUBLISH_MIN_INTERVAL),
+            options.get(CONF_PUBLISH_MAX_INTERVAL, DEFAULT_PUBLISH_MAX_INTERVAL),
+        )
+
+    @classmethod
+    def from_options(
+        cls, options: Mapping[str, Any], metrics: PlugwiseUSBMetrics | None = None
+    ) -> PlugwiseUSBPublishFilter:
+        """Create a publish filter from the options of a config entry."""
+        return cls(*cls._settings(options), metrics)
+
+    def update_options(self, options: Mapping[str, Any]) -> None:
+        """Apply changed options, the last published values are kept."""
+        deadbands, min_interval, max_interval = self._settings(options)
+        self._deadbands = deadbands
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+
+    def should_publish(
+        self,
+        entity: PlugwiseUSBEntity,
+        deadband_type: str,
+        value: float | None,
+        available: bool,
+    ) -> bool:
+        """Return True if the update of entity has to be written."""
+        now = time.monotonic()
+        published = self._published.get(entity)
+        if published is None or published.available != available:
+            publish = True
+        elif (elapsed := now - published.timestamp) < self._min_interval:
+            publish = False
+        elif self._max_interval and elapsed >= self._max_interval:
+            publish = True
+        elif value is None or published.value is None:
+            publish = value != published.value
+        else:
+            publish = not self._deadbands[deadband_type].covers(
+                value, published.value
+            )
+        if publish:
+            self._published[entity] = Published(value, available, now)
+        if self._metrics is not None:
+            self._metrics.record_publish(publish)
+        return publish
+
+    def discard(self, entity: PlugwiseUSBEntity) -> None:
+        """Forget the last published state of entity."""
+        self._published.pop(entity, None)
@@ -0,0 +1,111 @@
+"""Prioritized queue of requests to be sent to the Plugwise network."""
+from __future__ import annotations
+
+import heapq
+from itertools import count
+import queue
+import time
+from typing import Any
+
+from plugwise_usb.messages.requests import (
+    CircleClockSetRequest,
+    CirclePlusRealTimeClockSetRequest,
+    CircleSwitchRelayRequest,
+    NodeAddRequest,
+    NodeAllowJoiningRequest,
+    NodeRemoveRequest,
+    NodeSleepConfigRequest,
+    ScanConfigureRequest,
+    ScanLightCalibrateRequest,
+    StickInitRequest,
+)
+
+from .const import REQUEST_CLASS_COMMAND, REQUEST_CLASS_CONFIG, REQUEST_CLASS_POLL
+from .metrics import PlugwiseUSBMetrics, TimingStatistics
+
+REQUEST_CLASSES: tuple[str, ...] = (
+    REQUEST_CLASS_COMMAND,
+    REQUEST_CLASS_CONFIG,
+    REQUEST_CLASS_POLL,
+)
+
+COMMAND_REQUESTS = (CircleSwitchRelayRequest,)
+CONFIG_REQUESTS = (
+    CircleClockSetRequest,
+    CirclePlusRealTimeClockSetRequest,
+    NodeAddRequest,
+    NodeAllowJoiningRequest,
+    NodeRemoveRequest,
+    NodeSleepConfigRequest,
+    ScanConfigureRequest,
+    ScanLightCalibrateRequest,
+    StickInitRequest,
+)
+
+
+def request_class(request: Any) -> str:
+    """Return the class of a request, user commands go first and polling last."""
+    if isinstance(request, COMMAND_REQUESTS):
+        return REQUEST_CLASS_COMMAND
+    if isinstance(request, CONFIG_REQUESTS):
+        return REQUEST_CLASS_CONFIG
+    return REQUEST_CLASS_POLL
+
+
+class PlugwiseUSBRequestQueue(queue.Queue):
+    """Send queue of the message controller ordered by request class.
+
+    The message controller of the library puts (priority, retry, timestamp,
+    request_set) tuples in its send queue and ignores the priority. This
+    queue hands out user commands before configuration requests and
+    configuration requests before polling, using the library priority and
+    then the order of arrival within a class. The time each request waited
+    is recorded per class, the traffic is passed to the metrics of the stick.
+    """
+
+    def __init__(self, metrics: PlugwiseUSBMetrics | None = None) -> None:
+        """Initialize the request queue."""
+        self._metrics = metrics
+        super().__init__()
+
+    def _init(self, maxsize: int) -> None:
+        self._heap: list[tuple[int, int, int, float, tuple[Any, ...]]] = []
+        self._counter = count()
+        self._wait = {
+            request_class: TimingStatistics() for request_class in REQUEST_CLASSES
+        }
+
+    def _qsize(self) -> int:
+        return len(self._heap)
+
+    def _put(self, item: tuple[Any, ...]) -> None:
+        priority, _retry, _timestamp, request_set = item
+        rank = REQUEST_CLASSES.index(request_class(request_set[0]))
+        heapq.heappush(
+            self._heap, (rank, priority, next(self._counter), time.monotonic(), item)
+        )
+        if self._metrics is not None:
+            self._metrics.record_queued()
+
+    def _get(self) -> tuple[Any, ...]:
+        rank, _priority, _order, queued, item = heapq.heappop(self._heap)
+        self._wait[REQUEST_CLASSES[rank]].add(time.monotonic() - queued)
+        if self._metrics is not None:
+            self._metrics.record_sent()
+        return item
+
+    def pending(self) -> dict[str, int]:
+        """Return the number of queued requests per class."""
+        with self.mutex:
+            pending = dict.fromkeys(REQUEST_CLASSES, 0)
+            for rank, *_ in self._heap:
+                pending[REQUEST_CLASSES[rank]] += 1
+            return pending
+
+    def wait_statistics(self) -> dict[str, TimingStatistics]:
+        """Return a copy of the queue wait statistics per class."""
+        with self.mutex:
+            return {
+                request_class: TimingStatistics(**vars(statistics))
+                for request_class, statistics in self._wait.items()
+            }
@@ -0,0 +1,423 @@
+"""Adaptive polling of Plugwise USB nodes."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime
+import random
+import time
+from typing import Any
+
+from homeassistant.const import Platform
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.util import dt as dt_util
+from plugwise_usb.nodes import PlugwiseNode
+
+from .const import (
+    DEFAULT_POLL_INTERVALS,
+    DOMAIN,
+    LOGGER,
+    POLL_ADAPTIVE_MAX_FACTOR,
+    POLL_AVAILABILITY_INTERVAL,
+    POLL_PING,
+    POLL_POWER,
+    POLL_POWER_FLOOR,
+    POLL_REBALANCE_INTERVAL,
+    POLL_STARTUP_SPREAD,
+    POLL_TICK_INTERVAL,
+    POLL_UNAVAILABLE_INTERVAL,
+    POLL_VARIABILITY_HIGH,
+    POLL_VARIABILITY_SMOOTHING,
+    USB_POWER_ID,
+)
+from .models import (
+    PW_LOCAL_ENERGY_SENSOR_TYPES,
+    PW_POWER_HISTORY_BINARY_SENSOR_TYPES,
+    PW_POWER_HISTORY_SENSOR_TYPES,
+    PW_SENSOR_TYPES,
+    PlugwiseEntityDescription,
+)
+from .stick import PlugwiseUSBStick
+
+# Entities derived from the power samples of a node, an enabled one needs the
+# power requests of the power_1s sensor even when that sensor is disabled
+POWER_SAMPLE_ENTITIES: tuple[tuple[Platform, PlugwiseEntityDescription], ...] = (
+    *(
+        (Platform.SENSOR, description)
+        for description in (
+            *PW_POWER_HISTORY_SENSOR_TYPES,
+            *PW_LOCAL_ENERGY_SENSOR_TYPES,
+        )
+    ),
+    *(
+        (Platform.BINARY_SENSOR, description)
+        for description in PW_POWER_HISTORY_BINARY_SENSOR_TYPES
+    ),
+)
+
+
+@dataclass
+class NodePollState:
+    """Polling state of a single node."""
+
+    demand: set[str] | None = None
+    intervals: dict[str, float] = field(default_factory=dict)
+    next_poll: dict[str, float] = field(default_factory=dict)
+    last_power: float | None = None
+    variability: float = POLL_VARIABILITY_HIGH
+    rate: float = 0.0
+
+
+class PlugwiseUSBPollScheduler:
+    """Schedule the poll requests of all nodes within a message budget.
+
+    Every node gets its own interval per request type. The interval is the
+    shortest poll_interval of the entity descriptions depending on that
+    request. Power requests slow down for nodes with a stable power usage and
+    all intervals are stretched when the total request rate exceeds the
+    message budget of the network. When tracking the entity registry, only
+    the data of enabled entities is requested, the power samples are also
+    requested for enabled entities derived from them and while the power
+    samples are exported. The poll intervals and the message budget can be
+    changed while polling.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api_stick: PlugwiseUSBStick,
+        message_budget: float,
+        poll_intervals: dict[str, float] | None = None,
+    ) -> None:
+        """Initialize the poll scheduler."""
+        self._hass = hass
+        self._api_stick = api_stick
+        self._message_budget = message_budget
+        self._poll_intervals = {**DEFAULT_POLL_INTERVALS, **(poll_intervals or {})}
+        self._nodes: dict[str, NodePollState] = {}
+        self._power_callbacks: dict[str, Callable[[Any], None]] = {}
+        self._listeners: list[CALLBACK_TYPE] = []
+        self._unsub_tick: CALLBACK_TYPE | None = None
+        self._unsub_rebalance: CALLBACK_TYPE | None = None
+        self._config_entry_id: str | None = None
+        self._budget_scale = 1.0
+        self._power_sampling = False
+        self._day = dt_util.now().day
+
+    @property
+    def message_budget(self) -> float:
+        """Return the maximum number of poll requests per second."""
+        return self._message_budget
+
+    @message_budget.setter
+    def message_budget(self, message_budget: float) -> None:
+        """Set the maximum number of poll requests per second."""
+        self._message_budget = message_budget
+        self._async_rebalance()
+
+    @property
+    def poll_intervals(self) -> dict[str, float]:
+        """Return the shortest poll interval of each request in seconds."""
+        return dict(self._poll_intervals)
+
+    @poll_intervals.setter
+    def poll_intervals(self, poll_intervals: dict[str, float]) -> None:
+        """Set the shortest poll interval of each request in seconds."""
+        self._poll_intervals = {**DEFAULT_POLL_INTERVALS, **poll_intervals}
+        self._async_rebalance()
+
+    @property
+    def power_sampling(self) -> bool:
+        """Return True when the power of all nodes is sampled regardless of demand."""
+        return self._power_sampling
+
+    @power_sampling.setter
+    def power_sampling(self, power_sampling: bool) -> None:
+        """Sample the power of all nodes regardless of demand, like for an export."""
+        if power_sampling != self._power_sampling:
+            self._power_sampling = power_sampling
+            self._async_rebalance()
+
+    @property
+    def utilization(self) -> float:
+        """Return the fraction of the message budget in use."""
+        return sum(state.rate for state in self._nodes.values()) / self._message_budget
+
+    def budget_share(self, mac: str) -> float | None:
+        """Return the fraction of the message budget used by a node."""
+        if (state := self._nodes.get(mac)) is None:
+            return None
+        return state.rate / self._message_budget
+
+    def intervals(self, mac: str) -> dict[str, float]:
+        """Return the current poll intervals of a node in seconds."""
+        if (state := self._nodes.get(mac)) is None:
+            return {}
+        return dict(state.intervals)
+
+    @callback
+    def async_start(self) -> None:
+        """Start polling."""
+        self._unsub_tick = async_track_time_interval(
+            self._hass, self._async_tick, POLL_TICK_INTERVAL
+        )
+        self._unsub_rebalance = async_track_time_interval(
+            self._hass, self._async_rebalance, POLL_REBALANCE_INTERVAL
+        )
+        self._async_rebalance()
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop polling."""
+        if self._unsub_tick is not None:
+            self._unsub_tick()
+            self._unsub_tick = None
+        if self._unsub_rebalance is not None:
+            self._unsub_rebalance()
+            self._unsub_rebalance = None
+        for mac, power_callback in self._power_callbacks.items():
+            if (node := self._api_stick.devices.get(mac)) is not None:
+                node.unsubscribe_callback(power_callback, USB_POWER_ID)
+        self._power_callbacks = {}
+
+    @callback
+    def async_remove_node(self, mac: str) -> None:
+        """Stop polling a node which left the network."""
+        if (power_callback := self._power_callbacks.pop(mac, None)) is not None and (
+            node := self._api_stick.devices.get(mac)
+        ) is not None:
+            node.unsubscribe_callback(power_callback, USB_POWER_ID)
+        if self._nodes.pop(mac, None) is not None:
+            self._async_rebalance()
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Listen for updates of the poll intervals and budget usage."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def async_set_demand(self, mac: str, keys: set[str] | None) -> None:
+        """Set the entity description keys which need data of a node, None for all."""
+        state = self._node_state(mac)
+        if state.demand != keys:
+            state.demand = keys
+            self._async_rebalance()
+
+    @callback
+    def async_track_entity_demand(self, config_entry_id: str) -> CALLBACK_TYPE:
+        """Set the demand of all nodes to their enabled sensors in the entity registry.
+
+        The demand is updated when an entity is created, removed, enabled or
+        disabled. Returns a function to stop tracking the entity registry.
+        """
+        self._config_entry_id = config_entry_id
+        entity_registry = er.async_get(self._hass)
+        for mac in list(self._nodes):
+            self.async_set_demand(mac, self._entity_demand(entity_registry, mac))
+
+        @callback
+        def async_registry_updated(event: Event) -> None:
+            if event.data["action"] == "remove":
+                for mac in list(self._nodes):
+                    self.async_set_demand(
+                        mac, self._entity_demand(entity_registry, mac)
+                    )
+                return
+            if (
+                event.data["action"] == "update"
+                and "disabled_by" not in event.data["changes"]
+            ):
+                return
+            if (
+                entry := entity_registry.async_get(event.data["entity_id"])
+            ) is None or entry.config_entry_id != self._config_entry_id:
+                return
+            mac = entry.unique_id.split("-", 1)[0]
+            if mac in self._nodes:
+                self.async_set_demand(mac, self._entity_demand(entity_registry, mac))
+
+        unsub_registry = self._hass.bus.async_listen(
+            er.EVENT_ENTITY_REGISTRY_UPDATED, async_registry_updated
+        )
+
+        @callback
+        def async_untrack() -> None:
+            unsub_registry()
+            self._config_entry_id = None
+
+        return async_untrack
+
+    def _entity_demand(
+        self, entity_registry: er.EntityRegistry, mac: str
+    ) -> set[str] | None:
+        """Return the keys of the enabled sensors of a node, None when not tracked."""
+        if (
+            self._config_entry_id is None
+            or (node := self._api_stick.devices.get(mac)) is None
+        ):
+            return None
+        demand: set[str] = set()
+        for description in PW_SENSOR_TYPES:
+            if description.key not in node.features:
+                continue
+            if (
+                entity_id := entity_registry.async_get_entity_id(
+                    Platform.SENSOR, DOMAIN, f"{mac}-{description.key}"
+                )
+            ) is None:
+                # Not registered yet, the entity will be added with its default
+                if description.entity_registry_enabled_default:
+                    demand.add(description.key)
+            elif not entity_registry.async_get(entity_id).disabled:
+                demand.add(description.key)
+        if node.measures_power:
+            # Derived entities only count once registered, they are not created
+            # for every node, like the local energy without that option
+            for platform, description in POWER_SAMPLE_ENTITIES:
+                if (
+                    entity_id := entity_registry.async_get_entity_id(
+                        platform, DOMAIN, f"{mac}-{description.key}"
+                    )
+                ) is not None and not entity_registry.async_get(entity_id).disabled:
+                    demand.add(USB_POWER_ID)
+                    break
+        return demand
+
+    def _node_state(self, mac: str) -> NodePollState:
+        """Return the poll state of a node, track its power usage when new."""
+        if (state := self._nodes.get(mac)) is None:
+            state = self._nodes[mac] = NodePollState(
+                demand=self._entity_demand(er.async_get(self._hass), mac)
+            )
+        if (
+            mac not in self._power_callbacks
+            and (node := self._api_stick.devices.get(mac)) is not None
+            and node.measures_power
+        ):
+
+            def power_update(_: Any) -> None:
+                self._power_update(state, node)
+
+            if node.subscribe_callback(power_update, USB_POWER_ID):
+                self._power_callbacks[mac] = power_update
+        return state
+
+    @staticmethod
+    def _power_update(state: NodePollState, node: PlugwiseNode) -> None:
+        """Track the variability of the power usage of a node callback."""
+        if (power := node.current_power_usage) is None:
+            return
+        if state.last_power is not None:
+            change = abs(power - state.last_power) / max(
+                abs(state.last_power), POLL_POWER_FLOOR
+            )
+            state.variability += POLL_VARIABILITY_SMOOTHING * (
+                change - state.variability
+            )
+        state.last_power = power
+
+    def _base_intervals(
+        self, node: PlugwiseNode, state: NodePollState
+    ) -> dict[str, float]:
+        """Return the poll intervals of a node before applying the budget."""
+        intervals: dict[str, float] = {POLL_PING: POLL_AVAILABILITY_INTERVAL}
+        demand = state.demand
+        if demand is not None and self._power_sampling and node.measures_power:
+            demand = demand | {USB_POWER_ID}
+        for description in PW_SENSOR_TYPES:
+            if (
+                description.poll_request is None
+                or description.key not in node.features
+                or (demand is not None and description.key not in demand)
+            ):
+                continue
+            intervals[description.poll_request] = min(
+                intervals.get(description.poll_request, description.poll_interval),
+                description.poll_interval,
+            )
+        for request, interval in intervals.items():
+            intervals[request] = (
+                interval
+                * self._poll_intervals[request]
+                / DEFAULT_POLL_INTERVALS[request]
+            )
+        if POLL_POWER in intervals:
+            stability = 1 - min(state.variability / POLL_VARIABILITY_HIGH, 1)
+            intervals[POLL_POWER] *= 1 + (POLL_ADAPTIVE_MAX_FACTOR - 1) * stability
+        return intervals
+
+    @callback
+    def _async_rebalance(self, _: datetime | None = None) -> None:
+        """Recalculate the poll intervals of all nodes within the message budget."""
+        base: dict[str, dict[str, float]] = {}
+        for mac, node in list(self._api_stick.devices.items()):
+            if node is None or node.battery_powered:
+                continue
+            base[mac] = self._base_intervals(node, self._node_state(mac))
+        total_rate = sum(
+            1 / interval for intervals in base.values() for interval in intervals.values()
+        )
+        self._budget_scale = max(1.0, total_rate / self._message_budget)
+        if self._budget_scale > 1:
+            LOGGER.debug(
+                "Poll requests exceed message budget, stretch intervals by %.2f",
+                self._budget_scale,
+            )
+        for mac, intervals in base.items():
+            state = self._nodes[mac]
+            state.intervals = {
+                request: interval * self._budget_scale
+                for request, interval in intervals.items()
+            }
+            state.rate = sum(1 / interval for interval in state.intervals.values())
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    @callback
+    def _async_tick(self, _: datetime) -> None:
+        """Send all poll requests which are due."""
+        if not self._api_stick.connected:
+            # Polls resume when the connection supervisor reconnected
+            return
+        now = time.monotonic()
+        sync_clock = False
+        if (day := dt_util.now().day) != self._day:
+            self._day = day
+            sync_clock = True
+        for mac, node in list(self._api_stick.devices.items()):
+            if node is None:
+                continue
+            if node.battery_powered:
+                self._api_stick.check_sed_availability(mac)
+                continue
+            state = self._node_state(mac)
+            if not state.intervals:
+                state.intervals = self._base_intervals(node, state)
+            for request, interval in state.intervals.items():
+                if not node.available:
+                    if request != POLL_PING:
+                        continue
+                    interval = min(interval, POLL_UNAVAILABLE_INTERVAL)
+                if (next_poll := state.next_poll.get(request)) is None:
+                    # Spread the first requests of all nodes
+                    state.next_poll[request] = now + random.uniform(
+                        0, min(interval, POLL_STARTUP_SPREAD)
+                    )
+                    continue
+                if next_poll - now > interval:
+                    # The interval got shorter, move the poll forward
+                    state.next_poll[request] = now + interval
+                    continue
+                if now >= next_poll:
+                    state.next_poll[request] = now + interval
+                    self._api_stick.request_update(mac, request)
+            if sync_clock and node.measures_power:
+                node.sync_clock()
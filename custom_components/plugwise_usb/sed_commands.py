@@ -0,0 +1,185 @@
+"""Command queue of sleeping Plugwise USB end devices."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from plugwise_usb.constants import (
+    SED_AWAKE_BUTTON,
+    SED_AWAKE_FIRST,
+    SED_AWAKE_MAINTENANCE,
+    SED_AWAKE_STARTUP,
+)
+from plugwise_usb.messages.requests import (
+    NodeRequest,
+    NodeSleepConfigRequest,
+    ScanConfigureRequest,
+)
+
+from .const import (
+    DOMAIN,
+    LOGGER,
+    SED_COMMAND_BATTERY_CONFIG,
+    SED_COMMAND_SCAN_CONFIG,
+    SED_COMMANDS_SAVE_DELAY,
+    SED_COMMANDS_STORAGE_VERSION,
+)
+from .stick import PlugwiseUSBStick
+
+# Method of the node which queues the command and the request it sends
+COMMANDS: dict[str, tuple[str, type[NodeRequest]]] = {
+    SED_COMMAND_BATTERY_CONFIG: ("Configure_SED", NodeSleepConfigRequest),
+    SED_COMMAND_SCAN_CONFIG: ("Configure_scan", ScanConfigureRequest),
+}
+
+# Awake messages after which the node sends its queued requests
+FLUSH_AWAKE_TYPES = (
+    SED_AWAKE_BUTTON,
+    SED_AWAKE_FIRST,
+    SED_AWAKE_MAINTENANCE,
+    SED_AWAKE_STARTUP,
+)
+
+
+class PlugwiseUSBSedCommands:
+    """Keep the commands of battery powered nodes until they are awake.
+
+    Battery powered nodes only listen for a short while after their awake
+    message. A command replaces the pending command of the same kind, so
+    the last one wins. When a node reports awake, its pending commands are
+    handed to the node before the library sends its queued requests, so
+    they go out in one burst. A command stays pending until the node
+    acknowledged it and is sent again at the next awake message otherwise.
+    Pending commands are stored and survive a restart.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, api_stick: PlugwiseUSBStick, stick_mac: str
+    ) -> None:
+        """Initialize the command queue."""
+        self._hass = hass
+        self._api_stick = api_stick
+        self._store = self._commands_store(hass, stick_mac)
+        self._pending: dict[str, dict[str, list[Any]]] = {}
+        self._deliveries: dict[tuple[str, str], asyncio.Future[None]] = {}
+        self._unsub_awake: CALLBACK_TYPE | None = None
+
+    @staticmethod
+    def _commands_store(
+        hass: HomeAssistant, stick_mac: str
+    ) -> Store[dict[str, dict[str, list[Any]]]]:
+        """Return the store of the pending commands of one Plugwise network."""
+        return Store(
+            hass, SED_COMMANDS_STORAGE_VERSION, f"{DOMAIN}.{stick_mac}.sed_commands"
+        )
+
+    @classmethod
+    async def async_remove(cls, hass: HomeAssistant, stick_mac: str) -> None:
+        """Remove the pending commands of a Plugwise network from disk."""
+        await cls._commands_store(hass, stick_mac).async_remove()
+
+    async def async_load(self) -> None:
+        """Load the pending commands from disk and wait for awake messages."""
+        if (pending := await self._store.async_load()) is not None:
+            self._pending = pending
+        self._unsub_awake = self._api_stick.add_awake_listener(self.node_awake)
+
+    async def async_stop(self) -> None:
+        """Stop waiting for awake messages and store the pending commands."""
+        if self._unsub_awake is not None:
+            self._unsub_awake()
+            self._unsub_awake = None
+        await self._store.async_save(self._data_to_save())
+
+    def pending(self, mac: str) -> dict[str, list[Any]]:
+        """Return the pending commands of a node with their arguments."""
+        return dict(self._pending.get(mac, {}))
+
+    @callback
+    def async_queue(
+        self, mac: str, command: str, arguments: list[Any]
+    ) -> asyncio.Future[None]:
+        """Queue a command, the future is done when the node acknowledged it.
+
+        A command which replaces a pending one shares its future, the future
+        is only done when the last queued arguments are delivered.
+        """
+        self._pending.setdefault(mac, {})[command] = arguments
+        self._async_schedule_save()
+        LOGGER.debug("Queue %s command for node %s until it is awake", command, mac)
+        if (delivery := self._deliveries.get((mac, command))) is None:
+            delivery = self._hass.loop.create_future()
+            self._deliveries[(mac, command)] = delivery
+        return delivery
+
+    @callback
+    def async_discard(self, mac: str) -> None:
+        """Forget the pending commands of a removed node."""
+        self._pending.pop(mac, None)
+        for key in [key for key in self._deliveries if key[0] == mac]:
+            self._deliveries.pop(key).cancel()
+        self._async_schedule_save()
+
+    @callback
+    def node_awake(self, mac: str, awake_type: int) -> None:
+        """Hand the pending commands to an awake node."""
+        if (
+            awake_type not in FLUSH_AWAKE_TYPES
+            or not (commands := self.pending(mac))
+            or (node := self._api_stick.devices.get(mac)) is None
+        ):
+            return
+        for command, arguments in commands.items():
+            method, request_class = COMMANDS[command]
+            getattr(node, method)(*arguments)
+            # Wrap the callback of the queued request to learn about the ack
+            request, node_callback = node._sed_requests[request_class.ID]
+            node._sed_requests[request_class.ID] = (
+                request,
+                self._acknowledged_callback(mac, command, arguments, node_callback),
+            )
+        LOGGER.debug("Send %s pending commands to awake node %s", len(commands), mac)
+
+    def _acknowledged_callback(
+        self,
+        mac: str,
+        command: str,
+        arguments: list[Any],
+        node_callback: Callable[[], None] | None,
+    ) -> Callable[[], None]:
+        """Return the callback of an acknowledged command."""
+
+        @callback
+        def command_acknowledged() -> None:
+            if node_callback is not None:
+                node_callback()
+            if self._pending.get(mac, {}).get(command) != arguments:
+                # Replaced by a newer command while this one was sent
+                return
+            del self._pending[mac][command]
+            if not self._pending[mac]:
+                del self._pending[mac]
+            self._async_delivered(mac, command)
+
+        return command_acknowledged
+
+    @callback
+    def _async_delivered(self, mac: str, command: str) -> None:
+        """Complete the delivery of a command and store the remaining commands."""
+        LOGGER.debug("Node %s acknowledged %s command", mac, command)
+        if (delivery := self._deliveries.pop((mac, command), None)) is not None:
+            if not delivery.done():
+                delivery.set_result(None)
+        self._async_schedule_save()
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        """Store the pending commands after a delay."""
+        self._store.async_delay_save(self._data_to_save, SED_COMMANDS_SAVE_DELAY)
+
+    def _data_to_save(self) -> dict[str, dict[str, list[Any]]]:
+        """Return a copy of the pending commands to store."""
+        return {mac: dict(commands) for mac, commands in self._pending.items()}
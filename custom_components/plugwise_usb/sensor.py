@@ -1,16 +1,38 @@
 """Plugwise USN Sensor component for Home Assistant."""
 from __future__ import annotations
 
+from operator import attrgetter
+
 from homeassistant.components.sensor import SensorEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from plugwise_usb.nodes import PlugwiseNode
 
-from . import PlugwiseUSBEntity
-from .const import CB_NEW_NODE, DOMAIN, STICK
-from .models import PW_SENSOR_TYPES, PlugwiseSensorEntityDescription
+from . import PlugwiseUSBEntity, async_add_node_entities
+from .const import (
+    DOMAIN,
+    LOCAL_ENERGY,
+    POWER_HISTORY,
+    PUBLISH_FILTER,
+    SCHEDULER,
+    STICK,
+    USB_AVAILABLE_ID,
+    USB_POWER_ID,
+)
+from .energy import EnergyIntegrator, PlugwiseUSBLocalEnergy
+from .history import PlugwiseUSBPowerHistory, PowerHistory
+from .models import (
+    PW_LOCAL_ENERGY_SENSOR_TYPES,
+    PW_POLL_SENSOR_TYPES,
+    PW_POWER_HISTORY_SENSOR_TYPES,
+    PW_SENSOR_TYPES,
+    PW_STICK_SENSOR_TYPES,
+    PlugwiseSensorEntityDescription,
+)
+from .publish_filter import PlugwiseUSBPublishFilter
+from .scheduler import PlugwiseUSBPollScheduler
+from .stick import PlugwiseUSBStick
 
 PARALLEL_UPDATES = 0
 
@@ -22,29 +44,57 @@ async def async_setup_entry(
 ) -> None:
     """Set up Plugwise USB sensor based on config_entry."""
     api_stick = hass.data[DOMAIN][config_entry.entry_id][STICK]
+    power_history: PlugwiseUSBPowerHistory = hass.data[DOMAIN][
+        config_entry.entry_id
+    ][POWER_HISTORY]
+    local_energy: PlugwiseUSBLocalEnergy | None = hass.data[DOMAIN][
+        config_entry.entry_id
+    ][LOCAL_ENERGY]
 
-    async def async_add_sensors(mac: str):
-        """Add plugwise sensors for device."""
-        entities: list[USBSensor] = []
-        entities.extend(
-            [
-                USBSensor(api_stick.devices[mac], description)
-                for description in PW_SENSOR_TYPES
-                if description.key in api_stick.devices[mac].features
-            ]
-        )
-        if entities:
-            async_add_entities(entities)
-
-    for mac in hass.data[DOMAIN][config_entry.entry_id][Platform.SENSOR]:
-        hass.async_create_task(async_add_sensors(mac))
+    @callback
+    def node_sensors(mac: str) -> list[USBSensor]:
+        """Create the plugwise sensors of a node."""
+        node = api_stick.devices[mac]
+        entities: list[USBSensor] = [
+            USBSensor(node, description)
+            for description in PW_SENSOR_TYPES
+            if description.key in node.features
+        ]
+        if not node.battery_powered:
+            entities.extend(
+                [
+                    USBPollBudgetSensor(node, description)
+                    for description in PW_POLL_SENSOR_TYPES
+                ]
+            )
+        if (history := power_history.get(mac)) is not None:
+            entities.extend(
+                [
+                    USBPowerHistorySensor(node, history, description)
+                    for description in PW_POWER_HISTORY_SENSOR_TYPES
+                ]
+            )
+        if local_energy is not None and (
+            integrator := local_energy.get(mac)
+        ) is not None:
+            entities.extend(
+                [
+                    USBLocalEnergySensor(node, integrator, description)
+                    for description in PW_LOCAL_ENERGY_SENSOR_TYPES
+                ]
+            )
+        return entities
 
-    def discoved_device(mac: str):
-        """Add sensors for newly discovered device."""
-        hass.async_create_task(async_add_sensors(mac))
-
-    # Listen for discovered nodes
-    api_stick.subscribe_stick_callback(discoved_device, CB_NEW_NODE)
+    async_add_node_entities(
+        hass,
+        config_entry,
+        async_add_entities,
+        node_sensors,
+        [
+            USBStickSensor(api_stick, description)
+            for description in PW_STICK_SENSOR_TYPES
+        ],
+    )
 
 
 class USBSensor(PlugwiseUSBEntity, SensorEntity):  # type: ignore[misc]
@@ -55,11 +105,137 @@ class USBSensor(PlugwiseUSBEntity, SensorEntity):  # type: ignore[misc]
     ) -> None:
         """Initialize sensor entity."""
         super().__init__(node, description)
+        self._publish_filter: PlugwiseUSBPublishFilter | None = None
+
+    async def async_added_to_hass(self):
+        """Subscribe for updates, filtered by the publish filter of the stick."""
+        if self.entity_description.deadband is not None:
+            self._publish_filter = self.hass.data[DOMAIN][
+                self.platform.config_entry.entry_id
+            ][PUBLISH_FILTER]
+        await super().async_added_to_hass()
+
+    async def async_will_remove_from_hass(self):
+        """Unsubscribe to updates."""
+        await super().async_will_remove_from_hass()
+        if self._publish_filter is not None:
+            self._publish_filter.discard(self)
+
+    def _read_state(self) -> float | None:
+        """Return the state value of the node, rounded to 3 decimals."""
+        if (state_value := self._state_accessor(self._node)) is not None:
+            return float(round(state_value, 3))
+        return None
+
+    def _set_state(self, value: float | None) -> None:
+        """Keep the native value of the sensor."""
+        self._attr_native_value = value
+
+    def _should_publish(self, value: float | None, available: bool) -> bool:
+        """Return True if the update passes the publish filter of the stick."""
+        return self._publish_filter is None or self._publish_filter.should_publish(
+            self, self.entity_description.deadband, value, available
+        )
+
+
+class USBPollBudgetSensor(USBSensor):
+    """Share of the message budget used to poll a Plugwise USB node."""
+
+    _scheduler: PlugwiseUSBPollScheduler
+
+    async def async_added_to_hass(self):
+        """Subscribe for updates of the poll scheduler."""
+        await super().async_added_to_hass()
+        self._scheduler = self.hass.data[DOMAIN][self.platform.config_entry.entry_id][
+            SCHEDULER
+        ]
+        self.async_on_remove(
+            self._scheduler.async_add_listener(self.async_write_ha_state)
+        )
+
+    def _read_state(self) -> None:
+        """Return nothing, the budget share is not an attribute of the node."""
+        return None
 
     @property
     def native_value(self) -> float | None:
-        """Return the native value of the sensor."""
-        state_value = getattr(self._node, self.entity_description.state_request_method)
-        if state_value is not None:
+        """Return the share of the message budget in percent."""
+        if (share := self._scheduler.budget_share(self._node.mac)) is None:
+            return None
+        return round(share * 100, 1)
+
+
+class USBPowerHistorySensor(USBSensor):
+    """Statistics of the recent power samples of a Plugwise USB node."""
+
+    def __init__(
+        self,
+        node: PlugwiseNode,
+        history: PowerHistory,
+        description: PlugwiseSensorEntityDescription,
+    ) -> None:
+        """Initialize power history sensor entity."""
+        self._history = history
+        super().__init__(node, description)
+        # The power history is updated by the same callback, before the sensor
+        self.node_callbacks = (USB_AVAILABLE_ID, USB_POWER_ID)
+
+    def _read_state(self) -> float | None:
+        """Return the statistic of the power history, rounded to 3 decimals."""
+        if (state_value := self._state_accessor(self._history)) is not None:
             return float(round(state_value, 3))
         return None
+
+
+class USBLocalEnergySensor(USBSensor):
+    """Energy consumption of a Plugwise USB node integrated from its power samples."""
+
+    def __init__(
+        self,
+        node: PlugwiseNode,
+        integrator: EnergyIntegrator,
+        description: PlugwiseSensorEntityDescription,
+    ) -> None:
+        """Initialize local energy sensor entity."""
+        self._integrator = integrator
+        super().__init__(node, description)
+        # The integrator is updated by the same callback, before the sensor
+        self.node_callbacks = (USB_AVAILABLE_ID, USB_POWER_ID)
+
+    def _read_state(self) -> float | None:
+        """Return the integrated energy, rounded to 3 decimals."""
+        return float(round(self._state_accessor(self._integrator), 3))
+
+
+class USBStickSensor(SensorEntity):
+    """Diagnostic sensor of the message traffic of the Plugwise USB-stick."""
+
+    entity_description: PlugwiseSensorEntityDescription
+    _attr_should_poll = False
+
+    def __init__(
+        self, api_stick: PlugwiseUSBStick, description: PlugwiseSensorEntityDescription
+    ) -> None:
+        """Initialize stick sensor entity."""
+        self._metrics = api_stick.metrics
+        self._state_accessor = attrgetter(description.state_request_method)
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, api_stick.mac)},
+            "name": f"Stick ({api_stick.mac})",
+            "manufacturer": "Plugwise",
+            "model": "Stick",
+        }
+        self._attr_name = f"{description.name} ({api_stick.mac[-5:]})"
+        self._attr_unique_id = f"{api_stick.mac}-{description.key}"
+        self.entity_description = description
+        self._attr_native_value = self._state_accessor(self._metrics)
+
+    async def async_added_to_hass(self):
+        """Subscribe for new samples of the metrics."""
+        self.async_on_remove(self._metrics.async_add_listener(self._async_sampled))
+
+    @callback
+    def _async_sampled(self) -> None:
+        """Keep the value of the new sample and write the state."""
+        self._attr_native_value = self._state_accessor(self._metrics)
+        self.async_write_ha_state()
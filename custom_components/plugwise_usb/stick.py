@@ -0,0 +1,574 @@
+"""Plugwise USB-stick bound to the Home Assistant event loop."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Iterable
+import contextlib
+from datetime import datetime
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.util import dt as dt_util
+from plugwise_usb import Stick
+from plugwise_usb.constants import MESSAGE_TIME_OUT, PRIORITY_LOW, UTF8_DECODE
+from plugwise_usb.exceptions import (
+    CirclePlusError,
+    NetworkDown,
+    PlugwiseException,
+    StickInitError,
+)
+from plugwise_usb.messages.requests import (
+    CircleEnergyCountersRequest,
+    CirclePowerUsageRequest,
+    StickInitRequest,
+)
+from plugwise_usb.messages.responses import (
+    CircleCalibrationResponse,
+    CircleEnergyCountersResponse,
+    NodeAwakeResponse,
+    NodeSwitchGroupResponse,
+)
+
+from .const import (
+    CB_NEW_NODE,
+    CB_NODE_CALIBRATION,
+    CB_NODE_INFO,
+    DISCOVERY_RETRY_MAX_INTERVAL,
+    DISCOVERY_RETRY_MIN_INTERVAL,
+    DISCOVERY_TIMEOUT,
+    ENERGY_LOG_TIMEOUT,
+    LOGGER,
+    NODE_SCAN_TIMEOUT,
+    POLL_ENERGY,
+    POLL_PING,
+    POLL_POWER,
+    RELAY_SWITCH_TIMEOUT,
+    USB_MOTION_ID,
+    USB_RELAY_ID,
+)
+from .metrics import PlugwiseUSBMetrics, TimingStatistics
+from .request_queue import PlugwiseUSBRequestQueue
+from .transport import PlugwiseUSBMessageController
+
+# Sequence ids of messages a node sends without a request
+UNSOLICITED_SEQ_IDS = (b"FFFD", b"FFFE", b"FFFF")
+
+
+class PlugwiseUSBStick(Stick):
+    """Plugwise USB-stick with an asyncio interface.
+
+    The plugwise_usb library handles the serial connection and message
+    processing in its own threads. This class replaces its message controller
+    by one on an asyncio transport, so the serial I/O, the matching of
+    responses to requests and all stick and node callbacks run in the event
+    loop. The USB-stick and Circle+ are initialized without blocking it.
+
+    Registered nodes are discovered with a bounded number of
+    requests in flight and each node is announced by a CB_NEW_NODE callback
+    as soon as it responds. Nodes known from a previous run can be restored
+    from their cached metadata without any discovery request.
+    """
+
+    def __init__(self, hass: HomeAssistant, port: str) -> None:
+        """Initialize the USB-stick."""
+        super().__init__(port)
+        self._hass = hass
+        self._announced_nodes: set[str] = set()
+        self._restored_nodes: set[str] = set()
+        self._registered_nodes: asyncio.Future[dict[str, int]] | None = None
+        self._registered_macs: tuple[str, ...] = ()
+        self.metrics = PlugwiseUSBMetrics(hass)
+        self._request_queue = PlugwiseUSBRequestQueue(self.metrics)
+        self._energy_log_requests: dict[
+            tuple[str, int], asyncio.Future[list[tuple[datetime, int]]]
+        ] = {}
+        self._awake_listeners: list[Callable[[str, int], None]] = []
+        self._motion_listeners: list[Callable[[str, bool, datetime], None]] = []
+        self._availability_listeners: list[Callable[[str, bool], None]] = []
+        # The connection supervisor replaces the watchdog thread of the library
+        self._run_watchdog = True
+
+    @property
+    def registered_nodes(self) -> tuple[str, ...]:
+        """Return the MAC addresses of the nodes registered at the Circle+ at the last scan."""
+        return self._registered_macs
+
+    @property
+    def queue_wait(self) -> dict[str, TimingStatistics]:
+        """Return the time requests waited in the send queue per request class."""
+        return self._request_queue.wait_statistics()
+
+    @property
+    def queue_pending(self) -> dict[str, int]:
+        """Return the number of requests waiting in the send queue per request class."""
+        return self._request_queue.pending()
+
+    def add_awake_listener(
+        self, listener: Callable[[str, int], None]
+    ) -> CALLBACK_TYPE:
+        """Call a listener with the MAC address and awake type of each awake message.
+
+        The listener runs before the node processes the message, so requests
+        it queues at the node are sent in the same burst.
+        """
+        self._awake_listeners.append(listener)
+
+        def remove_listener() -> None:
+            self._awake_listeners.remove(listener)
+
+        return remove_listener
+
+    def add_motion_listener(
+        self, listener: Callable[[str, bool, datetime], None]
+    ) -> CALLBACK_TYPE:
+        """Call a listener with the MAC address, motion and receipt time of each motion frame.
+
+        The listener runs as soon as the frame is parsed, before the node
+        updates its state and calls its callbacks.
+        """
+        self._motion_listeners.append(listener)
+
+        def remove_listener() -> None:
+            self._motion_listeners.remove(listener)
+
+        return remove_listener
+
+    def add_availability_listener(
+        self, listener: Callable[[str, bool], None]
+    ) -> CALLBACK_TYPE:
+        """Call a listener with the MAC address and availability of a node when it changes."""
+        self._availability_listeners.append(listener)
+
+        def remove_listener() -> None:
+            self._availability_listeners.remove(listener)
+
+        return remove_listener
+
+    async def async_connect(self) -> None:
+        """Connect to the USB-stick and initialize the stick and Circle+ node."""
+        LOGGER.debug("Connect to USB-Stick")
+        self.msg_controller = self._message_controller()
+        await self.msg_controller.async_connect()
+        LOGGER.debug("Initialize USB-stick")
+        await self._async_initialize_stick()
+        LOGGER.debug("Discover Circle+ node")
+        await self._async_request(
+            lambda finished: self.discover_node(self.circle_plus_mac, finished)
+        )
+        if not self._circle_plus_discovered:
+            raise CirclePlusError
+
+    async def _async_initialize_stick(self) -> None:
+        """Initialize the USB-stick, raise an error if its network is down."""
+        await self._async_request(
+            lambda finished: self.msg_controller.send(StickInitRequest(), finished)
+        )
+        if not self._stick_initialized:
+            raise StickInitError
+        if not self._network_online:
+            raise NetworkDown
+
+    async def _async_request(self, send: Callable[[Callable[[], None]], Any]) -> None:
+        """Send a request and wait until it is processed or the message timeout."""
+        finished = self._hass.loop.create_future()
+
+        @callback
+        def request_finished() -> None:
+            if not finished.done():
+                finished.set_result(None)
+
+        send(request_finished)
+        with contextlib.suppress(TimeoutError):
+            async with asyncio.timeout(MESSAGE_TIME_OUT):
+                await finished
+
+    @property
+    def connected(self) -> bool:
+        """Return True if the connection to the USB-stick is open."""
+        return self.msg_controller is not None and self.msg_controller.connected
+
+    async def async_reconnect(self) -> None:
+        """Connect again after the connection was lost and initialize only the stick.
+
+        The nodes, the Circle+ and the send queue with its pending requests
+        are kept, no scan or discovery is needed.
+        """
+        if (controller := self.msg_controller) is not None:
+            controller.disconnect_from_stick()
+        LOGGER.debug("Reconnect to USB-Stick")
+        new_controller = self._message_controller()
+        new_controller.discovery_finished = (
+            controller is not None and controller.discovery_finished
+        )
+        await new_controller.async_connect()
+        self.msg_controller = new_controller
+        for node in list(self._device_nodes.values()):
+            if node is not None:
+                node.message_sender = new_controller.send
+        self._stick_initialized = False
+        LOGGER.debug("Initialize USB-stick")
+        await self._async_initialize_stick()
+
+    def _message_controller(self) -> PlugwiseUSBMessageController:
+        """Return a new message controller for the port of the stick."""
+        return PlugwiseUSBMessageController(
+            self._hass,
+            self.port,
+            self.message_processor,
+            self.node_state_updates,
+            self.metrics,
+            self._request_queue,
+        )
+
+    def disconnect(self) -> None:
+        """Disconnect from the USB-stick, the watchdog of the library stays off."""
+        if self.msg_controller is not None:
+            self.msg_controller.disconnect_from_stick()
+        self.msg_controller = None
+
+    async def async_disconnect(self) -> None:
+        """Disconnect from the USB-stick and wait until its port is closed."""
+        if (controller := self.msg_controller) is not None:
+            self.msg_controller = None
+            await controller.async_disconnect()
+
+    async def async_discover_nodes(self, concurrency: int) -> list[str]:
+        """Discover all nodes registered at the Circle+.
+
+        Every node is announced as soon as it responds. Returns the MAC
+        addresses of the registered nodes which did not respond.
+        """
+        self._announced_nodes.update(self._device_nodes)
+        self._registered_nodes = self._hass.loop.create_future()
+        self.scan()
+        try:
+            async with asyncio.timeout(NODE_SCAN_TIMEOUT):
+                registered_nodes = await self._registered_nodes
+        except TimeoutError:
+            LOGGER.warning("Scan of Circle+ for registered nodes timed out")
+            return []
+        finally:
+            self._registered_nodes = None
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def async_discover(mac: str) -> bool:
+            async with semaphore:
+                return await self._async_discover_node(mac)
+
+        results = await asyncio.gather(
+            *(async_discover(mac) for mac in registered_nodes)
+        )
+        self.msg_controller.discovery_finished = True
+        unreachable = [
+            mac for mac, discovered in zip(registered_nodes, results) if not discovered
+        ]
+        LOGGER.debug(
+            "Discovered %s out of %s registered nodes",
+            str(len(registered_nodes) - len(unreachable)),
+            str(len(registered_nodes)),
+        )
+        return unreachable
+
+    async def async_rediscover_nodes(self, macs: Iterable[str]) -> None:
+        """Retry discovery of unreachable nodes with an exponential backoff."""
+        pending = set(macs)
+        interval = DISCOVERY_RETRY_MIN_INTERVAL
+        while pending:
+            await asyncio.sleep(interval)
+            for mac in list(pending):
+                if await self._async_discover_node(mac):
+                    pending.discard(mac)
+            interval = min(interval * 2, DISCOVERY_RETRY_MAX_INTERVAL)
+        LOGGER.debug("All registered nodes are discovered")
+
+    async def _async_discover_node(self, mac: str) -> bool:
+        """Request the node info of a registered node and announce it when discovered."""
+        if mac not in self._device_nodes:
+            response = self._hass.loop.create_future()
+
+            @callback
+            def async_node_responded() -> None:
+                if not response.done():
+                    response.set_result(None)
+
+            self.discover_node(mac, async_node_responded)
+            with contextlib.suppress(TimeoutError):
+                async with asyncio.timeout(DISCOVERY_TIMEOUT):
+                    await response
+        if mac not in self._device_nodes:
+            return False
+        if self._device_nodes[mac] is not None:
+            self.do_callback(CB_NEW_NODE, mac)
+        return True
+
+    def discover_nodes(self, nodes_to_discover: dict[str, int]) -> None:
+        """Pass the nodes registered at the Circle+ to the discovery."""
+        self._nodes_to_discover = nodes_to_discover
+        self._joined_nodes = len(nodes_to_discover)
+        self._registered_macs = tuple(nodes_to_discover)
+        if self._registered_nodes is not None and not self._registered_nodes.done():
+            self._registered_nodes.set_result(nodes_to_discover)
+
+    def auto_update(self, timer=None) -> None:
+        """Skip the update thread of the library, nodes are polled by the scheduler."""
+
+    def request_update(self, mac: str, request: str) -> None:
+        """Send a poll request to a node."""
+        if (node := self._device_nodes.get(mac)) is None:
+            return
+        if request == POLL_PING:
+            node.do_ping()
+        elif request == POLL_POWER:
+            self.msg_controller.send(CirclePowerUsageRequest(node._mac))
+        elif request == POLL_ENERGY:
+            # Energy logs are collected per hour, only request them after a rollover
+            if not node._energy_history or node._energy_last_collected_timestamp < (
+                dt_util.utcnow()
+                .replace(minute=0, second=0, microsecond=0, tzinfo=None)
+            ):
+                node.request_energy_counters()
+
+    async def async_switch_relay(self, mac: str, state: bool) -> None:
+        """Switch the relay of a Circle and wait for the acknowledgement.
+
+        Raises TimeoutError when the Circle did not respond in time and
+        PlugwiseException when it did not switch.
+        """
+        node = self._device_nodes[mac]
+        acknowledged = self._hass.loop.create_future()
+
+        @callback
+        def async_relay_acknowledged() -> None:
+            if not acknowledged.done():
+                acknowledged.set_result(None)
+
+        node._request_switch(state, async_relay_acknowledged)
+        async with asyncio.timeout(RELAY_SWITCH_TIMEOUT):
+            await acknowledged
+        # The acknowledgement of a failed switch request does not change the relay state
+        if node._relay_state != state:
+            raise PlugwiseException(f"Relay of node {mac} failed to switch")
+
+    async def async_switch_relays(
+        self, macs: Iterable[str], state: bool, concurrency: int
+    ) -> dict[str, str | None]:
+        """Switch the relays of multiple Circles with a bounded number of requests in flight.
+
+        Returns the error per node, None when its relay switched.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def async_switch(mac: str) -> str | None:
+            if (
+                node := self._device_nodes.get(mac)
+            ) is None or USB_RELAY_ID not in node.features:
+                return "Unknown Circle"
+            async with semaphore:
+                try:
+                    await self.async_switch_relay(mac, state)
+                except TimeoutError:
+                    return "No response"
+                except PlugwiseException as error:
+                    return str(error)
+            return None
+
+        macs = list(dict.fromkeys(macs))
+        results = await asyncio.gather(*(async_switch(mac) for mac in macs))
+        return dict(zip(macs, results))
+
+    async def async_request_energy_log(
+        self, mac: str, log_address: int
+    ) -> list[tuple[datetime, int]] | None:
+        """Request one energy log page of a Circle.
+
+        Returns the UTC timestamps and pulses of the hourly slots in the page,
+        or None when the Circle did not respond.
+        """
+        if (node := self._device_nodes.get(mac)) is None:
+            return None
+        response = self._hass.loop.create_future()
+        self._energy_log_requests[(mac, log_address)] = response
+        self.msg_controller.send(
+            CircleEnergyCountersRequest(node._mac, log_address),
+            None,
+            0,
+            PRIORITY_LOW,
+        )
+        try:
+            async with asyncio.timeout(ENERGY_LOG_TIMEOUT):
+                return await response
+        except TimeoutError:
+            LOGGER.debug(
+                "Energy log %s of node %s not received", str(log_address), mac
+            )
+            return None
+        finally:
+            self._energy_log_requests.pop((mac, log_address), None)
+
+    def message_processor(self, message) -> None:
+        """Process a received message and pass requested energy logs to their request."""
+        self._record_response(message)
+        node = (
+            self._device_nodes.get(message.mac.decode(UTF8_DECODE))
+            if message.mac
+            else None
+        )
+        was_available = node is not None and node.available
+        # Switch nodes send the same frame for their buttons
+        if (
+            node is not None
+            and isinstance(message, NodeSwitchGroupResponse)
+            and USB_MOTION_ID in node.features
+            and message.power_state.value in (0, 1)
+        ):
+            for motion_listener in self._motion_listeners:
+                motion_listener(
+                    node.mac, message.power_state.value == 1, message.timestamp
+                )
+        if node is not None and isinstance(message, NodeAwakeResponse):
+            for listener in self._awake_listeners:
+                listener(node.mac, message.awake_type.value)
+        super().message_processor(message)
+        if node is not None and not was_available and node.available:
+            self._notify_availability(node)
+        if (
+            node is not None
+            and isinstance(message, CircleCalibrationResponse)
+            and node.calibration
+        ):
+            self.do_callback(CB_NODE_CALIBRATION, node.mac)
+        if isinstance(message, CircleEnergyCountersResponse) and (
+            response := self._energy_log_requests.get(
+                (message.mac.decode(UTF8_DECODE), message.logaddr.value)
+            )
+        ):
+            if not response.done():
+                response.set_result(
+                    [
+                        (log_date, getattr(message, f"pulses{slot}").value)
+                        for slot in range(1, 5)
+                        if (log_date := getattr(message, f"logdate{slot}").value)
+                        is not None
+                    ]
+                )
+
+    def _record_response(self, message) -> None:
+        """Record a message of a node with the time since its request was sent."""
+        if not message.mac:
+            return
+        response_time = None
+        if message.seq_id not in UNSOLICITED_SEQ_IDS:
+            with self.msg_controller.lock_expected_responses:
+                request_set = self.msg_controller.expected_responses.get(
+                    message.seq_id
+                )
+            if request_set is not None and request_set[3] is not None:
+                response_time = (message.timestamp - request_set[3]).total_seconds()
+        self.metrics.record_received(message.mac.decode(UTF8_DECODE), response_time)
+
+    def node_state_updates(self, mac: str, state: bool) -> None:
+        """Update the availability of a node and the entities of its features."""
+        node = self._device_nodes.get(mac)
+        was_available = node is not None and node.available
+        super().node_state_updates(mac, state)
+        if node is not None and was_available != node.available:
+            self._notify_availability(node)
+
+    def mark_nodes_unavailable(self) -> None:
+        """Mark all nodes unavailable while the connection to the stick is lost."""
+        for node in list(self._device_nodes.values()):
+            if node is not None and node.available:
+                node.available = False
+                self._notify_availability(node)
+
+    def _notify_availability(self, node) -> None:
+        """Update the entities of all features of a node which changed availability.
+
+        The library has no callback for availability, entities pick it up
+        with the update of their feature.
+        """
+        for listener in self._availability_listeners:
+            listener(node.mac, node.available)
+        for feature in node.features:
+            node.do_callback(feature)
+
+    def check_sed_availability(self, mac: str) -> None:
+        """Mark a battery powered node unavailable when it missed its maintenance interval."""
+        self._check_availability_of_seds(mac)
+
+    def remove_node(self, mac: str) -> None:
+        """Forget a node which left the network, without waiting for the Circle+."""
+        self._device_nodes.pop(mac, None)
+        self._nodes_not_discovered.pop(mac, None)
+        self._announced_nodes.discard(mac)
+        self._restored_nodes.discard(mac)
+        self._registered_macs = tuple(
+            registered for registered in self._registered_macs if registered != mac
+        )
+
+    def node_metadata(self, mac: str) -> dict[str, Any] | None:
+        """Return the metadata of a discovered node to be cached."""
+        if (node := self._device_nodes.get(mac)) is None or node._node_type is None:
+            return None
+        return {
+            "address": node._address,
+            "node_type": node._node_type,
+            "hardware_version": node._hardware_version,
+            "firmware_version": str(node._firmware_version),
+        }
+
+    def restore_nodes(self, nodes: dict[str, dict[str, Any]]) -> None:
+        """Create nodes from cached metadata, they stay unavailable until they respond."""
+        for mac, metadata in nodes.items():
+            if mac in self._device_nodes or mac == self.circle_plus_mac:
+                continue
+            self._append_node(mac, metadata["address"], metadata["node_type"])
+            if (node := self._device_nodes[mac]) is not None:
+                node._node_type = metadata["node_type"]
+                node._hardware_version = metadata["hardware_version"]
+                node._firmware_version = metadata["firmware_version"]
+                self._restored_nodes.add(mac)
+        self._announced_nodes.update(self._device_nodes)
+
+    def request_restored_node_info(self) -> None:
+        """Request the node info of restored nodes which did not send it yet.
+
+        The requests have a low priority, battery powered nodes get theirs at
+        their next awake.
+        """
+        for mac in list(self._restored_nodes):
+            if (node := self._device_nodes.get(mac)) is not None:
+                node._request_info()
+        self._restored_nodes.clear()
+
+    def _process_node_info_response(self, node_info_response, mac: str) -> None:
+        """Process node info and notify the metadata of the node might have changed."""
+        self._restored_nodes.discard(mac)
+        super()._process_node_info_response(node_info_response, mac)
+        if self._device_nodes.get(mac) is not None:
+            self.do_callback(CB_NODE_INFO, mac)
+
+    def do_callback(self, callback_type: str, callback_arg: Any = None) -> None:
+        """Execute registered callbacks, announce each new node only once."""
+        if callback_type == CB_NEW_NODE:
+            if callback_arg in self._announced_nodes:
+                return
+            self._announced_nodes.add(callback_arg)
+        super().do_callback(callback_type, callback_arg)
+
+    @callback
+    def async_subscribe_stick_callback(
+        self, stick_callback: Callable[..., Any], callback_type: str
+    ) -> CALLBACK_TYPE:
+        """Subscribe a callback to be executed in the event loop.
+
+        Returns a function to unsubscribe the callback.
+        """
+        self.subscribe_stick_callback(stick_callback, callback_type)
+
+        @callback
+        def async_unsubscribe() -> None:
+            self.unsubscribe_stick_callback(stick_callback, callback_type)
+
+        return async_unsubscribe
@@ -0,0 +1,111 @@
+"""Supervision of the connection to a Plugwise USB-stick."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+import time
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+from plugwise_usb.exceptions import PlugwiseException
+
+from .const import (
+    CONNECTION_CHECK_INTERVAL,
+    LOGGER,
+    POLL_PING,
+    RECONNECT_MAX_INTERVAL,
+    RECONNECT_MIN_INTERVAL,
+)
+from .stick import PlugwiseUSBStick
+
+
+class PlugwiseUSBConnectionSupervisor:
+    """Reconnect to the USB-stick when the serial port is lost.
+
+    The connection is checked from the event loop. When it is lost, all
+    nodes are marked unavailable and a background task reconnects with an
+    exponential backoff. Only the stick itself is initialized again, the
+    nodes and their entities are kept and pinged to become available right
+    after the reconnect. The time until the stick is back is recorded in
+    the metrics.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        config_entry: ConfigEntry,
+        api_stick: PlugwiseUSBStick,
+    ) -> None:
+        """Initialize the connection supervisor."""
+        self._hass = hass
+        self._config_entry = config_entry
+        self._api_stick = api_stick
+        self._unsub_check: CALLBACK_TYPE | None = None
+        self._reconnect_task: asyncio.Task[None] | None = None
+
+    @property
+    def reconnecting(self) -> bool:
+        """Return True while the connection is lost."""
+        return self._reconnect_task is not None
+
+    @callback
+    def async_start(self) -> None:
+        """Start checking the connection."""
+        self._unsub_check = async_track_time_interval(
+            self._hass, self._async_check, CONNECTION_CHECK_INTERVAL
+        )
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop checking the connection and cancel a reconnect in progress."""
+        if self._unsub_check is not None:
+            self._unsub_check()
+            self._unsub_check = None
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+
+    @callback
+    def _async_check(self, _: datetime | None = None) -> None:
+        """Start reconnecting when the connection is lost."""
+        if self._reconnect_task is not None or self._api_stick.connected:
+            return
+        LOGGER.warning("Connection to Plugwise USB-stick lost, reconnecting")
+        self._api_stick.mark_nodes_unavailable()
+        self._reconnect_task = self._config_entry.async_create_background_task(
+            self._hass, self._async_reconnect(), "plugwise_usb_reconnect"
+        )
+
+    async def _async_reconnect(self) -> None:
+        """Reconnect with an exponential backoff and ping all nodes."""
+        lost = time.monotonic()
+        interval = RECONNECT_MIN_INTERVAL
+        try:
+            while True:
+                try:
+                    await self._api_stick.async_reconnect()
+                except (PlugwiseException, OSError) as error:
+                    LOGGER.debug(
+                        "Reconnect to Plugwise USB-stick failed (%s), retry in %s seconds",
+                        error.__class__.__name__,
+                        str(interval),
+                    )
+                    await asyncio.sleep(interval)
+                    interval = min(interval * 2, RECONNECT_MAX_INTERVAL)
+                    continue
+                break
+        except Exception:  # pylint: disable=broad-except
+            # The next check starts reconnecting again
+            LOGGER.exception(
+                "Unexpected error while reconnecting to Plugwise USB-stick"
+            )
+            return
+        finally:
+            self._reconnect_task = None
+        duration = time.monotonic() - lost
+        self._api_stick.metrics.record_reconnect(duration)
+        LOGGER.info("Reconnected to Plugwise USB-stick in %.1f seconds", duration)
+        for mac, node in list(self._api_stick.devices.items()):
+            if node is not None and not node.battery_powered:
+                self._api_stick.request_update(mac, POLL_PING)
@@ -3,14 +3,15 @@ from __future__ import annotations
 
 from homeassistant.components.switch import SwitchEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from plugwise_usb.nodes import PlugwiseNode
 
-from . import PlugwiseUSBEntity
-from .const import CB_NEW_NODE, DOMAIN, STICK
+from . import PlugwiseUSBEntity, async_add_node_entities
+from .const import DOMAIN, STICK
 from .models import PW_SWITCH_TYPES, PlugwiseSwitchEntityDescription
+from .stick import PlugwiseUSBStick
+from .util import plugwise_command
 
 
 async def async_setup_entry(
@@ -21,48 +22,58 @@ async def async_setup_entry(
     """Set up the USB switches from a config entry."""
     api_stick = hass.data[DOMAIN][config_entry.entry_id][STICK]
 
-    async def async_add_switches(mac: str):
-        """Add Plugwise USB switches."""
-        entities: list[USBSwitch] = []
-        entities.extend(
-            [
-                USBSwitch(api_stick.devices[mac], description)
-                for description in PW_SWITCH_TYPES
-                if description.key in api_stick.devices[mac].features
-            ]
-        )
-        if entities:
-            async_add_entities(entities)
+    @callback
+    def node_switches(mac: str) -> list[USBSwitch]:
+        """Create the Plugwise USB switches of a node."""
+        return [
+            USBSwitch(api_stick, api_stick.devices[mac], description)
+            for description in PW_SWITCH_TYPES
+            if description.key in api_stick.devices[mac].features
+        ]
 
-    for mac in hass.data[DOMAIN][config_entry.entry_id][Platform.SWITCH]:
-        hass.async_create_task(async_add_switches(mac))
-
-    def discoved_device(mac: str):
-        """Add switches for newly discovered device."""
-        hass.async_create_task(async_add_switches(mac))
-
-    # Listen for discovered nodes
-    api_stick.subscribe_stick_callback(discoved_device, CB_NEW_NODE)
+    async_add_node_entities(hass, config_entry, async_add_entities, node_switches)
 
 
 class USBSwitch(PlugwiseUSBEntity, SwitchEntity):  # type: ignore[misc]
     """Representation of a Stick Node switch."""
 
     def __init__(
-        self, node: PlugwiseNode, description: PlugwiseSwitchEntityDescription
+        self,
+        api_stick: PlugwiseUSBStick,
+        node: PlugwiseNode,
+        description: PlugwiseSwitchEntityDescription,
     ) -> None:
         """Initialize a switch entity."""
         super().__init__(node, description)
+        self._api_stick = api_stick
+        self._optimistic_state: bool | None = None
 
     @property
     def is_on(self) -> bool:
-        """Return true if the switch is on."""
-        return getattr(self._node, self.entity_description.state_request_method)
+        """Return true if the switch is on, or is being switched on."""
+        if self._optimistic_state is not None:
+            return self._optimistic_state
+        return self._attr_is_on
 
-    def turn_off(self, **kwargs):
+    def _set_state(self, value: bool) -> None:
+        """Keep the relay state."""
+        self._attr_is_on = value
+
+    @plugwise_command
+    async def async_turn_off(self, **kwargs):
         """Instruct the switch to turn off."""
-        setattr(self._node, self.entity_description.state_request_method, False)
+        await self._async_switch(False)
 
-    def turn_on(self, **kwargs):
+    @plugwise_command
+    async def async_turn_on(self, **kwargs):
         """Instruct the switch to turn on."""
-        setattr(self._node, self.entity_description.state_request_method, True)
+        await self._async_switch(True)
+
+    async def _async_switch(self, state: bool) -> None:
+        """Show the new state right away and wait until the relay has switched."""
+        self._optimistic_state = state
+        self.async_write_ha_state()
+        try:
+            await self._api_stick.async_switch_relay(self._node.mac, state)
+        finally:
+            self._optimistic_state = None
@@ -0,0 +1,311 @@
+"""Transport of Plugwise USB-stick messages on the Home Assistant event loop."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import contextlib
+from datetime import datetime, timedelta
+import queue
+
+import serial
+import serial_asyncio
+
+from homeassistant.core import HomeAssistant, callback
+from plugwise_usb.constants import (
+    BAUD_RATE,
+    BYTE_SIZE,
+    MESSAGE_RETRY,
+    MESSAGE_TIME_OUT,
+    PRIORITY_MEDIUM,
+    STOPBITS,
+    UTF8_DECODE,
+)
+from plugwise_usb.controller import StickMessageController
+from plugwise_usb.exceptions import PortError
+from plugwise_usb.messages.requests import (
+    NodeInfoRequest,
+    NodePingRequest,
+    NodeRequest,
+)
+from plugwise_usb.util import inc_seq_id
+
+from .const import LOGGER, STICK_ACCEPT_TIMEOUT
+from .metrics import PlugwiseUSBMetrics
+from .request_queue import PlugwiseUSBRequestQueue
+
+
+class PlugwiseUSBProtocol(asyncio.Protocol):
+    """Connection to the USB-stick passing the received data to the parser."""
+
+    def __init__(
+        self,
+        data_received: Callable[[bytes], None],
+        connection_lost: Callable[[], None],
+    ) -> None:
+        """Initialize the protocol."""
+        self._data_received = data_received
+        self._connection_lost = connection_lost
+        self._transport: asyncio.Transport | None = None
+        self._closed = asyncio.Event()
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        """Keep the transport of the opened port."""
+        assert isinstance(transport, asyncio.Transport)
+        self._transport = transport
+
+    def data_received(self, data: bytes) -> None:
+        """Pass the received data to the parser."""
+        self._data_received(data)
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        """Notify the port was closed or the USB-stick was pulled out."""
+        if exc is not None:
+            LOGGER.debug("Connection to Plugwise USB-stick lost: %s", exc)
+        self._transport = None
+        self._closed.set()
+        self._connection_lost()
+
+    def is_connected(self) -> bool:
+        """Return True while the port is open."""
+        return self._transport is not None and not self._transport.is_closing()
+
+    def send(self, request: NodeRequest) -> None:
+        """Write a request to the USB-stick."""
+        if self._transport is not None:
+            self._transport.write(request.serialize())
+
+    def disconnect(self) -> None:
+        """Close the port."""
+        if self._transport is not None:
+            self._transport.close()
+
+    async def async_disconnect(self) -> None:
+        """Close the port after the pending data is written."""
+        if (transport := self._transport) is None:
+            return
+        transport.close()
+        try:
+            async with asyncio.timeout(STICK_ACCEPT_TIMEOUT):
+                await self._closed.wait()
+        except TimeoutError:
+            transport.abort()
+
+
+class PlugwiseUSBMessageController(StickMessageController):
+    """Message controller of the library driven by the event loop.
+
+    The library writes, reads and times out messages in threads of its own.
+    This controller keeps its matching of responses to requests and its
+    retries, but reads and writes the port through an asyncio transport and
+    sends the queued requests from a task. Received messages, node callbacks
+    and timeouts are all processed in the event loop.
+
+    A request is dropped after its last retry, which counts as one timeout of
+    its node in the metrics. The library then sends a single ping to check
+    whether the node is still reachable, that ping does not count as another
+    timeout.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        port: str,
+        message_processor,
+        node_state,
+        metrics: PlugwiseUSBMetrics,
+        request_queue: PlugwiseUSBRequestQueue,
+    ) -> None:
+        """Initialize the message controller, the send queue outlives a controller."""
+        super().__init__(port, message_processor, node_state)
+        self._hass = hass
+        self._metrics = metrics
+        self._send_message_queue = request_queue
+        self._checking_nodes: set[str] = set()
+        self._queued = asyncio.Event()
+        self._accepted = asyncio.Event()
+        self._tasks: list[asyncio.Task[None]] = []
+
+    @property
+    def connected(self) -> bool:
+        """Return True while the port is open."""
+        return self.connection is not None and self.connection.is_connected()
+
+    async def async_connect(self) -> None:
+        """Open the port and start sending the queued requests.
+
+        A port like <host>:<port> connects to a USB-stick shared over TCP.
+        Raises PortError when the port cannot be opened.
+        """
+        protocol = PlugwiseUSBProtocol(self.parser.feed, self._async_connection_lost)
+        try:
+            if ":" in self.port:
+                host, port = self.port.split(":")
+                await self._hass.loop.create_connection(
+                    lambda: protocol, host, int(port)
+                )
+            else:
+                await serial_asyncio.create_serial_connection(
+                    self._hass.loop,
+                    lambda: protocol,
+                    self.port,
+                    baudrate=BAUD_RATE,
+                    bytesize=BYTE_SIZE,
+                    parity=serial.PARITY_NONE,
+                    stopbits=STOPBITS,
+                )
+        except OSError as error:
+            LOGGER.debug("Failed to open port %s: %s", self.port, error)
+            raise PortError(error) from error
+        self.connection = protocol
+        self._tasks = [
+            self._hass.async_create_background_task(
+                self._async_send_loop(), "plugwise_usb_send"
+            ),
+            self._hass.async_create_background_task(
+                self._async_timeout_loop(), "plugwise_usb_timeout"
+            ),
+        ]
+
+    def connect_to_stick(self, callback=None) -> bool:
+        """Refuse the threaded connection of the library."""
+        raise PortError(
+            "The threaded connection of the library is not used, "
+            "open the port with async_connect"
+        )
+
+    def disconnect_from_stick(self) -> None:
+        """Stop sending and close the port."""
+        self._async_stop_tasks()
+        if self.connection is not None:
+            self.connection.disconnect()
+
+    async def async_disconnect(self) -> None:
+        """Stop sending and wait until the port is closed."""
+        self._async_stop_tasks()
+        if self.connection is not None:
+            await self.connection.async_disconnect()
+
+    @callback
+    def _async_connection_lost(self) -> None:
+        """Stop sending when the port is closed."""
+        self._async_stop_tasks()
+
+    @callback
+    def _async_stop_tasks(self) -> None:
+        """Cancel the send and timeout tasks."""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def send(
+        self,
+        request: NodeRequest,
+        callback=None,
+        retry_counter=0,
+        priority=PRIORITY_MEDIUM,
+    ) -> None:
+        """Queue a request to be sent by the send task."""
+        super().send(request, callback, retry_counter, priority)
+        self._queued.set()
+
+    async def _async_send_loop(self) -> None:
+        """Send the queued requests, each after the previous one was accepted.
+
+        The USB-stick accepts a request with the next sequence id, the
+        responses of the node refer to it. A request which is not accepted
+        in time is resent.
+        """
+        while True:
+            try:
+                _priority, _retry, _timestamp, request_set = (
+                    self._send_message_queue.get_nowait()
+                )
+            except queue.Empty:
+                self._queued.clear()
+                await self._queued.wait()
+                continue
+            seq_id = inc_seq_id(self.last_seq_id)
+            request_set[3] = datetime.now()
+            with self.lock_expected_responses:
+                self.expected_responses[seq_id] = request_set
+            LOGGER.debug(
+                "Send %s to %s using seq_id %s, retry %s",
+                request_set[0].__class__.__name__,
+                request_set[0].mac,
+                str(seq_id),
+                str(request_set[2]),
+            )
+            self.connection.send(request_set[0])
+            if not await self._async_accepted(seq_id) and seq_id != b"0000":
+                self.resend(seq_id)
+
+    async def _async_accepted(self, seq_id: bytes) -> bool:
+        """Wait until the USB-stick accepted the request with a sequence id.
+
+        The sequence id of the first request is unknown, the USB-stick
+        assigns its own.
+        """
+        with contextlib.suppress(TimeoutError):
+            async with asyncio.timeout(STICK_ACCEPT_TIMEOUT):
+                while self.last_seq_id != seq_id and (
+                    seq_id != b"0000" or self.last_seq_id is None
+                ):
+                    self._accepted.clear()
+                    await self._accepted.wait()
+                return True
+        return False
+
+    async def _async_timeout_loop(self) -> None:
+        """Resend the requests without any response within the message timeout."""
+        while True:
+            expired = datetime.now() - timedelta(seconds=MESSAGE_TIME_OUT)
+            with self.lock_expected_responses:
+                seq_ids = [
+                    seq_id
+                    for seq_id, request_set in self.expected_responses.items()
+                    if request_set[3] is not None and request_set[3] < expired
+                ]
+            for seq_id in seq_ids:
+                LOGGER.debug(
+                    "No response within %s seconds for seq_id %s",
+                    str(MESSAGE_TIME_OUT),
+                    str(seq_id),
+                )
+                self.resend(seq_id)
+            await asyncio.sleep(MESSAGE_TIME_OUT)
+
+    def resend(self, seq_id) -> None:
+        """Record the retry or drop of a request without a response and resend it."""
+        with self.lock_expected_responses:
+            request_set = self.expected_responses.get(seq_id)
+        if request_set is not None and request_set[0].mac:
+            self._record_resend(
+                request_set[0], request_set[0].mac.decode(UTF8_DECODE), request_set[2]
+            )
+        super().resend(seq_id)
+
+    def _record_resend(self, request, mac: str, retry: int) -> None:
+        """Record what the library does with a request without a response."""
+        if retry == -1:
+            # Single requests, like those of battery powered nodes
+            return
+        if retry <= MESSAGE_RETRY:
+            if not isinstance(request, NodeInfoRequest) or self.discovery_finished:
+                self._metrics.record_retry(mac)
+        elif not isinstance(request, NodePingRequest):
+            self._metrics.record_timeout(mac)
+            self._checking_nodes.add(mac)
+        elif mac in self._checking_nodes:
+            self._checking_nodes.discard(mac)
+        else:
+            self._metrics.record_timeout(mac)
+
+    def message_handler(self, message) -> None:
+        """Handle a received message, its node is reachable."""
+        if message.mac:
+            self._checking_nodes.discard(message.mac.decode(UTF8_DECODE))
+        try:
+            super().message_handler(message)
+        finally:
+            # The sequence id of the last accepted request might have changed
+            self._accepted.set()
@@ -7,32 +7,37 @@ from typing_extensions import ParamSpec
 from homeassistant.exceptions import HomeAssistantError
 from plugwise_usb.exceptions import PlugwiseException
 
-from .entity import PlugwiseEntity
+from . import PlugwiseUSBEntity
 
-_PlugwiseEntityT = TypeVar("_PlugwiseEntityT", bound=PlugwiseEntity)
+_PlugwiseUSBEntityT = TypeVar("_PlugwiseUSBEntityT", bound=PlugwiseUSBEntity)
 _R = TypeVar("_R")
 _P = ParamSpec("_P")
 
 
 def plugwise_command(
-    func: Callable[Concatenate[_PlugwiseEntityT, _P], Awaitable[_R]]
-) -> Callable[Concatenate[_PlugwiseEntityT, _P], Coroutine[Any, Any, _R]]:
+    func: Callable[Concatenate[_PlugwiseUSBEntityT, _P], Awaitable[_R]]
+) -> Callable[Concatenate[_PlugwiseUSBEntityT, _P], Coroutine[Any, Any, _R]]:
     """Decorate Plugwise calls that send commands/make changes to the device.
 
-    A decorator that wraps the passed in function, catches Plugwise errors,
-    and requests an coordinator update to update status of the devices asap.
+    A decorator that wraps the passed in function, catches Plugwise errors
+    and timeouts, and writes the state of the entity when the command is
+    finished, so an optimistic state is confirmed or rolled back.
     """
 
     async def handler(
-        self: _PlugwiseEntityT, *args: _P.args, **kwargs: _P.kwargs
+        self: _PlugwiseUSBEntityT, *args: _P.args, **kwargs: _P.kwargs
     ) -> _R:
         try:
             return await func(self, *args, **kwargs)
+        except TimeoutError as error:
+            raise HomeAssistantError(
+                f"No response of Plugwise node {self._node.mac}"
+            ) from error
         except PlugwiseException as error:
             raise HomeAssistantError(
-                f"Error communicating with API: {error}"
+                f"Error communicating with Plugwise node {self._node.mac}: {error}"
             ) from error
         finally:
-            await self.coordinator.async_request_refresh()
+            self.async_write_ha_state()
 
     return handler
@@ -0,0 +1,502 @@
+"""Simulated Plugwise network behind a pseudo terminal.
+
+The simulator plays the part of a USB-stick and the nodes of its network on
+the master side of a pty, the slave side can be used as the serial port of
+the integration. It acknowledges every request like a stick does and answers
+with the response of the addressed node after a configurable latency, or
+not at all to simulate packet loss. Circles report the power of a waveform,
+battery powered nodes only respond in their awake window and Scans report
+motion on their own.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import heapq
+from itertools import count
+import math
+import os
+import random
+import select
+import struct
+import tempfile
+import threading
+import time
+import tty
+
+from plugwise_usb.constants import (
+    LOGADDR_OFFSET,
+    MESSAGE_FOOTER,
+    MESSAGE_HEADER,
+    NODE_TYPE_CIRCLE,
+    NODE_TYPE_CIRCLE_PLUS,
+    NODE_TYPE_SCAN,
+    NODE_TYPE_SENSE,
+    PULSES_PER_KW_SECOND,
+    UTF8_DECODE,
+)
+from plugwise_usb.util import (
+    DateTime,
+    Int,
+    RealClockDate,
+    RealClockTime,
+    Time,
+    crc_fun,
+)
+
+# Waveforms return the power in Watt at a unix timestamp
+Waveform = Callable[[float], float]
+
+STICK_MAC = "000D6F0001000000"
+CIRCLE_PLUS_MAC = "000D6F0002000000"
+NETWORK_ID = 0x1234
+# The Circle+ has 64 memory slots for registered nodes
+REGISTRY_SIZE = 64
+# Hours of energy logs available when the simulation starts
+LOG_HISTORY_HOURS = 48
+
+HARDWARE_VERSIONS = {
+    NODE_TYPE_CIRCLE_PLUS: "000009008800",
+    NODE_TYPE_CIRCLE: "000009008700",
+    NODE_TYPE_SCAN: "000008000700",
+    NODE_TYPE_SENSE: "000007003000",
+}
+FIRMWARE_VERSION = 1262340000
+
+ACK_SUCCESS = "00C1"
+ACK_CLOCK_SET = "00D7"
+ACK_RELAY_ON = "00D8"
+ACK_RELAY_OFF = "00DE"
+ACK_REAL_TIME_CLOCK = "00DF"
+ACK_SCAN_CONFIGURE = "00BE"
+ACK_SLEEP_SET = "00F6"
+
+# Sequence ids reserved for unsolicited messages
+SEQ_AWAKE = "FFFE"
+SEQ_SWITCH_GROUP = "FFFF"
+SEQ_MAX = 0xFFFB
+
+
+def constant(watts: float) -> Waveform:
+    """Return a waveform of a constant power."""
+    return lambda now: watts
+
+
+def sine(mean: float, amplitude: float, period: float) -> Waveform:
+    """Return a waveform of a power oscillating around a mean."""
+    return lambda now: mean + amplitude * math.sin(2 * math.pi * now / period)
+
+
+def square(low: float, high: float, period: float) -> Waveform:
+    """Return a waveform switching between a low and a high power, like a fridge."""
+    return lambda now: high if now % period < period / 2 else low
+
+
+def noisy(waveform: Waveform, deviation: float, seed: int | None = None) -> Waveform:
+    """Return a waveform with gaussian noise added."""
+    rng = random.Random(seed)
+    return lambda now: max(waveform(now) + rng.gauss(0, deviation), 0.0)
+
+
+def watts_to_pulses(watts: float, seconds: float) -> int:
+    """Return the pulses counted by an uncalibrated Circle over a period."""
+    return round(watts / 1000 * PULSES_PER_KW_SECOND * seconds)
+
+
+def _hex(value: int, length: int) -> str:
+    """Return a value as upper case hex digits."""
+    return Int(value, length, False).serialize().decode(UTF8_DECODE)
+
+
+def _float(value: float) -> str:
+    """Return a float as hex digits of its IEEE 754 representation."""
+    return struct.pack("!f", value).hex().upper()
+
+
+def _log_date(timestamp: datetime) -> str:
+    """Return a timestamp in the YYMMmmmm format of node info and energy logs."""
+    minutes = (timestamp.day - 1) * 1440 + timestamp.hour * 60 + timestamp.minute
+    return DateTime(timestamp.year, timestamp.month, minutes).serialize().decode(
+        UTF8_DECODE
+    )
+
+
+@dataclass
+class SimulatedNode:
+    """A node of the simulated network."""
+
+    mac: str
+    node_type: int
+    waveform: Waveform = field(default_factory=lambda: constant(0.0))
+    relay_state: bool = True
+    awake_interval: float | None = None
+    awake_window: float = 10.0
+    motion_interval: float | None = None
+    awake_until: float = 0.0
+    motion: bool = False
+
+    @property
+    def battery_powered(self) -> bool:
+        """Return if the node is a sleeping end device."""
+        return self.awake_interval is not None
+
+    def awake(self, now: float) -> bool:
+        """Return if the node listens to requests."""
+        return not self.battery_powered or now < self.awake_until
+
+    def power(self, now: float) -> float:
+        """Return the power in Watt at a unix timestamp."""
+        return self.waveform(now) if self.relay_state else 0.0
+
+
+class SimulatedNetwork:
+    """USB-stick with a Circle+, Circles and battery powered nodes on a pty.
+
+    The Circle+ registers the first 64 nodes, like the real hardware. Larger
+    networks can be simulated by seeding the discovery cache of the
+    integration with node_cache().
+    """
+
+    def __init__(
+        self,
+        circles: int = 1,
+        scans: int = 0,
+        senses: int = 0,
+        waveform: Callable[[int], Waveform] | None = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        packet_loss: float = 0.0,
+        awake_interval: float = 60.0,
+        motion_interval: float | None = None,
+        seed: int | None = None,
+    ) -> None:
+        """Initialize the network, waveform returns the waveform of a Circle by index."""
+        self.latency = latency
+        self.jitter = jitter
+        self.packet_loss = packet_loss
+        self.requests: Counter[str] = Counter()
+        self.dropped = 0
+        self._random = random.Random(seed)
+        self._started = time.time()
+        self._log_start = datetime.utcnow().replace(
+            minute=0, second=0, microsecond=0
+        ) - timedelta(hours=LOG_HISTORY_HOURS)
+        waveform = waveform or (
+            lambda index: sine(100.0 + 10 * index, 20.0, 60.0 + index)
+        )
+        self.nodes: dict[str, SimulatedNode] = {
+            CIRCLE_PLUS_MAC: SimulatedNode(
+                CIRCLE_PLUS_MAC, NODE_TYPE_CIRCLE_PLUS, waveform(0)
+            )
+        }
+        for index in range(1, circles + 1):
+            self._add_node(SimulatedNode("", NODE_TYPE_CIRCLE, waveform(index)))
+        for _ in range(scans):
+            self._add_node(
+                SimulatedNode(
+                    "",
+                    NODE_TYPE_SCAN,
+                    awake_interval=awake_interval,
+                    motion_interval=motion_interval,
+                )
+            )
+        for _ in range(senses):
+            self._add_node(
+                SimulatedNode("", NODE_TYPE_SENSE, awake_interval=awake_interval)
+            )
+        self.registry = [
+            mac for mac in self.nodes if mac != CIRCLE_PLUS_MAC
+        ][:REGISTRY_SIZE]
+        self._master: int | None = None
+        self._slave: int | None = None
+        self.port = ""
+        self._directory = ""
+        self._seq_id = 0
+        self._buffer = b""
+        self._schedule: list[tuple[float, int, Callable[[], None]]] = []
+        self._order = count()
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._running = False
+        self._threads: list[threading.Thread] = []
+
+    def _add_node(self, node: SimulatedNode) -> None:
+        """Add a node with the next MAC address."""
+        node.mac = f"000D6F0003{len(self.nodes):06X}"
+        self.nodes[node.mac] = node
+
+    @property
+    def circles(self) -> list[str]:
+        """Return the MAC addresses of all nodes with a relay, the Circle+ first."""
+        return [mac for mac, node in self.nodes.items() if not node.battery_powered]
+
+    def node_cache(self) -> dict[str, dict[str, object]]:
+        """Return the metadata of all nodes in the format of the discovery cache."""
+        return {
+            mac: {
+                "address": index,
+                "node_type": node.node_type,
+                "hardware_version": HARDWARE_VERSIONS[node.node_type],
+                "firmware_version": str(datetime.utcfromtimestamp(FIRMWARE_VERSION)),
+            }
+            for index, (mac, node) in enumerate(self.nodes.items())
+            if mac != CIRCLE_PLUS_MAC
+        }
+
+    def plug(self) -> None:
+        """Open a new pty behind the port, like plugging in the USB-stick."""
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        os.symlink(os.ttyname(slave), self.port)
+        with self._write_lock:
+            self._master, self._slave = master, slave
+            self._buffer = b""
+
+    def unplug(self) -> None:
+        """Close the pty and remove the port, like pulling out the USB-stick."""
+        with self._write_lock:
+            descriptors = (self._master, self._slave)
+            self._master = self._slave = None
+        for descriptor in descriptors:
+            if descriptor is not None:
+                os.close(descriptor)
+        if os.path.lexists(self.port):
+            os.unlink(self.port)
+
+    def start(self) -> None:
+        """Open the pty and start answering requests."""
+        self._directory = tempfile.mkdtemp(prefix="plugwise_usb_")
+        self.port = os.path.join(self._directory, "ttyUSB0")
+        self.plug()
+        self._running = True
+        now = time.time()
+        for node in self.nodes.values():
+            if node.awake_interval is not None:
+                self._at(
+                    now + self._random.uniform(0, node.awake_interval),
+                    lambda node=node: self._wake_up(node),
+                )
+            if node.motion_interval is not None:
+                self._at(
+                    now + self._random.uniform(0, node.motion_interval),
+                    lambda node=node: self._detect_motion(node),
+                )
+        self._threads = [
+            threading.Thread(target=self._read_loop, name="simulator_reader"),
+            threading.Thread(target=self._schedule_loop, name="simulator_scheduler"),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """Stop answering requests and close the pty."""
+        self._running = False
+        with self._condition:
+            self._condition.notify()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.unplug()
+        os.rmdir(self._directory)
+
+    def __enter__(self) -> SimulatedNetwork:
+        """Start the simulation."""
+        self.start()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        """Stop the simulation."""
+        self.stop()
+
+    def _at(self, due: float, action: Callable[[], None]) -> None:
+        """Schedule an action at a unix timestamp."""
+        with self._condition:
+            heapq.heappush(self._schedule, (due, next(self._order), action))
+            self._condition.notify()
+
+    def _schedule_loop(self) -> None:
+        """Execute scheduled actions when they are due."""
+        while self._running:
+            with self._condition:
+                if not self._schedule:
+                    self._condition.wait(0.5)
+                    continue
+                due, _, action = self._schedule[0]
+                if (delay := due - time.time()) > 0:
+                    self._condition.wait(min(delay, 0.5))
+                    continue
+                heapq.heappop(self._schedule)
+            action()
+
+    def _read_loop(self) -> None:
+        """Read request frames written to the pty."""
+        while self._running:
+            if (master := self._master) is None:
+                time.sleep(0.1)
+                continue
+            try:
+                readable, _, _ = select.select([master], [], [], 0.1)
+                if not readable:
+                    continue
+                self._buffer += os.read(master, 4096)
+            except (OSError, ValueError):
+                # Unplugged while reading
+                continue
+            while (start := self._buffer.find(MESSAGE_HEADER)) != -1 and (
+                end := self._buffer.find(MESSAGE_FOOTER, start)
+            ) != -1:
+                frame = self._buffer[start : end + len(MESSAGE_FOOTER)]
+                self._buffer = self._buffer[end + len(MESSAGE_FOOTER) :]
+                self._handle_request(frame.decode(UTF8_DECODE))
+
+    def _write(self, message_id: str, seq_id: str, payload: str) -> None:
+        """Write a response frame to the pty."""
+        body = f"{message_id}{seq_id}{payload}".encode(UTF8_DECODE)
+        checksum = _hex(crc_fun(body), 4).encode(UTF8_DECODE)
+        with self._write_lock:
+            if self._master is not None and self._running:
+                os.write(self._master, MESSAGE_HEADER + body + checksum + MESSAGE_FOOTER)
+
+    def _respond(self, seq_id: str, message_id: str, payload: str) -> None:
+        """Send the response of a node after the latency, unless it gets lost."""
+        if self._random.random() < self.packet_loss:
+            self.dropped += 1
+            return
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        self._at(
+            time.time() + delay, lambda: self._write(message_id, seq_id, payload)
+        )
+
+    def _next_seq_id(self) -> str:
+        """Return the sequence id of the next acknowledged request."""
+        self._seq_id = self._seq_id + 1 if self._seq_id < SEQ_MAX else 0
+        return _hex(self._seq_id, 4)
+
+    def _handle_request(self, frame: str) -> None:
+        """Acknowledge a request and schedule the response of the addressed node."""
+        request_id = frame[4:8]
+        body = frame[8:-6]
+        self.requests[request_id] += 1
+        seq_id = self._next_seq_id()
+        self._write("0000", seq_id, ACK_SUCCESS)
+        if request_id == "000A":
+            self._respond(
+                seq_id,
+                "0011",
+                f"{STICK_MAC}0001{CIRCLE_PLUS_MAC}{_hex(NETWORK_ID, 4)}00",
+            )
+            return
+        mac, args = body[:16], body[16:]
+        now = time.time()
+        if (node := self.nodes.get(mac)) is None or not node.awake(now):
+            return
+        if response := self._node_response(node, request_id, args, now):
+            self._respond(seq_id, *response)
+
+    def _node_response(
+        self, node: SimulatedNode, request_id: str, args: str, now: float
+    ) -> tuple[str, str] | None:
+        """Return the message id and payload of the response of a node."""
+        mac = node.mac
+        utcnow = datetime.utcfromtimestamp(now)
+        if request_id == "000D":
+            return "000E", f"{mac}45380010"
+        if request_id == "0023":
+            return (
+                "0024",
+                f"{mac}{_log_date(utcnow)}{self._log_address(now)}"
+                f"{_hex(node.relay_state, 2)}85{HARDWARE_VERSIONS[node.node_type]}"
+                f"{_hex(FIRMWARE_VERSION, 8)}{_hex(node.node_type, 2)}",
+            )
+        if node.battery_powered:
+            if request_id == "0050":
+                return "0000", f"{ACK_SLEEP_SET}{mac}"
+            if request_id == "0101":
+                return "0000", f"{ACK_SCAN_CONFIGURE}{mac}"
+            return None
+        if request_id == "0012":
+            power = node.power(now)
+            pulses_1s = watts_to_pulses(power, 1)
+            pulses_8s = watts_to_pulses(power, 8)
+            pulses_hour = watts_to_pulses(power, utcnow.minute * 60 + utcnow.second)
+            return (
+                "0013",
+                f"{mac}{_hex(pulses_1s, 4)}{_hex(pulses_8s, 4)}"
+                f"{_hex(pulses_hour, 8)}{_hex(0, 8)}0000",
+            )
+        if request_id == "0017":
+            node.relay_state = args == "01"
+            return "0000", f"{ACK_RELAY_ON if node.relay_state else ACK_RELAY_OFF}{mac}"
+        if request_id == "0018" and node.node_type == NODE_TYPE_CIRCLE_PLUS:
+            address = int(args, 16)
+            registered = (
+                self.registry[address]
+                if address < len(self.registry)
+                else "FFFFFFFFFFFFFFFF"
+            )
+            return "0019", f"{mac}{registered}{args}"
+        if request_id == "0026":
+            return "0027", f"{mac}{_float(1.0)}{_float(0.0)}{_float(0.0)}{_float(0.0)}"
+        if request_id == "0016":
+            return "0000", f"{ACK_CLOCK_SET}{mac}"
+        if request_id == "0028":
+            return "0000", f"{ACK_REAL_TIME_CLOCK}{mac}"
+        if request_id == "0029":
+            clock_time = RealClockTime(utcnow.hour, utcnow.minute, utcnow.second)
+            clock_date = RealClockDate(utcnow.day, utcnow.month, utcnow.year)
+            return (
+                "003A",
+                f"{mac}{clock_time.serialize().decode(UTF8_DECODE)}"
+                f"{_hex(utcnow.weekday(), 2)}"
+                f"{clock_date.serialize().decode(UTF8_DECODE)}",
+            )
+        if request_id == "003E":
+            clock_time = Time(utcnow.hour, utcnow.minute, utcnow.second)
+            return (
+                "003F",
+                f"{mac}{clock_time.serialize().decode(UTF8_DECODE)}"
+                f"{_hex(utcnow.weekday(), 2)}000000",
+            )
+        if request_id == "0048":
+            return "0049", f"{mac}{self._energy_log(node, args, now)}"
+        return None
+
+    def _completed_hours(self, now: float) -> int:
+        """Return the number of hours logged since the start of the energy logs."""
+        elapsed = datetime.utcfromtimestamp(now) - self._log_start
+        return int(elapsed.total_seconds() // 3600)
+
+    def _log_address(self, now: float) -> str:
+        """Return the address of the energy log page being filled."""
+        return _hex(self._completed_hours(now) // 4 * 32 + LOGADDR_OFFSET, 8)
+
+    def _energy_log(self, node: SimulatedNode, args: str, now: float) -> str:
+        """Return the four hourly slots and address of an energy log page."""
+        address = (int(args, 16) - LOGADDR_OFFSET) // 32
+        completed = self._completed_hours(now)
+        slots = ""
+        for slot in range(address * 4, address * 4 + 4):
+            if slot >= completed:
+                slots += "FFFFFFFFFFFFFFFF"
+                continue
+            # Each slot holds the pulses of the hour before its timestamp
+            hour_end = self._log_start + timedelta(hours=slot + 1)
+            middle = (hour_end - timedelta(minutes=30) - datetime(1970, 1, 1))
+            watts = node.power(middle.total_seconds())
+            slots += f"{_log_date(hour_end)}{_hex(watts_to_pulses(watts, 3600), 8)}"
+        return f"{slots}{args}"
+
+    def _wake_up(self, node: SimulatedNode) -> None:
+        """Announce a battery powered node is awake and listen for requests."""
+        now = time.time()
+        node.awake_until = now + node.awake_window
+        self._write("004F", SEQ_AWAKE, f"{node.mac}00")
+        self._at(now + node.awake_interval, lambda: self._wake_up(node))
+
+    def _detect_motion(self, node: SimulatedNode) -> None:
+        """Toggle the motion state of a Scan."""
+        node.motion = not node.motion
+        self._write("0056", SEQ_SWITCH_GROUP, f"{node.mac}00{_hex(node.motion, 2)}")
+        self._at(time.time() + node.motion_interval, lambda: self._detect_motion(node))
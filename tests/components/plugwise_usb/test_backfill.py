@@ -0,0 +1,96 @@
+"""Test the Plugwise USB energy log backfill."""
+from datetime import datetime, timedelta
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from homeassistant.components.plugwise_usb.backfill import PlugwiseUSBEnergyBackfill
+from homeassistant.components.plugwise_usb.const import DOMAIN
+from homeassistant.core import HomeAssistant
+from tests.common import MockConfigEntry
+
+TEST_MAC = "0123456789ABCDEF"
+TEST_STICK_MAC = "0123456789ABCDE0"
+START = datetime(2024, 1, 1)
+
+
+def page(first_hour: int, slots: int) -> list[tuple[datetime, int]]:
+    """Return the slots of an energy log page."""
+    return [
+        (START + timedelta(hours=first_hour + slot), 1000) for slot in range(slots)
+    ]
+
+
+async def test_resume_backfill(
+    hass: HomeAssistant, hass_storage: dict[str, Any]
+) -> None:
+    """Test an interrupted backfill resumes from its checkpoint."""
+    hass_storage[f"{DOMAIN}.{TEST_STICK_MAC}.backfill"] = {
+        "version": 1,
+        "data": {
+            TEST_MAC: {
+                "log_address": 8,
+                "last_hour": "2024-01-01T00:00:00+00:00",
+                "sum": 10.0,
+            }
+        },
+    }
+    config_entry = MockConfigEntry(domain=DOMAIN)
+    config_entry.add_to_hass(hass)
+    node = MagicMock(_last_log_address=10, measures_power=True)
+    node.pulses_to_kws = lambda pulses, seconds: pulses / 1000
+    pages = {8: page(1, 4), 9: None, 10: page(9, 2)}
+    api_stick = MagicMock(devices={TEST_MAC: node})
+    api_stick.async_request_energy_log = AsyncMock(
+        side_effect=lambda mac, address: pages[address]
+    )
+    backfill = PlugwiseUSBEnergyBackfill(hass, config_entry, api_stick, TEST_STICK_MAC)
+    await backfill.async_load()
+
+    with patch(
+        "homeassistant.components.plugwise_usb.backfill.async_add_external_statistics"
+    ) as add_statistics:
+        await backfill.async_schedule_node(TEST_MAC)
+        statistics = add_statistics.call_args[0][2]
+        assert [stat["sum"] for stat in statistics] == [11.0, 12.0, 13.0, 14.0]
+        assert statistics[0]["start"].isoformat() == "2024-01-01T00:00:00+00:00"
+
+        # Only the failed and the partially filled page are read again
+        api_stick.async_request_energy_log.reset_mock()
+        pages[9] = page(5, 4)
+        await backfill.async_schedule_node(TEST_MAC)
+        assert [
+            call.args[1] for call in api_stick.async_request_energy_log.call_args_list
+        ] == [9, 10]
+        statistics = add_statistics.call_args[0][2]
+        assert statistics[-1]["sum"] == 20.0
+
+        # Nothing to do until the Circle starts a new page
+        assert backfill.async_schedule_node(TEST_MAC) is None
+
+
+async def test_backfill_waits_for_calibration(
+    hass: HomeAssistant, hass_storage: dict[str, Any]
+) -> None:
+    """Test energy logs are not imported as 0 kWh before the calibration."""
+    hass_storage[f"{DOMAIN}.{TEST_STICK_MAC}.backfill"] = {
+        "version": 1,
+        "data": {TEST_MAC: {"log_address": 0, "last_hour": None, "sum": 0.0}},
+    }
+    config_entry = MockConfigEntry(domain=DOMAIN)
+    config_entry.add_to_hass(hass)
+    node = MagicMock(_last_log_address=1, measures_power=True, calibration=False)
+    node.pulses_to_kws = lambda pulses, seconds: pulses / 1000
+    api_stick = MagicMock(devices={TEST_MAC: node})
+    api_stick.async_request_energy_log = AsyncMock(return_value=page(0, 4))
+    backfill = PlugwiseUSBEnergyBackfill(hass, config_entry, api_stick, TEST_STICK_MAC)
+    await backfill.async_load()
+
+    assert backfill.async_schedule_node(TEST_MAC) is None
+    api_stick.async_request_energy_log.assert_not_called()
+
+    node.calibration = True
+    with patch(
+        "homeassistant.components.plugwise_usb.backfill.async_add_external_statistics"
+    ):
+        await backfill.async_schedule_node(TEST_MAC)
+    assert api_stick.async_request_energy_log.call_count == 2
@@ -0,0 +1,259 @@
+"""Benchmark the Plugwise USB integration against a simulated network.
+
+The benchmarks only run when PLUGWISE_USB_BENCHMARK is set, they take
+minutes for the larger networks. Every run is appended to the results file
+(PLUGWISE_USB_BENCHMARK_RESULTS, default .benchmarks/plugwise_usb.json) and
+compared with the previous run of the same network, a metric which got
+worse by more than PLUGWISE_USB_BENCHMARK_TOLERANCE percent is reported as
+a warning.
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+import json
+import os
+from pathlib import Path
+import statistics
+import threading
+import time
+from typing import Any
+import warnings
+
+import pytest
+
+from homeassistant.components.plugwise_usb.const import (
+    CACHE_STORAGE_VERSION,
+    CONF_USB_PATH,
+    DOMAIN,
+    USB_POWER_ID,
+    USB_RELAY_ID,
+)
+from homeassistant.components.plugwise_usb.stick import PlugwiseUSBStick
+from homeassistant.const import EVENT_STATE_CHANGED, STATE_OFF, STATE_UNAVAILABLE
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from tests.common import MockConfigEntry
+
+from .simulator import CIRCLE_PLUS_MAC, STICK_MAC, SimulatedNetwork, constant
+
+BENCHMARK = os.environ.get("PLUGWISE_USB_BENCHMARK")
+BENCHMARK_NODES = [
+    int(nodes)
+    for nodes in os.environ.get("PLUGWISE_USB_BENCHMARK_NODES", "10,100,500").split(",")
+]
+BENCHMARK_LATENCY = float(os.environ.get("PLUGWISE_USB_BENCHMARK_LATENCY", "0.02"))
+BENCHMARK_PACKET_LOSS = float(
+    os.environ.get("PLUGWISE_USB_BENCHMARK_PACKET_LOSS", "0.0")
+)
+BENCHMARK_WINDOW = float(os.environ.get("PLUGWISE_USB_BENCHMARK_WINDOW", "60"))
+BENCHMARK_TIMEOUT = float(os.environ.get("PLUGWISE_USB_BENCHMARK_TIMEOUT", "600"))
+BENCHMARK_SWITCHES = 20
+BENCHMARK_RESULTS = Path(
+    os.environ.get("PLUGWISE_USB_BENCHMARK_RESULTS", ".benchmarks/plugwise_usb.json")
+)
+BENCHMARK_TOLERANCE = float(os.environ.get("PLUGWISE_USB_BENCHMARK_TOLERANCE", "20"))
+
+# Metrics where a lower value is better, the others should rather increase
+LOWER_IS_BETTER = {
+    "setup_time",
+    "entities_time",
+    "available_time",
+    "switch_latency_p50",
+    "switch_latency_p95",
+    "switch_latency_max",
+}
+
+
+async def wait_for_stick_threads(threads_before: set[threading.Thread]) -> None:
+    """Wait until the threads of the stick have stopped."""
+    for thread in set(threading.enumerate()) - threads_before:
+        if thread.name.endswith("_thread"):
+            await asyncio.get_running_loop().run_in_executor(None, thread.join, 20)
+
+
+async def test_simulated_stick(hass: HomeAssistant) -> None:
+    """Test the stick initializes, switches and measures a simulated Circle+."""
+    threads_before = set(threading.enumerate())
+    with SimulatedNetwork(circles=0, waveform=lambda index: constant(230.0)) as network:
+        api_stick = PlugwiseUSBStick(hass, network.port)
+        await api_stick.async_connect()
+        assert api_stick.circle_plus_mac == CIRCLE_PLUS_MAC
+        assert api_stick.mac == STICK_MAC
+
+        await api_stick.async_switch_relay(CIRCLE_PLUS_MAC, False)
+        assert not network.nodes[CIRCLE_PLUS_MAC].relay_state
+        await api_stick.async_switch_relay(CIRCLE_PLUS_MAC, True)
+
+        circle_plus = api_stick.devices[CIRCLE_PLUS_MAC]
+        power = asyncio.Event()
+        circle_plus.subscribe_callback(
+            lambda _: hass.loop.call_soon_threadsafe(power.set), USB_POWER_ID
+        )
+        api_stick.request_update(CIRCLE_PLUS_MAC, "power")
+        async with asyncio.timeout(10):
+            await power.wait()
+        assert circle_plus.current_power_usage == pytest.approx(230.0, abs=1)
+
+        await api_stick.async_disconnect()
+    await wait_for_stick_threads(threads_before)
+
+
+def _percentile(values: list[float], percentile: int) -> float:
+    """Return a percentile of measured values."""
+    return statistics.quantiles(values, n=100, method="inclusive")[percentile - 1]
+
+
+def _store_results(results: dict[str, Any]) -> list[str]:
+    """Append the results to the results file, return the metrics which regressed."""
+    runs: list[dict[str, Any]] = []
+    if BENCHMARK_RESULTS.exists():
+        runs = json.loads(BENCHMARK_RESULTS.read_text())
+    previous = next(
+        (
+            run
+            for run in reversed(runs)
+            if run["network"] == results["network"]
+        ),
+        None,
+    )
+    regressions = []
+    if previous is not None:
+        for metric, value in results["metrics"].items():
+            if not (before := previous["metrics"].get(metric)):
+                continue
+            change = (value - before) / before * 100
+            if metric not in LOWER_IS_BETTER:
+                change = -change
+            if change > BENCHMARK_TOLERANCE:
+                regressions.append(
+                    f"{metric} {before:.3f} -> {value:.3f} ({change:+.0f}%)"
+                )
+        results["previous"] = previous["timestamp"]
+    runs.append(results)
+    BENCHMARK_RESULTS.parent.mkdir(parents=True, exist_ok=True)
+    BENCHMARK_RESULTS.write_text(json.dumps(runs, indent=2))
+    return regressions
+
+
+@pytest.mark.skipif(not BENCHMARK, reason="PLUGWISE_USB_BENCHMARK is not set")
+@pytest.mark.parametrize("nodes", BENCHMARK_NODES)
+async def test_benchmark(
+    hass: HomeAssistant, hass_storage: dict[str, Any], nodes: int
+) -> None:
+    """Measure setup time, update throughput and switch latency of a network.
+
+    All nodes are known in the discovery cache, like after a restart, because
+    the Circle+ only registers 64 nodes.
+    """
+    threads_before = set(threading.enumerate())
+    network = SimulatedNetwork(
+        circles=nodes - 1,
+        latency=BENCHMARK_LATENCY,
+        jitter=BENCHMARK_LATENCY,
+        packet_loss=BENCHMARK_PACKET_LOSS,
+        seed=nodes,
+    )
+    hass_storage[f"{DOMAIN}.{STICK_MAC}.nodes"] = {
+        "version": CACHE_STORAGE_VERSION,
+        "data": network.node_cache(),
+    }
+    network.start()
+    config_entry = MockConfigEntry(
+        domain=DOMAIN, unique_id=STICK_MAC, data={CONF_USB_PATH: network.port}
+    )
+    config_entry.add_to_hass(hass)
+    try:
+        start = time.monotonic()
+        assert await hass.config_entries.async_setup(config_entry.entry_id)
+        setup_time = time.monotonic() - start
+
+        entity_registry = er.async_get(hass)
+        switches = [
+            entity_id
+            for mac in network.circles
+            if (
+                entity_id := entity_registry.async_get_entity_id(
+                    "switch", DOMAIN, f"{mac}-{USB_RELAY_ID}"
+                )
+            )
+        ]
+        assert len(switches) == nodes
+
+        # Wait until the entities of all nodes are added to the state machine
+        while any(hass.states.get(entity_id) is None for entity_id in switches):
+            if time.monotonic() - start > BENCHMARK_TIMEOUT:
+                break
+            await asyncio.sleep(0.01)
+        entities_time = time.monotonic() - start
+
+        # Wait until every node responded
+        while any(
+            hass.states.get(entity_id).state == STATE_UNAVAILABLE
+            for entity_id in switches
+        ):
+            if time.monotonic() - start > BENCHMARK_TIMEOUT:
+                break
+            await asyncio.sleep(1)
+        available_time = time.monotonic() - start
+        available = sum(
+            hass.states.get(entity_id).state != STATE_UNAVAILABLE
+            for entity_id in switches
+        )
+
+        # Count the state updates of all entities during a window
+        updates = 0
+
+        @callback
+        def state_changed(event: Event) -> None:
+            nonlocal updates
+            if (entry := entity_registry.async_get(event.data["entity_id"])) and (
+                entry.config_entry_id == config_entry.entry_id
+            ):
+                updates += 1
+
+        requests_before = network.requests.total()
+        unsub = hass.bus.async_listen(EVENT_STATE_CHANGED, state_changed)
+        await asyncio.sleep(BENCHMARK_WINDOW)
+        unsub()
+        requests = network.requests.total() - requests_before
+
+        latencies = []
+        for entity_id in switches[:BENCHMARK_SWITCHES]:
+            for service in ("turn_off", "turn_on"):
+                start = time.monotonic()
+                await hass.services.async_call(
+                    "switch", service, {"entity_id": entity_id}, blocking=True
+                )
+                latencies.append(time.monotonic() - start)
+        assert hass.states.get(switches[0]).state != STATE_OFF
+    finally:
+        await hass.config_entries.async_unload(config_entry.entry_id)
+        await hass.async_block_till_done()
+        network.stop()
+        await wait_for_stick_threads(threads_before)
+
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "network": {
+            "nodes": nodes,
+            "latency": BENCHMARK_LATENCY,
+            "packet_loss": BENCHMARK_PACKET_LOSS,
+        },
+        "metrics": {
+            "setup_time": setup_time,
+            "entities_time": entities_time,
+            "available_time": available_time,
+            "available_nodes": available,
+            "updates_per_second": updates / BENCHMARK_WINDOW,
+            "requests_per_second": requests / BENCHMARK_WINDOW,
+            "switch_latency_p50": _percentile(latencies, 50),
+            "switch_latency_p95": _percentile(latencies, 95),
+            "switch_latency_max": max(latencies),
+        },
+    }
+    if regressions := _store_results(results):
+        warnings.warn(
+            f"Benchmark of {nodes} nodes regressed: {', '.join(regressions)}",
+            stacklevel=1,
+        )
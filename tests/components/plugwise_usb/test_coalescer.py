@@ -0,0 +1,41 @@
+"""Test the Plugwise USB state write coalescer."""
+import asyncio
+from unittest.mock import MagicMock
+
+from homeassistant.components.plugwise_usb.coalescer import PlugwiseUSBUpdateCoalescer
+from homeassistant.core import HomeAssistant
+
+
+async def test_coalesce_state_writes(hass: HomeAssistant) -> None:
+    """Test repeated updates of an entity result in a single state write."""
+    coalescer = PlugwiseUSBUpdateCoalescer(hass, 0.05)
+    entity_a = MagicMock()
+    entity_b = MagicMock()
+
+    for _ in range(10):
+        coalescer.mark_dirty(entity_a)
+    coalescer.mark_dirty(entity_b)
+    await hass.async_block_till_done()
+    await asyncio.sleep(0.1)
+
+    assert entity_a.async_write_ha_state.call_count == 1
+    assert entity_b.async_write_ha_state.call_count == 1
+    assert coalescer.updates_received == 11
+    assert coalescer.writes_performed == 2
+
+
+async def test_discard_and_shutdown(hass: HomeAssistant) -> None:
+    """Test removed entities are not written."""
+    coalescer = PlugwiseUSBUpdateCoalescer(hass, 0.05)
+    entity = MagicMock()
+
+    coalescer.mark_dirty(entity)
+    coalescer.async_discard(entity)
+    await asyncio.sleep(0.1)
+    assert entity.async_write_ha_state.call_count == 0
+
+    coalescer.mark_dirty(entity)
+    await hass.async_block_till_done()
+    coalescer.async_shutdown()
+    await asyncio.sleep(0.1)
+    assert entity.async_write_ha_state.call_count == 0
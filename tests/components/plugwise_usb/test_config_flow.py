@@ -5,28 +5,45 @@ import pytest
 import serial.tools.list_ports
 from voluptuous.error import MultipleInvalid
 
-from homeassistant.components.plugwise_usb.config_flow import CONF_MANUAL_PATH
+from homeassistant.components import usb
+from homeassistant.components.plugwise_usb.config_flow import (
+    CONF_AUTO_DETECT,
+    CONF_MANUAL_PATH,
+    StickProbe,
+)
 from homeassistant.components.plugwise_usb.const import CONF_USB_PATH, DOMAIN
-from homeassistant.config_entries import SOURCE_USER
+from homeassistant.config_entries import SOURCE_USB, SOURCE_USER
 from homeassistant.const import CONF_SOURCE
 from homeassistant.core import HomeAssistant
 from homeassistant.data_entry_flow import FlowResultType
 from plugwise_usb.exceptions import NetworkDown, StickInitError, TimeoutException
+from tests.common import MockConfigEntry
 
 TEST_USBPORT = "/dev/ttyUSB1"
 TEST_USBPORT2 = "/dev/ttyUSB2"
+TEST_USBPORT3 = "/dev/ttyUSB3"
+TEST_MAC = "0123456789ABCDEF"
 
 
-def com_port():
-    """Mock of a serial port."""
-    port = serial.tools.list_ports_common.ListPortInfo(TEST_USBPORT)
+def com_port(device=TEST_USBPORT, vid=0x0403, pid=0x6001):
+    """Mock of a serial port, with the FTDI chip of the USB-stick by default."""
+    port = serial.tools.list_ports_common.ListPortInfo(device)
+    port.vid = vid
+    port.pid = pid
     port.serial_number = "1234"
     port.manufacturer = "Virtual serial port"
-    port.device = TEST_USBPORT
+    port.device = device
     port.description = "Some serial port"
     return port
 
 
+def probe_port(device_path: str) -> StickProbe:
+    """Mock of probing a serial port, only the second port has a stick."""
+    if device_path == TEST_USBPORT2:
+        return StickProbe(device_path, TEST_MAC, None, 0.1)
+    return StickProbe(device_path, None, "stick_init", 3.0)
+
+
 async def test_form_flow_usb(
     hass: HomeAssistant,
     mock_setup_entry: AsyncMock,
@@ -79,6 +96,81 @@ async def test_user_flow_select(hass):
     assert result["errors"] == {"base": "already_configured"}
 
 
+@patch(
+    "serial.tools.list_ports.comports",
+    MagicMock(
+        return_value=[
+            com_port(),
+            com_port(TEST_USBPORT2),
+            com_port(TEST_USBPORT3, 0x10C4, 0xEA60),
+        ]
+    ),
+)
+async def test_user_flow_auto_detect(hass, mock_setup_entry: AsyncMock) -> None:
+    """Test the free FTDI serial ports are probed once to find the USB-stick."""
+    # A radio of another integration on an FTDI port is not probed
+    MockConfigEntry(domain="zha", data={"device": {"path": TEST_USBPORT}}).add_to_hass(
+        hass
+    )
+    with patch(
+        "homeassistant.components.plugwise_usb.config_flow._probe_port",
+        side_effect=probe_port,
+    ) as mock_probe:
+        flows = []
+        for _ in range(2):
+            result = await hass.config_entries.flow.async_init(
+                DOMAIN,
+                context={CONF_SOURCE: SOURCE_USER},
+            )
+            result = await hass.config_entries.flow.async_configure(
+                result["flow_id"], user_input={CONF_USB_PATH: CONF_AUTO_DETECT}
+            )
+            assert result["type"] == FlowResultType.FORM
+            assert result["step_id"] == "auto_detect"
+            flows.append(result["flow_id"])
+        mock_probe.assert_called_once_with(TEST_USBPORT2)
+
+    result = await hass.config_entries.flow.async_configure(
+        flows[0], user_input={CONF_USB_PATH: TEST_USBPORT2}
+    )
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    assert result["data"] == {CONF_USB_PATH: TEST_USBPORT2}
+    assert result["result"].unique_id == TEST_MAC
+
+
+async def test_usb_discovery(hass, mock_setup_entry: AsyncMock) -> None:
+    """Test a discovered serial port is only set up if it is a USB-stick."""
+    with patch(
+        "homeassistant.components.plugwise_usb.config_flow._probe_port",
+        side_effect=probe_port,
+    ):
+        for device, reason in (
+            (TEST_USBPORT, "not_plugwise_stick"),
+            (TEST_USBPORT2, None),
+        ):
+            result = await hass.config_entries.flow.async_init(
+                DOMAIN,
+                context={CONF_SOURCE: SOURCE_USB},
+                data=usb.UsbServiceInfo(
+                    device=device,
+                    vid="0403",
+                    pid="6001",
+                    serial_number="1234",
+                    manufacturer="FTDI",
+                    description="Plugwise USB-Stick",
+                ),
+            )
+            if reason:
+                assert result["type"] == FlowResultType.ABORT
+                assert result["reason"] == reason
+    assert result["type"] == FlowResultType.FORM
+    assert result["step_id"] == "usb_confirm"
+
+    result = await hass.config_entries.flow.async_configure(result["flow_id"], {})
+    assert result["type"] == FlowResultType.CREATE_ENTRY
+    assert result["data"] == {CONF_USB_PATH: TEST_USBPORT2}
+
+
 async def test_user_flow_manual_selected_show_form(hass):
     """Test user step form when manual path is selected."""
     result = await hass.config_entries.flow.async_init(
@@ -222,3 +314,46 @@ async def test_timeout_exception(hass):
     )
     assert result["type"] == "form"
     assert result["errors"] == {"base": "network_timeout"}
+
+
+async def test_options_flow(hass: HomeAssistant) -> None:
+    """Test the deadbands and publish intervals are stored as options."""
+    config_entry = MockConfigEntry(domain=DOMAIN, data={CONF_USB_PATH: TEST_USBPORT})
+    config_entry.add_to_hass(hass)
+    result = await hass.config_entries.options.async_init(config_entry.entry_id)
+    assert result.get("type") == FlowResultType.MENU
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {"next_step_id": "sensor_updates"}
+    )
+    assert result.get("type") == FlowResultType.FORM
+    assert result.get("step_id") == "sensor_updates"
+
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"],
+        user_input={
+            "deadband_power": 2,
+            "deadband_mode_power": "relative",
+            "publish_min_interval": 5,
+        },
+    )
+    assert result.get("type") == FlowResultType.CREATE_ENTRY
+    assert config_entry.options["deadband_power"] == 2.0
+    assert config_entry.options["deadband_mode_power"] == "relative"
+    assert config_entry.options["deadband_energy"] == 0.0
+    assert config_entry.options["publish_min_interval"] == 5
+    assert config_entry.options["publish_max_interval"] == 900
+
+    # Performance settings keep the sensor update options
+    result = await hass.config_entries.options.async_init(config_entry.entry_id)
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {"next_step_id": "performance"}
+    )
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"],
+        user_input={"poll_interval_power": 5, "energy_backfill": False},
+    )
+    assert result.get("type") == FlowResultType.CREATE_ENTRY
+    assert config_entry.options["poll_interval_power"] == 5
+    assert config_entry.options["message_budget"] == 2.0
+    assert not config_entry.options["energy_backfill"]
+    assert config_entry.options["deadband_power"] == 2.0
@@ -0,0 +1,87 @@
+"""Test the Plugwise USB energy integrated from power samples."""
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+
+from homeassistant.components.plugwise_usb.const import DOMAIN, USB_POWER_ID
+from homeassistant.components.plugwise_usb.energy import (
+    EnergyIntegrator,
+    PlugwiseUSBLocalEnergy,
+)
+from homeassistant.core import HomeAssistant
+
+TEST_MAC = "0123456789ABCDEF"
+TEST_STICK_MAC = "0123456789ABCDE0"
+
+
+def integrate(integrator: EnergyIntegrator, power: float, start: float) -> float:
+    """Add an hour of samples of a constant power every 10 seconds."""
+    for step in range(361):
+        integrator.add(power, start + step * 10)
+    return start + 3600
+
+
+def test_integrator() -> None:
+    """Test the integrated energy follows the counter and never decreases."""
+    integrator = EnergyIntegrator()
+    integrator.add(0, 0)
+    integrator.add(1000, 10)
+    assert integrator.total == pytest.approx(500 * 10 / 3600000)
+    # Samples after a gap are not integrated
+    integrator.add(1000, 10000)
+    assert integrator.total == pytest.approx(500 * 10 / 3600000)
+
+    integrator = EnergyIntegrator()
+    integrator.reconcile(1.0)
+    now = integrate(integrator, 1000, 0)
+    assert integrator.total == pytest.approx(1.0)
+
+    # The counter measured 10% more, the correction follows and the total too
+    integrator.reconcile(2.1)
+    assert integrator.total == pytest.approx(1.1)
+    assert integrator.correction == pytest.approx(1.03)
+
+    # The counter measured less, the excess is withheld from the next samples
+    now = integrate(integrator, 1000, now)
+    total = integrator.total
+    integrator.reconcile(2.6)
+    assert integrator.total == total
+    assert integrator.correction == pytest.approx(0.871)
+    integrate(integrator, 1000, now)
+    assert integrator.total == pytest.approx(total + 0.871 - (1.03 - 0.5))
+
+    # The energy integrated before a restart is not counted again after the
+    # counter reset at midnight
+    total = integrator.total
+    restored = EnergyIntegrator(integrator.as_dict())
+    restored.reconcile(0.2)
+    assert restored.total == total
+    assert restored.correction == pytest.approx(0.871 + 0.3 * (0.5 - 0.871))
+
+
+async def test_local_energy(hass: HomeAssistant, hass_storage: dict[str, Any]) -> None:
+    """Test the power samples of a node are integrated and stored."""
+    node = MagicMock(available=True, current_power_usage=1000.0)
+    api_stick = MagicMock(devices={TEST_MAC: node})
+    local_energy = PlugwiseUSBLocalEnergy(hass, api_stick, TEST_STICK_MAC, 15)
+    await local_energy.async_load()
+    local_energy.async_add_node(TEST_MAC)
+    power_sample, callback_type = node.subscribe_callback.call_args[0]
+    assert callback_type == USB_POWER_ID
+
+    power_sample(None)
+    node.energy_consumption_today = 3.0
+    local_energy._async_reconcile()
+    await local_energy.async_stop()
+    node.unsubscribe_callback.assert_called_once_with(power_sample, USB_POWER_ID)
+    stored = hass_storage[f"{DOMAIN}.{TEST_STICK_MAC}.energy"]["data"]
+    assert stored[TEST_MAC]["counter"] == 3.0
+
+    local_energy = PlugwiseUSBLocalEnergy(hass, api_stick, TEST_STICK_MAC, 15)
+    await local_energy.async_load()
+    local_energy.async_add_node(TEST_MAC)
+    node.energy_consumption_today = 3.5
+    local_energy._async_reconcile()
+    assert local_energy.get(TEST_MAC).total == pytest.approx(0.5)
+    await local_energy.async_stop()
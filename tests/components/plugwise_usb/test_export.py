@@ -0,0 +1,108 @@
+"""Test the Plugwise USB power export."""
+import os
+import queue
+import threading
+from unittest.mock import MagicMock, patch
+
+from homeassistant.components.plugwise_usb.const import USB_POWER_ID
+from homeassistant.components.plugwise_usb.export import PlugwiseUSBPowerExport
+from homeassistant.core import HomeAssistant
+
+TEST_MAC = "0123456789ABCDEF"
+
+
+def mock_node() -> MagicMock:
+    """Return a Circle which keeps its power callbacks."""
+    node = MagicMock()
+    node.mac = TEST_MAC
+    node.measures_power = True
+    node.available = True
+    node.current_power_usage = 100.5
+    node.current_power_usage_8_sec = 99.0
+    node.callbacks = []
+    node.subscribe_callback.side_effect = (
+        lambda callback, sensor: node.callbacks.append(callback) or True
+    )
+    return node
+
+
+async def test_power_export(hass: HomeAssistant, tmp_path) -> None:
+    """Test power samples are written as line protocol and rotated."""
+    node = mock_node()
+    api_stick = MagicMock()
+    api_stick.devices = {TEST_MAC: node}
+    power_export = PlugwiseUSBPowerExport(hass, api_stick, "000D6F0001000001")
+    power_export.path = str(tmp_path / "power.lp")
+    power_export.async_add_node(TEST_MAC)
+    assert len(node.callbacks) == 1
+
+    # Samples are ignored while the export is disabled
+    node.callbacks[0](None)
+    await power_export.async_set_enabled(True)
+    # A sample without a power is skipped
+    node.current_power_usage = None
+    node.callbacks[0](None)
+    node.current_power_usage = 100.5
+    sampler = threading.Thread(
+        target=lambda: [node.callbacks[0](None) for _ in range(3)]
+    )
+    sampler.start()
+    sampler.join()
+    await power_export.async_set_enabled(False)
+    with open(power_export.path, encoding="utf-8") as file:
+        lines = file.readlines()
+    assert len(lines) == 3
+    assert lines[0].startswith(f"power,mac={TEST_MAC} power_1s=100.5,power_8s=99.0 ")
+    assert power_export.exported == 3
+
+    # A file is rotated when it exceeds the maximum size
+    power_export.max_size = 1e-6
+    power_export.max_files = 2
+    await power_export.async_set_enabled(True)
+    node.callbacks[0](None)
+    await power_export.async_set_enabled(False)
+    assert os.path.exists(f"{power_export.path}.1")
+    assert not os.path.exists(f"{power_export.path}.2")
+
+    # Samples are dropped instead of blocking the loop when the queue is full
+    power_export._queue = queue.Queue(1)
+    power_export._enabled = True
+    node.callbacks[0](None)
+    node.callbacks[0](None)
+    assert power_export.dropped == 1
+    power_export._enabled = False
+
+    await power_export.async_stop()
+    node.unsubscribe_callback.assert_called_once_with(node.callbacks[0], USB_POWER_ID)
+
+
+async def test_power_export_failure(hass: HomeAssistant, tmp_path) -> None:
+    """Test a failing export file disables the export without hanging."""
+    node = mock_node()
+    api_stick = MagicMock()
+    api_stick.devices = {TEST_MAC: node}
+    power_export = PlugwiseUSBPowerExport(hass, api_stick, "000D6F0001000001")
+    power_export.async_add_node(TEST_MAC)
+
+    # The export file cannot be opened
+    power_export.path = str(tmp_path)
+    await power_export.async_set_enabled(True)
+    assert not power_export.enabled
+
+    # The rotated export file cannot be opened, the writer stops
+    power_export.path = str(tmp_path / "power.lp")
+    power_export.max_size = 1e-6
+    await power_export.async_set_enabled(True)
+    writer = power_export._writer
+    with patch.object(power_export, "_rotate", side_effect=OSError):
+        node.callbacks[0](None)
+        await hass.async_add_executor_job(writer.join, 10)
+    assert not power_export.enabled
+
+    # Stopping a failed writer does not wait for it
+    power_export._enabled = True
+    power_export._queue = queue.Queue(1)
+    node.callbacks[0](None)
+    await power_export.async_stop()
+    assert power_export._writer is None
+    assert power_export._queue.empty()
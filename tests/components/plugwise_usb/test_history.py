@@ -0,0 +1,46 @@
+"""Test the Plugwise USB power history."""
+import random
+
+import pytest
+
+from homeassistant.components.plugwise_usb.history import PowerHistory
+
+
+def test_power_history() -> None:
+    """Test the windows of the power history match the samples they cover."""
+    history = PowerHistory(size=64, windows=(60, 300, 900))
+    assert history.mean_1m is None
+    assert history.peak is None
+    assert history.standby is None
+
+    generator = random.Random(1)
+    samples: list[tuple[float, float]] = []
+    for second in range(0, 2000, 10):
+        value = generator.uniform(0, 500)
+        samples.append((second, value))
+        history.add(value, second)
+        # The ring buffer only keeps the last 64 samples
+        kept = samples[-64:]
+        for window, mean in ((60, history.mean_1m), (300, history.mean_5m)):
+            values = [value for timestamp, value in kept if timestamp > second - window]
+            assert mean == pytest.approx(sum(values) / len(values))
+        values = [value for timestamp, value in kept if timestamp > second - 900]
+        assert history.mean_15m == pytest.approx(sum(values) / len(values))
+        assert history.peak == max(values)
+        assert history.minimum == min(values)
+
+
+def test_standby() -> None:
+    """Test standby is detected after a full window of standby power."""
+    history = PowerHistory()
+    for second in range(0, 300, 10):
+        history.add(2.0, second)
+    assert history.standby is None
+    history.add(2.0, 300)
+    assert history.standby
+    for second in range(310, 400, 10):
+        history.add(0.0, second)
+    assert history.standby
+    for second in range(400, 700, 10):
+        history.add(0.0, second)
+    assert history.standby is False
@@ -0,0 +1,107 @@
+"""Test the Plugwise USB entity setup."""
+import asyncio
+from unittest.mock import MagicMock, patch
+
+from homeassistant.components.plugwise_usb import (
+    _node_platforms,
+    async_add_node_entities,
+)
+from homeassistant.components.plugwise_usb.const import (
+    CB_NEW_NODE,
+    DOMAIN,
+    STICK,
+    USB_MOTION_ID,
+    USB_POWER_ID,
+    USB_RELAY_ID,
+    USB_STANDBY_ID,
+)
+from homeassistant.components.plugwise_usb.history import PlugwiseUSBPowerHistory
+from homeassistant.components.plugwise_usb.stick import PlugwiseUSBStick
+from homeassistant.const import Platform
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+from tests.common import MockConfigEntry
+
+TEST_USBPORT = "/dev/ttyUSB1"
+
+
+async def test_batched_entities(hass: HomeAssistant) -> None:
+    """Test the entities of all nodes are added in one call per batch."""
+    config_entry = MockConfigEntry(domain=DOMAIN)
+    config_entry.add_to_hass(hass)
+    api_stick = PlugwiseUSBStick(hass, TEST_USBPORT)
+    api_stick._device_nodes = {
+        "0123456789ABCDE1": MagicMock(),
+        "0123456789ABCDE2": None,
+    }
+    hass.data[DOMAIN] = {config_entry.entry_id: {STICK: api_stick}}
+    async_add_entities = MagicMock()
+    stick_entity = MagicMock()
+
+    with patch("homeassistant.components.plugwise_usb.NEW_NODE_BATCH_DELAY", 0.05):
+        async_add_node_entities(
+            hass,
+            config_entry,
+            async_add_entities,
+            lambda mac: [mac],
+            [stick_entity],
+        )
+        async_add_entities.assert_called_once_with([stick_entity, "0123456789ABCDE1"])
+
+        # Discovered nodes are batched, nodes with entities are skipped
+        for mac in ("0123456789ABCDE1", "0123456789ABCDE3", "0123456789ABCDE4"):
+            api_stick._device_nodes[mac] = MagicMock()
+            api_stick.do_callback(CB_NEW_NODE, mac)
+        await hass.async_block_till_done()
+        await asyncio.sleep(0.1)
+
+    assert async_add_entities.call_count == 2
+    async_add_entities.assert_called_with(["0123456789ABCDE3", "0123456789ABCDE4"])
+
+
+async def test_node_platforms(hass: HomeAssistant) -> None:
+    """Test only the platforms with entities of a node are set up for it."""
+    scan = MagicMock(
+        mac="0123456789ABCDE1", features=(USB_MOTION_ID,), measures_power=False
+    )
+    circle = MagicMock(
+        mac="0123456789ABCDE2",
+        features=(USB_POWER_ID, USB_RELAY_ID),
+        measures_power=True,
+    )
+    meter = MagicMock(
+        mac="0123456789ABCDE3", features=(USB_POWER_ID,), measures_power=False
+    )
+    api_stick = MagicMock(devices={node.mac: node for node in (scan, circle, meter)})
+    power_history = PlugwiseUSBPowerHistory(api_stick)
+    for node in (scan, circle, meter):
+        power_history.async_add_node(node.mac)
+    entity_registry = er.async_get(hass)
+
+    assert _node_platforms(scan, power_history, entity_registry) == {
+        Platform.BINARY_SENSOR,
+        Platform.SENSOR,
+    }
+    assert _node_platforms(circle, power_history, entity_registry) == {
+        Platform.SENSOR,
+        Platform.SWITCH,
+    }
+    assert _node_platforms(meter, power_history, entity_registry) == {
+        Platform.SENSOR
+    }
+
+    # The disabled by default power history binary sensors need the platform
+    # once enabled
+    standby = entity_registry.async_get_or_create(
+        Platform.BINARY_SENSOR,
+        DOMAIN,
+        f"{circle.mac}-{USB_STANDBY_ID}",
+        disabled_by=er.RegistryEntryDisabler.INTEGRATION,
+    )
+    assert Platform.BINARY_SENSOR not in _node_platforms(
+        circle, power_history, entity_registry
+    )
+    entity_registry.async_update_entity(standby.entity_id, disabled_by=None)
+    assert Platform.BINARY_SENSOR in _node_platforms(
+        circle, power_history, entity_registry
+    )
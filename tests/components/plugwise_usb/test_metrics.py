@@ -0,0 +1,77 @@
+"""Test the Plugwise USB message traffic metrics."""
+import asyncio
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from homeassistant.components.plugwise_usb.coalescer import PlugwiseUSBUpdateCoalescer
+from homeassistant.components.plugwise_usb.metrics import PlugwiseUSBMetrics
+from homeassistant.components.plugwise_usb.request_queue import (
+    PlugwiseUSBRequestQueue,
+)
+from homeassistant.components.plugwise_usb.transport import (
+    PlugwiseUSBMessageController,
+)
+from homeassistant.core import HomeAssistant
+from plugwise_usb.constants import MESSAGE_RETRY
+from plugwise_usb.messages.requests import CirclePowerUsageRequest, NodePingRequest
+
+TEST_MAC = "0123456789ABCDEF"
+TEST_USBPORT = "/dev/ttyUSB1"
+
+
+async def test_message_metrics(hass: HomeAssistant) -> None:
+    """Test retries, timeouts, queue depth and timings are recorded."""
+    metrics = PlugwiseUSBMetrics(hass)
+    request_queue = PlugwiseUSBRequestQueue(metrics)
+    mac = TEST_MAC.encode()
+    for retry in (0, 1, 2):
+        request = CirclePowerUsageRequest(mac)
+        request_queue.put((1, retry, datetime.now(), [request, None, retry, None]))
+    request_queue.get(block=False)
+    assert metrics.queue_depth == 2
+
+    # A dropped request counts as one timeout, not the ping checking its node
+    node_state = MagicMock()
+    controller = PlugwiseUSBMessageController(
+        hass, TEST_USBPORT, MagicMock(), node_state, metrics, request_queue
+    )
+    controller.discovery_finished = True
+    controller.send = MagicMock()
+    for seq_id, request, retry in (
+        (b"0001", CirclePowerUsageRequest(mac), 0),
+        (b"0002", CirclePowerUsageRequest(mac), MESSAGE_RETRY + 1),
+        (b"0003", NodePingRequest(mac), MESSAGE_RETRY + 1),
+    ):
+        controller.expected_responses[seq_id] = [request, None, retry, datetime.now()]
+        controller.resend(seq_id)
+    assert isinstance(controller.send.call_args_list[-1][0][0], NodePingRequest)
+    node_state.assert_called_once_with(TEST_MAC, False)
+    assert metrics.retries == 1
+    assert metrics.timeouts == 1
+
+    metrics.record_received(TEST_MAC, 0.2)
+    metrics.record_received(TEST_MAC, None)
+    metrics.record_timeout(TEST_MAC)
+    coalescer = PlugwiseUSBUpdateCoalescer(hass, 0, metrics)
+    coalescer.mark_dirty(MagicMock())
+    await hass.async_block_till_done()
+
+    listener = MagicMock()
+    metrics.async_add_listener(listener)
+    await asyncio.sleep(0.1)
+    metrics._async_sample()
+    listener.assert_called_once()
+    assert metrics.sent_rate > 0
+    assert metrics.received_rate > metrics.sent_rate
+    assert metrics.response_time_mean == pytest.approx(200)
+    assert metrics.state_write_latency_mean is not None
+
+    diagnostics = metrics.as_dict()
+    assert diagnostics["nodes"][TEST_MAC]["responses"] == 2
+    assert diagnostics["nodes"][TEST_MAC]["timeouts"] == 2
+
+    # Averages only cover the last interval
+    metrics._async_sample()
+    assert metrics.response_time_mean is None
@@ -0,0 +1,69 @@
+"""Test the Plugwise USB motion events."""
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+from homeassistant.components.plugwise_usb.const import (
+    DOMAIN,
+    EVENT_MOTION,
+    STICK,
+    USB_MOTION_ID,
+)
+from homeassistant.components.plugwise_usb.device_trigger import async_get_triggers
+from homeassistant.components.plugwise_usb.metrics import PlugwiseUSBMetrics
+from homeassistant.components.plugwise_usb.motion import PlugwiseUSBMotionEvents
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import device_registry as dr
+from tests.common import MockConfigEntry, async_capture_events
+
+TEST_MAC = "0123456789ABCDEF"
+
+
+async def test_motion_events(hass: HomeAssistant) -> None:
+    """Test each change of motion fires an event with its latency recorded."""
+    config_entry = MockConfigEntry(domain=DOMAIN)
+    config_entry.add_to_hass(hass)
+    device = dr.async_get(hass).async_get_or_create(
+        config_entry_id=config_entry.entry_id, identifiers={(DOMAIN, TEST_MAC)}
+    )
+    scan = MagicMock(features=(USB_MOTION_ID,))
+    api_stick = MagicMock(
+        mac="0123456789ABCDE0",
+        devices={TEST_MAC: scan},
+        metrics=PlugwiseUSBMetrics(hass),
+    )
+    api_stick.circle_plus_mac = None
+    hass.data[DOMAIN] = {config_entry.entry_id: {STICK: api_stick}}
+    events = async_capture_events(hass, EVENT_MOTION)
+    motion_events = PlugwiseUSBMotionEvents(hass, api_stick)
+
+    received = datetime.now() - timedelta(milliseconds=5)
+    for motion in (True, True, False):
+        motion_events.motion_received(TEST_MAC, motion, received)
+    await hass.async_block_till_done()
+
+    # The repeated frame is not fired again
+    assert [event.data["type"] for event in events] == ["motion", "no_motion"]
+    assert events[0].data["device_id"] == device.id
+    assert events[0].data["received"] == received.isoformat()
+    assert api_stick.metrics.motion_latency.count == 2
+    assert api_stick.metrics.motion_latency.maximum >= 0.005
+
+    # Frames of undiscovered nodes are processed late and fire no event
+    motion_events.motion_received(TEST_MAC, True, received - timedelta(seconds=5))
+    await hass.async_block_till_done()
+    assert len(events) == 2
+
+    # The motion is forgotten when the Scan becomes unavailable or is removed
+    for forget in (
+        lambda: motion_events.node_availability(TEST_MAC, False),
+        lambda: motion_events.discard(TEST_MAC),
+    ):
+        forget()
+        motion_events.motion_received(TEST_MAC, False, datetime.now())
+        await hass.async_block_till_done()
+    assert [event.data["type"] for event in events[2:]] == ["no_motion", "no_motion"]
+
+    triggers = await async_get_triggers(hass, device.id)
+    assert {trigger["type"] for trigger in triggers} == {"motion", "no_motion"}
+    scan.features = ()
+    assert await async_get_triggers(hass, device.id) == []
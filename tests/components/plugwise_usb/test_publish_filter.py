@@ -0,0 +1,83 @@
+"""Test the filtering of Plugwise USB sensor updates."""
+from unittest.mock import MagicMock, PropertyMock, patch
+
+from homeassistant.components.plugwise_usb.const import (
+    DEADBAND_ENERGY,
+    DEADBAND_POWER,
+)
+from homeassistant.components.plugwise_usb.metrics import PlugwiseUSBMetrics
+from homeassistant.components.plugwise_usb.models import PW_SENSOR_TYPES
+from homeassistant.components.plugwise_usb.publish_filter import (
+    PlugwiseUSBPublishFilter,
+)
+from homeassistant.components.plugwise_usb.sensor import USBSensor
+from homeassistant.core import HomeAssistant
+
+
+async def test_publish_filter(hass: HomeAssistant) -> None:
+    """Test deadbands, publish intervals and the suppression ratio."""
+    metrics = PlugwiseUSBMetrics(hass)
+    publish_filter = PlugwiseUSBPublishFilter.from_options(
+        {
+            "deadband_power": 5,
+            "deadband_energy": 10,
+            "deadband_mode_energy": "relative",
+            "publish_min_interval": 2,
+            "publish_max_interval": 60,
+        },
+        metrics,
+    )
+    power, energy = MagicMock(), MagicMock()
+    with patch(
+        "homeassistant.components.plugwise_usb.publish_filter.time.monotonic"
+    ) as monotonic:
+        monotonic.return_value = 100
+        assert publish_filter.should_publish(power, DEADBAND_POWER, 100.0, True)
+        assert publish_filter.should_publish(energy, DEADBAND_ENERGY, 2.0, True)
+
+        # Within the minimum interval only availability changes pass
+        assert not publish_filter.should_publish(power, DEADBAND_POWER, 200.0, True)
+        assert publish_filter.should_publish(power, DEADBAND_POWER, None, False)
+
+        monotonic.return_value = 110
+        assert publish_filter.should_publish(power, DEADBAND_POWER, 100.0, True)
+        monotonic.return_value = 120
+        assert not publish_filter.should_publish(power, DEADBAND_POWER, 104.0, True)
+        assert publish_filter.should_publish(power, DEADBAND_POWER, 106.0, True)
+        assert not publish_filter.should_publish(energy, DEADBAND_ENERGY, 2.1, True)
+        assert publish_filter.should_publish(energy, DEADBAND_ENERGY, 2.3, True)
+
+        # The maximum interval publishes the value anyway
+        monotonic.return_value = 180
+        assert publish_filter.should_publish(power, DEADBAND_POWER, 106.0, True)
+
+    assert metrics.published == 7
+    assert metrics.suppressed == 3
+    metrics._async_sample()
+    assert metrics.suppression_ratio == 30.0
+
+
+async def test_sensor_snapshot(hass: HomeAssistant) -> None:
+    """Test the native value is kept when an update passes the publish filter."""
+    node = MagicMock(mac="0123456789ABCDEF", available=True)
+    current_power_usage = PropertyMock(return_value=100.12345)
+    type(node).current_power_usage = current_power_usage
+    sensor = USBSensor(node, PW_SENSOR_TYPES[0])
+    sensor._coalescer = MagicMock()
+    sensor._publish_filter = PlugwiseUSBPublishFilter.from_options(
+        {"deadband_power": 5}
+    )
+    assert sensor.native_value == 100.123
+
+    sensor.sensor_update(None)
+    current_power_usage.return_value = 102.0
+    sensor.sensor_update(None)
+    assert sensor.native_value == 100.123
+    current_power_usage.return_value = 110.0
+    sensor.sensor_update(None)
+    assert sensor._coalescer.mark_dirty.call_count == 2
+
+    # Reading the state does not call the node
+    reads = current_power_usage.call_count
+    assert sensor.native_value == 110.0
+    assert current_power_usage.call_count == reads
@@ -0,0 +1,52 @@
+"""Test the Plugwise USB request queue."""
+from datetime import datetime
+
+from homeassistant.components.plugwise_usb.const import (
+    REQUEST_CLASS_COMMAND,
+    REQUEST_CLASS_CONFIG,
+    REQUEST_CLASS_POLL,
+)
+from homeassistant.components.plugwise_usb.request_queue import (
+    PlugwiseUSBRequestQueue,
+)
+from plugwise_usb.constants import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_MEDIUM
+from plugwise_usb.messages.requests import (
+    CirclePowerUsageRequest,
+    CircleSwitchRelayRequest,
+    NodePingRequest,
+    ScanConfigureRequest,
+)
+
+TEST_MAC = b"0123456789ABCDEF"
+
+
+def test_user_commands_preempt_polling() -> None:
+    """Test requests are handed out by class, priority and arrival."""
+    request_queue = PlugwiseUSBRequestQueue()
+    requests = [
+        (PRIORITY_MEDIUM, CirclePowerUsageRequest(TEST_MAC)),
+        (PRIORITY_LOW, NodePingRequest(TEST_MAC)),
+        (PRIORITY_MEDIUM, NodePingRequest(TEST_MAC)),
+        (PRIORITY_HIGH, ScanConfigureRequest(TEST_MAC, 10, 20, False)),
+        (PRIORITY_HIGH, CircleSwitchRelayRequest(TEST_MAC, True)),
+    ]
+    for priority, request in requests:
+        request_queue.put((priority, 0, datetime.now(), [request, None, 0, None]))
+
+    assert request_queue.pending() == {
+        REQUEST_CLASS_COMMAND: 1,
+        REQUEST_CLASS_CONFIG: 1,
+        REQUEST_CLASS_POLL: 3,
+    }
+    sent = [request_queue.get(block=False)[3][0] for _ in requests]
+    assert sent == [
+        requests[4][1],
+        requests[3][1],
+        requests[0][1],
+        requests[2][1],
+        requests[1][1],
+    ]
+    queue_wait = request_queue.wait_statistics()
+    assert queue_wait[REQUEST_CLASS_COMMAND].count == 1
+    assert queue_wait[REQUEST_CLASS_POLL].count == 3
+    assert queue_wait[REQUEST_CLASS_POLL].maximum >= queue_wait[REQUEST_CLASS_POLL].mean
@@ -0,0 +1,137 @@
+"""Test the Plugwise USB poll scheduler."""
+from unittest.mock import MagicMock
+
+import pytest
+
+from homeassistant.components.plugwise_usb.const import (
+    DOMAIN,
+    POLL_ADAPTIVE_MAX_FACTOR,
+    POLL_ENERGY,
+    POLL_PING,
+    POLL_POWER,
+)
+from homeassistant.components.plugwise_usb.models import PW_SENSOR_TYPES
+from homeassistant.components.plugwise_usb.scheduler import PlugwiseUSBPollScheduler
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+from tests.common import MockConfigEntry
+
+TEST_MAC = "0123456789ABCDEF"
+
+
+def circle_node() -> MagicMock:
+    """Mock of a Circle node."""
+    node = MagicMock()
+    node.mac = TEST_MAC
+    node.features = tuple(description.key for description in PW_SENSOR_TYPES)
+    node.available = True
+    node.battery_powered = False
+    node.measures_power = True
+    node.current_power_usage = 100.0
+    return node
+
+
+async def test_adaptive_power_interval(hass: HomeAssistant) -> None:
+    """Test power requests slow down for a stable power usage."""
+    node = circle_node()
+    api_stick = MagicMock(devices={TEST_MAC: node})
+    scheduler = PlugwiseUSBPollScheduler(hass, api_stick, 100)
+
+    scheduler.async_start()
+    intervals = scheduler.intervals(TEST_MAC)
+    assert intervals[POLL_POWER] == 10
+    assert intervals[POLL_ENERGY] == 300
+    assert intervals[POLL_PING] == 300
+
+    power_callback = node.subscribe_callback.call_args[0][0]
+    for _ in range(50):
+        power_callback(None)
+    scheduler.message_budget = 100
+    assert scheduler.intervals(TEST_MAC)[POLL_POWER] == pytest.approx(
+        10 * POLL_ADAPTIVE_MAX_FACTOR
+    )
+
+    # Only the demanded descriptions determine the intervals
+    scheduler.async_set_demand(TEST_MAC, {"power_8s"})
+    assert POLL_ENERGY not in scheduler.intervals(TEST_MAC)
+    scheduler.async_stop()
+
+
+async def test_message_budget(hass: HomeAssistant) -> None:
+    """Test intervals are stretched to stay within the message budget."""
+    node = circle_node()
+    api_stick = MagicMock(devices={TEST_MAC: node})
+    scheduler = PlugwiseUSBPollScheduler(hass, api_stick, 0.05)
+    listener = MagicMock()
+    scheduler.async_add_listener(listener)
+
+    scheduler.async_start()
+    assert scheduler.utilization == pytest.approx(1)
+    assert scheduler.budget_share(TEST_MAC) == pytest.approx(1)
+    assert scheduler.intervals(TEST_MAC)[POLL_POWER] > 10
+    listener.assert_called_once()
+    scheduler.async_stop()
+
+
+async def test_poll_intervals(hass: HomeAssistant) -> None:
+    """Test changed poll intervals scale the intervals of a running scheduler."""
+    node = circle_node()
+    api_stick = MagicMock(devices={TEST_MAC: node})
+    scheduler = PlugwiseUSBPollScheduler(hass, api_stick, 100, {POLL_ENERGY: 600})
+    scheduler.async_start()
+    assert scheduler.intervals(TEST_MAC)[POLL_ENERGY] == 600
+
+    scheduler.poll_intervals = {POLL_PING: 150}
+    assert scheduler.intervals(TEST_MAC)[POLL_ENERGY] == 300
+    assert scheduler.intervals(TEST_MAC)[POLL_PING] == 150
+    scheduler.async_stop()
+
+
+async def test_entity_demand(hass: HomeAssistant) -> None:
+    """Test only the data of enabled entities is requested."""
+    config_entry = MockConfigEntry(domain=DOMAIN)
+    config_entry.add_to_hass(hass)
+    entity_registry = er.async_get(hass)
+    node = circle_node()
+    api_stick = MagicMock(devices={TEST_MAC: node})
+    scheduler = PlugwiseUSBPollScheduler(hass, api_stick, 100)
+
+    scheduler.async_start()
+    untrack = scheduler.async_track_entity_demand(config_entry.entry_id)
+    intervals = scheduler.intervals(TEST_MAC)
+    assert intervals[POLL_POWER] == 10
+    assert POLL_ENERGY not in intervals
+
+    entity_registry.async_get_or_create(
+        "sensor", DOMAIN, f"{TEST_MAC}-power_con_today", config_entry=config_entry
+    )
+    await hass.async_block_till_done()
+    assert scheduler.intervals(TEST_MAC)[POLL_ENERGY] == 300
+
+    power_entry = entity_registry.async_get_or_create(
+        "sensor", DOMAIN, f"{TEST_MAC}-power_1s", config_entry=config_entry
+    )
+    entity_registry.async_update_entity(
+        power_entry.entity_id, disabled_by=er.RegistryEntryDisabler.USER
+    )
+    await hass.async_block_till_done()
+    assert scheduler.intervals(TEST_MAC)[POLL_POWER] == 60
+
+    # Enabled entities derived from the power samples still need them
+    standby_entry = entity_registry.async_get_or_create(
+        "binary_sensor", DOMAIN, f"{TEST_MAC}-standby", config_entry=config_entry
+    )
+    await hass.async_block_till_done()
+    assert scheduler.intervals(TEST_MAC)[POLL_POWER] == 10
+    entity_registry.async_update_entity(
+        standby_entry.entity_id, disabled_by=er.RegistryEntryDisabler.USER
+    )
+    await hass.async_block_till_done()
+    assert scheduler.intervals(TEST_MAC)[POLL_POWER] == 60
+
+    # And so does the export of the power samples
+    scheduler.power_sampling = True
+    assert scheduler.intervals(TEST_MAC)[POLL_POWER] == 10
+
+    untrack()
+    scheduler.async_stop()
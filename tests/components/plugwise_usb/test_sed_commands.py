@@ -0,0 +1,79 @@
+"""Test the Plugwise USB command queue of battery powered nodes."""
+from typing import Any
+from unittest.mock import MagicMock
+
+from homeassistant.components.plugwise_usb.const import (
+    DOMAIN,
+    SED_COMMAND_SCAN_CONFIG,
+)
+from homeassistant.components.plugwise_usb.sed_commands import (
+    PlugwiseUSBSedCommands,
+)
+from homeassistant.core import HomeAssistant
+from plugwise_usb.constants import SED_AWAKE_MAINTENANCE, SED_AWAKE_STATE
+from plugwise_usb.messages.requests import ScanConfigureRequest
+from plugwise_usb.nodes.scan import PlugwiseScan
+
+TEST_MAC = "0123456789ABCDEF"
+TEST_STICK_MAC = "0123456789ABCDE0"
+
+
+def awake(
+    sed_commands: PlugwiseUSBSedCommands, node: PlugwiseScan, awake_type: int
+) -> None:
+    """Process an awake message like the stick does."""
+    sed_commands.node_awake(node.mac, awake_type)
+    node._process_awake_response(MagicMock(awake_type=MagicMock(value=awake_type)))
+
+
+async def test_queue_until_acknowledged(
+    hass: HomeAssistant, hass_storage: dict[str, Any]
+) -> None:
+    """Test the last command is sent at each awake until the node acknowledged it."""
+    message_sender = MagicMock()
+    node = PlugwiseScan(TEST_MAC, 1, message_sender)
+    api_stick = MagicMock(devices={TEST_MAC: node})
+    sed_commands = PlugwiseUSBSedCommands(hass, api_stick, TEST_STICK_MAC)
+    await sed_commands.async_load()
+    listener = api_stick.add_awake_listener.call_args[0][0]
+    assert listener == sed_commands.node_awake
+
+    first = sed_commands.async_queue(TEST_MAC, SED_COMMAND_SCAN_CONFIG, [5, "low", 0])
+    delivery = sed_commands.async_queue(
+        TEST_MAC, SED_COMMAND_SCAN_CONFIG, [10, "high", 1]
+    )
+    assert first is delivery
+    assert sed_commands.pending(TEST_MAC) == {SED_COMMAND_SCAN_CONFIG: [10, "high", 1]}
+
+    # Nothing is sent when the node is only awake for a state change
+    awake(sed_commands, node, SED_AWAKE_STATE)
+    message_sender.assert_not_called()
+
+    # A command without acknowledgement stays pending and survives a restart
+    awake(sed_commands, node, SED_AWAKE_MAINTENANCE)
+    request, _, retries, _ = message_sender.call_args[0]
+    assert isinstance(request, ScanConfigureRequest)
+    assert retries == -1
+    await sed_commands.async_stop()
+    assert hass_storage[f"{DOMAIN}.{TEST_STICK_MAC}.sed_commands"]["data"] == {
+        TEST_MAC: {SED_COMMAND_SCAN_CONFIG: [10, "high", 1]}
+    }
+    sed_commands = PlugwiseUSBSedCommands(hass, api_stick, TEST_STICK_MAC)
+    await sed_commands.async_load()
+    assert sed_commands.pending(TEST_MAC) == {SED_COMMAND_SCAN_CONFIG: [10, "high", 1]}
+
+    # A command replaced while it was sent stays pending
+    awake(sed_commands, node, SED_AWAKE_MAINTENANCE)
+    delivery = sed_commands.async_queue(
+        TEST_MAC, SED_COMMAND_SCAN_CONFIG, [20, "medium", 0]
+    )
+    message_sender.call_args[0][1]()
+    assert not delivery.done()
+
+    message_sender.reset_mock()
+    awake(sed_commands, node, SED_AWAKE_MAINTENANCE)
+    assert message_sender.call_count == 1
+    message_sender.call_args[0][1]()
+    assert delivery.done()
+    assert sed_commands.pending(TEST_MAC) == {}
+    assert node._new_motion_reset_timer == 20
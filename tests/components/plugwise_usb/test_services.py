@@ -0,0 +1,171 @@
+"""Test the Plugwise USB services across multiple sticks."""
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from homeassistant.components.plugwise_usb import (
+    async_setup_services,
+    async_stick_of_node,
+)
+from homeassistant.components.plugwise_usb.const import (
+    CACHE,
+    DOMAIN,
+    LOCAL_ENERGY,
+    MOTION_EVENTS,
+    POWER_EXPORT,
+    POWER_HISTORY,
+    SCHEDULER,
+    SED_COMMANDS,
+    STICK,
+    USB_POWER_ID,
+    USB_RELAY_ID,
+)
+from homeassistant.components.plugwise_usb.stick import PlugwiseUSBStick
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from tests.common import MockConfigEntry
+
+STICK_MACS = ("000D6F0001000001", "000D6F0001000002")
+CIRCLE_MACS = ("0123456789ABCDE1", "0123456789ABCDE2")
+
+
+def mock_stick(hass: HomeAssistant, mac: str, circle_mac: str) -> PlugwiseUSBStick:
+    """Return a connected stick with one Circle in its network."""
+    api_stick = PlugwiseUSBStick(hass, "/dev/ttyUSB1")
+    api_stick._mac_stick = mac.encode()
+    api_stick.circle_plus_mac = f"{mac[:-2]}F{mac[-1]}"
+    api_stick._device_nodes = {circle_mac: MagicMock()}
+    api_stick.node_join = MagicMock()
+    api_stick.node_unjoin = MagicMock()
+    api_stick.async_switch_relays = AsyncMock(
+        side_effect=lambda macs, state, concurrency: dict.fromkeys(macs)
+    )
+    api_stick.async_rediscover_nodes = AsyncMock(return_value=[])
+    return api_stick
+
+
+@pytest.fixture
+def sticks(hass: HomeAssistant) -> list[PlugwiseUSBStick]:
+    """Set up two sticks with their own network."""
+    api_sticks = []
+    for stick_mac, circle_mac in zip(STICK_MACS, CIRCLE_MACS):
+        config_entry = MockConfigEntry(domain=DOMAIN, unique_id=stick_mac)
+        config_entry.add_to_hass(hass)
+        api_stick = mock_stick(hass, stick_mac, circle_mac)
+        hass.data.setdefault(DOMAIN, {})[config_entry.entry_id] = {
+            STICK: api_stick,
+            **{
+                key: MagicMock()
+                for key in (
+                    CACHE,
+                    LOCAL_ENERGY,
+                    MOTION_EVENTS,
+                    POWER_EXPORT,
+                    POWER_HISTORY,
+                    SCHEDULER,
+                    SED_COMMANDS,
+                )
+            },
+        }
+        api_sticks.append(api_stick)
+    async_setup_services(hass)
+    return api_sticks
+
+
+async def test_set_relays_per_stick(hass: HomeAssistant, sticks) -> None:
+    """Test relays are switched by the stick of their network."""
+    response = await hass.services.async_call(
+        DOMAIN,
+        "set_relays",
+        {"mac": [*CIRCLE_MACS, "0123456789ABCDE3"], "state": False},
+        blocking=True,
+        return_response=True,
+    )
+    for api_stick, circle_mac in zip(sticks, CIRCLE_MACS):
+        api_stick.async_switch_relays.assert_awaited_once()
+        assert api_stick.async_switch_relays.call_args[0][:2] == ([circle_mac], False)
+    assert response["results"][CIRCLE_MACS[0]]["success"]
+    assert response["results"]["0123456789ABCDE3"] == {
+        "success": False,
+        "error": "Unknown Circle",
+    }
+
+
+async def test_set_relays_of_switches(hass: HomeAssistant, sticks) -> None:
+    """Test only the relay switches of Circles are switched by entity."""
+    entity_registry = er.async_get(hass)
+    relay = entity_registry.async_get_or_create(
+        "switch", DOMAIN, f"{CIRCLE_MACS[0]}-{USB_RELAY_ID}"
+    )
+    power = entity_registry.async_get_or_create(
+        "sensor", DOMAIN, f"{CIRCLE_MACS[1]}-{USB_POWER_ID}"
+    )
+    response = await hass.services.async_call(
+        DOMAIN,
+        "set_relays",
+        {"entity_id": [relay.entity_id, power.entity_id], "state": True},
+        blocking=True,
+        return_response=True,
+    )
+    assert list(response["results"]) == [CIRCLE_MACS[0]]
+    sticks[1].async_switch_relays.assert_not_called()
+
+
+async def test_move_node(hass: HomeAssistant, sticks) -> None:
+    """Test a node moves to the network of another stick."""
+    source, target = hass.config_entries.async_entries(DOMAIN)
+    device_registry = dr.async_get(hass)
+    for stick_mac, config_entry in zip(STICK_MACS, (source, target)):
+        device_registry.async_get_or_create(
+            config_entry_id=config_entry.entry_id, identifiers={(DOMAIN, stick_mac)}
+        )
+    device = device_registry.async_get_or_create(
+        config_entry_id=source.entry_id,
+        identifiers={(DOMAIN, CIRCLE_MACS[0])},
+        via_device=(DOMAIN, STICK_MACS[0]),
+    )
+    relay = er.async_get(hass).async_get_or_create(
+        "switch",
+        DOMAIN,
+        f"{CIRCLE_MACS[0]}-{USB_RELAY_ID}",
+        config_entry=source,
+        device_id=device.id,
+    )
+
+    await hass.services.async_call(
+        DOMAIN,
+        "move_node",
+        {"mac": CIRCLE_MACS[0], "stick": STICK_MACS[1]},
+        blocking=True,
+    )
+    await hass.async_block_till_done()
+    sticks[0].node_unjoin.assert_called_once_with(CIRCLE_MACS[0])
+    sticks[1].node_join.assert_called_once_with(CIRCLE_MACS[0])
+    sticks[1].async_rediscover_nodes.assert_awaited_once_with([CIRCLE_MACS[0]])
+
+    # The source forgot the node and its entities, the device moved along
+    assert CIRCLE_MACS[0] not in sticks[0].devices
+    assert async_stick_of_node(hass, CIRCLE_MACS[0]) is None
+    source_data = hass.data[DOMAIN][source.entry_id]
+    for key in (SCHEDULER, POWER_HISTORY, POWER_EXPORT, LOCAL_ENERGY, CACHE):
+        source_data[key].async_remove_node.assert_called_once_with(CIRCLE_MACS[0])
+    assert er.async_get(hass).async_get(relay.entity_id) is None
+    device = device_registry.async_get(device.id)
+    assert device.config_entries == {target.entry_id}
+    assert device.via_device_id == (
+        device_registry.async_get_device({(DOMAIN, STICK_MACS[1])}).id
+    )
+
+    # Without a stick the network of a new node is ambiguous
+    with pytest.raises(HomeAssistantError):
+        await hass.services.async_call(
+            DOMAIN, "device_add", {"mac": "0123456789ABCDE3"}, blocking=True
+        )
+    with pytest.raises(HomeAssistantError):
+        await hass.services.async_call(
+            DOMAIN,
+            "move_node",
+            {"mac": sticks[1].circle_plus_mac, "stick": STICK_MACS[0]},
+            blocking=True,
+        )
@@ -0,0 +1,192 @@
+"""Test the Plugwise USB-stick on the event loop."""
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from homeassistant.components.plugwise_usb.const import (
+    CB_NEW_NODE,
+    CB_NODE_CALIBRATION,
+    USB_MOTION_ID,
+    USB_RELAY_ID,
+)
+from homeassistant.components.plugwise_usb.stick import PlugwiseUSBStick
+from homeassistant.core import HomeAssistant
+from plugwise_usb.constants import PRIORITY_LOW
+from plugwise_usb.exceptions import PlugwiseException
+from plugwise_usb.messages.requests import NodeInfoRequest
+from plugwise_usb.messages.responses import (
+    CircleCalibrationResponse,
+    NodeSwitchGroupResponse,
+)
+
+TEST_USBPORT = "/dev/ttyUSB1"
+
+
+async def test_stick_callback(hass: HomeAssistant) -> None:
+    """Test stick callbacks can be unsubscribed."""
+    api_stick = PlugwiseUSBStick(hass, TEST_USBPORT)
+    new_node = MagicMock()
+
+    unsubscribe = api_stick.async_subscribe_stick_callback(new_node, CB_NEW_NODE)
+    api_stick.do_callback(CB_NEW_NODE, "0123")
+    new_node.assert_called_once_with("0123")
+
+    unsubscribe()
+    api_stick.do_callback(CB_NEW_NODE, "4567")
+    new_node.assert_called_once()
+
+
+async def test_progressive_discovery(hass: HomeAssistant) -> None:
+    """Test each node is announced once as soon as it responds."""
+    api_stick = PlugwiseUSBStick(hass, TEST_USBPORT)
+    api_stick.msg_controller = MagicMock()
+    registered = {"0123456789ABCDE1": 1, "0123456789ABCDE2": 2}
+    announced: list[str] = []
+
+    def scan(callback=None):
+        hass.loop.call_later(0.01, api_stick.discover_nodes, registered)
+
+    def discover_node(mac, callback=None, force_discover=False):
+        if mac == "0123456789ABCDE1":
+            api_stick.devices[mac] = MagicMock()
+        hass.loop.call_later(0.01, callback)
+
+    api_stick.async_subscribe_stick_callback(announced.append, CB_NEW_NODE)
+    with patch.object(api_stick, "scan", MagicMock(side_effect=scan)), patch.object(
+        api_stick, "discover_node", MagicMock(side_effect=discover_node)
+    ):
+        unreachable = await api_stick.async_discover_nodes(1)
+        await hass.async_block_till_done()
+
+    assert unreachable == ["0123456789ABCDE2"]
+    assert announced == ["0123456789ABCDE1"]
+    assert api_stick.msg_controller.discovery_finished
+
+    # Nodes discovered later by the library are not announced twice
+    api_stick.do_callback(CB_NEW_NODE, "0123456789ABCDE1")
+    assert announced == ["0123456789ABCDE1"]
+
+
+async def test_restore_nodes_from_cache(hass: HomeAssistant) -> None:
+    """Test nodes are created unavailable from cached metadata."""
+    api_stick = PlugwiseUSBStick(hass, TEST_USBPORT)
+    api_stick.msg_controller = MagicMock()
+    metadata = {
+        "address": 5,
+        "node_type": 2,
+        "hardware_version": "000009008700",
+        "firmware_version": "2011-06-27 08:55:44",
+    }
+
+    api_stick.restore_nodes({"0123456789ABCDE1": metadata})
+
+    node = api_stick.devices["0123456789ABCDE1"]
+    assert not node.available
+    assert node.hardware_model == "Circle type E"
+    assert node.firmware_version == "2011-06-27 08:55:44"
+    assert api_stick.node_metadata("0123456789ABCDE1") == metadata
+
+    # The node info of restored nodes is requested once, at a low priority
+    api_stick.msg_controller.send.reset_mock()
+    api_stick.request_restored_node_info()
+    api_stick.request_restored_node_info()
+    request, _, _, priority = api_stick.msg_controller.send.call_args[0]
+    assert api_stick.msg_controller.send.call_count == 1
+    assert isinstance(request, NodeInfoRequest)
+    assert priority == PRIORITY_LOW
+
+
+async def test_switch_relay(hass: HomeAssistant) -> None:
+    """Test switching a relay waits for the acknowledgement of the Circle."""
+    api_stick = PlugwiseUSBStick(hass, TEST_USBPORT)
+    node = MagicMock(_relay_state=False)
+    api_stick.devices["0123456789ABCDE1"] = node
+
+    def request_switch(state, callback):
+        node._relay_state = state
+        hass.loop.call_later(0.01, callback)
+
+    node._request_switch = MagicMock(side_effect=request_switch)
+    await api_stick.async_switch_relay("0123456789ABCDE1", True)
+    assert node._relay_state
+
+    # Relay switching failed
+    node._request_switch = MagicMock(
+        side_effect=lambda state, callback: hass.loop.call_later(0.01, callback)
+    )
+    with pytest.raises(PlugwiseException):
+        await api_stick.async_switch_relay("0123456789ABCDE1", False)
+
+    # No response
+    node._request_switch = MagicMock()
+    with patch(
+        "homeassistant.components.plugwise_usb.stick.RELAY_SWITCH_TIMEOUT", 0.01
+    ), pytest.raises(TimeoutError):
+        await api_stick.async_switch_relay("0123456789ABCDE1", False)
+
+
+async def test_switch_relays(hass: HomeAssistant) -> None:
+    """Test switching multiple relays returns the result per node."""
+    api_stick = PlugwiseUSBStick(hass, TEST_USBPORT)
+    for mac in ("0123456789ABCDE1", "0123456789ABCDE2"):
+        api_stick.devices[mac] = MagicMock(features=(USB_RELAY_ID,))
+
+    async def switch_relay(mac: str, state: bool) -> None:
+        if mac == "0123456789ABCDE2":
+            raise TimeoutError
+
+    with patch.object(api_stick, "async_switch_relay", side_effect=switch_relay):
+        results = await api_stick.async_switch_relays(
+            ["0123456789ABCDE1", "0123456789ABCDE2", "0123456789ABCDE3"], False, 2
+        )
+    assert results == {
+        "0123456789ABCDE1": None,
+        "0123456789ABCDE2": "No response",
+        "0123456789ABCDE3": "Unknown Circle",
+    }
+
+
+async def test_motion_frames(hass: HomeAssistant) -> None:
+    """Test only the switch frames of a Scan are passed as motion."""
+    api_stick = PlugwiseUSBStick(hass, TEST_USBPORT)
+    scan = MagicMock(mac="0123456789ABCDE1", features=(USB_MOTION_ID,))
+    switch = MagicMock(mac="0123456789ABCDE2", features=())
+    api_stick._device_nodes = {scan.mac: scan, switch.mac: switch}
+    motion_listener = MagicMock()
+    api_stick.add_motion_listener(motion_listener)
+    availability_listener = MagicMock()
+    api_stick.add_availability_listener(availability_listener)
+
+    received = datetime.now()
+    for node in (scan, switch):
+        message = NodeSwitchGroupResponse()
+        message.mac = node.mac.encode()
+        message.seq_id = b"FFFE"
+        message.timestamp = received
+        message.power_state.value = 1
+        api_stick.message_processor(message)
+    motion_listener.assert_called_once_with(scan.mac, True, received)
+
+    api_stick.mark_nodes_unavailable()
+    assert sorted(availability_listener.call_args_list) == [
+        ((scan.mac, False),),
+        ((switch.mac, False),),
+    ]
+
+
+async def test_calibration_callback(hass: HomeAssistant) -> None:
+    """Test a callback is executed when a Circle received its calibration."""
+    api_stick = PlugwiseUSBStick(hass, TEST_USBPORT)
+    api_stick.msg_controller = MagicMock(expected_responses={})
+    circle = MagicMock(mac="0123456789ABCDE1", calibration=True)
+    api_stick._device_nodes = {circle.mac: circle}
+    calibrated = MagicMock()
+    api_stick.async_subscribe_stick_callback(calibrated, CB_NODE_CALIBRATION)
+
+    message = CircleCalibrationResponse()
+    message.mac = circle.mac.encode()
+    message.seq_id = b"0001"
+    message.timestamp = datetime.now()
+    api_stick.message_processor(message)
+    calibrated.assert_called_once_with(circle.mac)
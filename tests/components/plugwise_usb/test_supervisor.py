@@ -0,0 +1,91 @@
+"""Test the Plugwise USB connection supervisor."""
+import asyncio
+from collections.abc import Callable
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from homeassistant.components.plugwise_usb.const import (
+    CONF_USB_PATH,
+    DOMAIN,
+    STICK,
+    SUPERVISOR,
+    USB_RELAY_ID,
+)
+from homeassistant.components.plugwise_usb.supervisor import (
+    PlugwiseUSBConnectionSupervisor,
+)
+from homeassistant.const import STATE_UNAVAILABLE
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+from tests.common import MockConfigEntry
+
+from .simulator import CIRCLE_PLUS_MAC, STICK_MAC, SimulatedNetwork, constant
+from .test_benchmark import wait_for_stick_threads
+
+
+async def wait_until(condition: Callable[[], bool], timeout: float = 20) -> None:
+    """Wait until condition is met."""
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.1)
+
+
+async def test_reconnect(hass: HomeAssistant) -> None:
+    """Test the nodes are kept and become available again after a replug."""
+    threads_before = set(threading.enumerate())
+    with SimulatedNetwork(circles=1, waveform=lambda index: constant(100.0)) as network:
+        config_entry = MockConfigEntry(
+            domain=DOMAIN, unique_id=STICK_MAC, data={CONF_USB_PATH: network.port}
+        )
+        config_entry.add_to_hass(hass)
+        assert await hass.config_entries.async_setup(config_entry.entry_id)
+        api_stick = hass.data[DOMAIN][config_entry.entry_id][STICK]
+        supervisor = hass.data[DOMAIN][config_entry.entry_id][SUPERVISOR]
+        entity_id = er.async_get(hass).async_get_entity_id(
+            "switch", DOMAIN, f"{CIRCLE_PLUS_MAC}-{USB_RELAY_ID}"
+        )
+        await wait_until(lambda: hass.states.get(entity_id).state != STATE_UNAVAILABLE)
+        nodes = dict(api_stick.devices)
+
+        network.unplug()
+        await wait_until(lambda: not api_stick.connected)
+        supervisor._async_check()
+        assert supervisor.reconnecting
+        await wait_until(lambda: hass.states.get(entity_id).state == STATE_UNAVAILABLE)
+
+        # Reconnect attempts back off until the stick is plugged in again
+        await asyncio.sleep(2)
+        network.plug()
+        await wait_until(lambda: not supervisor.reconnecting)
+        assert api_stick.connected
+        assert api_stick.devices == nodes
+        await wait_until(lambda: hass.states.get(entity_id).state != STATE_UNAVAILABLE)
+        assert api_stick.metrics.last_reconnect_time >= 2
+
+        assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await wait_for_stick_threads(threads_before)
+
+
+async def test_reconnect_errors(hass: HomeAssistant) -> None:
+    """Test serial errors are retried and an unexpected error allows a new check."""
+    config_entry = MockConfigEntry(domain=DOMAIN)
+    config_entry.add_to_hass(hass)
+    api_stick = MagicMock(connected=False, devices={})
+    api_stick.async_reconnect = AsyncMock(side_effect=[OSError, None])
+    supervisor = PlugwiseUSBConnectionSupervisor(hass, config_entry, api_stick)
+
+    with patch(
+        "homeassistant.components.plugwise_usb.supervisor.RECONNECT_MIN_INTERVAL", 0
+    ):
+        supervisor._async_check()
+        await wait_until(lambda: not supervisor.reconnecting)
+    assert api_stick.async_reconnect.call_count == 2
+    api_stick.metrics.record_reconnect.assert_called_once()
+
+    api_stick.async_reconnect = AsyncMock(side_effect=RuntimeError)
+    supervisor._async_check()
+    assert supervisor.reconnecting
+    await wait_until(lambda: not supervisor.reconnecting)
+    supervisor._async_check()
+    assert supervisor.reconnecting
+    supervisor.async_stop()